@@ -0,0 +1,164 @@
+"""
+Multi-tool turns on the RAG backend: chatbot.stream vs. async_chatbot.astream.
+
+The fake model answers each question with parallel tool calls (one quote
+per ticker, a web search and a document lookup) against fake_openai_server.
+Quotes and the document's query embedding are real HTTP calls to it; the
+DuckDuckGo search is simulated with a sleep of the same --tool-latency.
+Times single turns, then --sessions concurrent turns, and reports the
+threads in use. Runs in a temporary directory, so chatbot.db and
+llm_cache.db are not touched.
+
+    python -m benchmarks.async_tools --tool-latency 0.3 --sessions 20
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_community.utilities import DuckDuckGoSearchAPIWrapper
+from langchain_core.messages import HumanMessage
+
+from fake_openai_server import FakeModelConfig, FakeOpenAIServer
+
+DOCUMENT_THREAD = "benchmark-document"
+QUESTION = "Compare AAPL, MSFT and NVDA, find the latest news on them, and check the document"
+RULES = [
+    {"match": r"\b((?-i:[A-Z]{2,5}))\b", "tool": "get_stock_price", "arguments": {"symbol": "$1"}, "each": True},
+    {"match": r"\bnews\b", "tool": "duckduckgo_search", "arguments": {"query": "$q"}},
+    {"match": r"\bdocument\b", "tool": "rag_tool", "arguments": {"query": "$q", "thread_id": DOCUMENT_THREAD}},
+]
+
+
+class SimulatedSearch(DuckDuckGoSearchAPIWrapper):
+    latency: float = 0.0
+
+    def results(self, query: str, max_results: int, source=None) -> list[dict]:
+        time.sleep(self.latency)
+        return [{"title": "Result", "snippet": f"About {query}", "link": "https://example.com"}]
+
+
+class ThreadPeak:
+    """Highest threading.active_count() seen while running."""
+
+    def __init__(self) -> None:
+        self.peak = threading.active_count()
+        self.running = True
+        threading.Thread(target=self._sample, daemon=True).start()
+
+    def _sample(self) -> None:
+        while self.running:
+            self.peak = max(self.peak, threading.active_count())
+            time.sleep(0.005)
+
+    def stop(self) -> int:
+        self.running = False
+        return self.peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--latency", type=float, default=0.1, help="fake model and embedding seconds per call")
+    parser.add_argument("--tool-latency", type=float, default=0.3, help="seconds per quote and search")
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--sessions", type=int, default=20, help="concurrent turns in the load test")
+    args = parser.parse_args()
+
+    config = FakeModelConfig(
+        latency=args.latency, quote_latency=args.tool_latency, rules=RULES, parallel_tool_calls=True
+    )
+    server = FakeOpenAIServer(port=0, config=config).start()
+    os.environ["FAKE_OPENAI_URL"] = server.base_url
+    os.environ["ALPHA_VANTAGE_URL"] = server.base_url.removesuffix("/v1") + "/query"
+    # Measure the tools, not tool_guard's per-tool concurrency limit
+    os.environ.setdefault("TOOL_MAX_CONCURRENT", "1000")
+    sys.path.insert(0, os.getcwd())
+    os.chdir(tempfile.mkdtemp())
+    # Imported after the switches are set
+    from langchain_community.vectorstores import FAISS
+
+    import langgraph_rag_backend as backend
+    from stock_quotes import quote_cache
+
+    # Every quote goes upstream, and the search is not cached
+    quote_cache.ttl = 0
+    backend.search_tool.search_cache = None
+    backend.search_tool.api_wrapper = SimulatedSearch(latency=args.tool_latency)
+    store = FAISS.from_texts([f"Section {i} of the annual report." for i in range(20)], backend.embeddings)
+    backend._THREAD_RETRIEVERS[DOCUMENT_THREAD] = store.as_retriever(search_kwargs={"k": 4})
+
+    # A new thread per turn; the thread id is in the system prompt, so no
+    # reply comes from the response cache
+    def turn_input() -> tuple[dict, dict]:
+        return (
+            {"messages": [HumanMessage(content=QUESTION)]},
+            {"configurable": {"thread_id": f"benchmark-{uuid.uuid4().hex}"}},
+        )
+
+    def sync_turn() -> None:
+        state, run = turn_input()
+        for _ in backend.chatbot.stream(state, config=run, stream_mode="messages"):
+            pass
+
+    async def async_turn() -> None:
+        state, run = turn_input()
+        async for _ in backend.async_chatbot.astream(state, config=run, stream_mode="messages"):
+            pass
+
+    async def async_turns(count: int) -> list[float]:
+        timings = []
+        for _ in range(count):
+            started = time.perf_counter()
+            await async_turn()
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
+
+    async def async_load() -> None:
+        await asyncio.gather(*(async_turn() for _ in range(args.sessions)))
+
+    sync_turn()  # warm up connections and imports
+    before = server.stats.as_dict()["tool_calls"]
+    sync_turn()
+    tools = server.stats.as_dict()["tool_calls"] - before
+
+    sync_times = []
+    for _ in range(args.turns):
+        started = time.perf_counter()
+        sync_turn()
+        sync_times.append((time.perf_counter() - started) * 1000)
+    loop = asyncio.new_event_loop()
+    # Checkpoint I/O and sync nodes run on the default executor, which has
+    # only min(32, cpus + 4) threads; size it like the sync run's pool
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=64))
+    async_times = loop.run_until_complete(async_turns(args.turns))
+
+    print(f"one turn, {tools} parallel tool calls, {args.tool_latency:.2f} s each")
+    print(f"{'':>18} {'median ms':>10} {'max ms':>8}")
+    print(f"{'sync stream':>18} {statistics.median(sync_times):>10.0f} {max(sync_times):>8.0f}")
+    print(f"{'async astream':>18} {statistics.median(async_times):>10.0f} {max(async_times):>8.0f}")
+
+    print(f"\n{args.sessions} concurrent turns")
+    print(f"{'':>18} {'wall ms':>10} {'peak threads':>13}")
+    peak = ThreadPeak()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.sessions) as pool:
+        list(pool.map(lambda _: sync_turn(), range(args.sessions)))
+    print(f"{'sync stream':>18} {(time.perf_counter() - started) * 1000:>10.0f} {peak.stop():>13}")
+    peak = ThreadPeak()
+    started = time.perf_counter()
+    loop.run_until_complete(async_load())
+    print(f"{'async astream':>18} {(time.perf_counter() - started) * 1000:>10.0f} {peak.stop():>13}")
+    loop.close()
+    backend.checkpointer.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Model round trips for multi-step arithmetic: two-number vs. expression calculator.
+
+Runs a minimal tool-calling graph against fake_openai_server for each
+question, once with the old calculator(first_num, second_num, operation)
+and once with calculator.py's expression tool, and counts model calls,
+tool calls and wall time. With the two-number tool the fake model must wait
+for each intermediate result before asking for the step that uses it, as a
+real model would; --latency sets the cost of each of those round trips.
+
+    python -m benchmarks.calculator_round_trips --latency 0.3
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import time
+from typing import Annotated, TypedDict
+
+from langchain_core.messages import BaseMessage, HumanMessage
+from langchain_core.tools import tool
+from langgraph.graph import START, StateGraph
+from langgraph.graph.message import add_messages
+from langgraph.prebuilt import ToolNode, tools_condition
+
+from fake_openai_server import FakeModelConfig, FakeOpenAIServer
+
+QUESTIONS = [
+    "What is 17 * 23?",
+    "What is (12 * 7 + 5) / 3?",
+    "Compute ((2 + 3) * (4 + 5) - 6) / 3",
+    "What is 1.5 * 4 + 2.5 * 8 - 3 / 4?",
+    "What is ((100 - 20) * 1.08 + 15) / 12 - 3?",
+]
+
+
+@tool("calculator")
+def two_number_calculator(first_num: float, second_num: float, operation: str) -> dict:
+    """
+    Perform a basic arithmetic operation on two numbers.
+    Supported operations: add, sub, mul, div
+    """
+    operations = {
+        "add": lambda a, b: a + b,
+        "sub": lambda a, b: a - b,
+        "mul": lambda a, b: a * b,
+        "div": lambda a, b: a / b if b else None,
+    }
+    if operation not in operations:
+        return {"error": f"Unsupported operation '{operation}'"}
+    return {"result": operations[operation](first_num, second_num)}
+
+
+class State(TypedDict):
+    messages: Annotated[list[BaseMessage], add_messages]
+
+
+def build_graph(llm, calculator_tool):
+    bound = llm.bind_tools([calculator_tool])
+    graph = StateGraph(State)
+    graph.add_node("chat_node", lambda state: {"messages": [bound.invoke(state["messages"])]})
+    graph.add_node("tools", ToolNode([calculator_tool]))
+    graph.add_edge(START, "chat_node")
+    graph.add_conditional_edges("chat_node", tools_condition)
+    graph.add_edge("tools", "chat_node")
+    return graph.compile()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--latency", type=float, default=0.3, help="fake model seconds per call")
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(port=0, config=FakeModelConfig(latency=args.latency)).start()
+    os.environ["FAKE_OPENAI_URL"] = server.base_url
+    # Imported after the switch is set
+    from calculator import calculator
+    from openai_clients import chat_model
+
+    llm = chat_model(model="gpt-4o-mini")
+    variants = {"two-number": build_graph(llm, two_number_calculator), "expressions": build_graph(llm, calculator)}
+
+    print(f"{'question':<44} {'tool':>12} {'model calls':>12} {'tool calls':>11} {'ms':>8}")
+    totals = {name: [0, 0, 0.0] for name in variants}
+    for question in QUESTIONS:
+        for name, graph in variants.items():
+            before = server.stats.as_dict()
+            started = time.perf_counter()
+            graph.invoke({"messages": [HumanMessage(content=question)]})
+            elapsed = (time.perf_counter() - started) * 1000
+            after = server.stats.as_dict()
+            calls = after["chat_requests"] - before["chat_requests"]
+            tools = after["tool_calls"] - before["tool_calls"]
+            totals[name][0] += calls
+            totals[name][1] += tools
+            totals[name][2] += elapsed
+            print(f"{question[:44]:<44} {name:>12} {calls:>12} {tools:>11} {elapsed:>8.0f}")
+    for name, (calls, tools, elapsed) in totals.items():
+        print(f"{'total':<44} {name:>12} {calls:>12} {tools:>11} {elapsed:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
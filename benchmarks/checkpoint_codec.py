@@ -0,0 +1,78 @@
+"""
+Stored size and serialize/deserialize latency of checkpoint blobs per codec.
+
+Reads every checkpoint and write blob from an existing database (read-only)
+and re-encodes it with each serializer.
+
+    python -m benchmarks.checkpoint_codec --db chatbot.db
+"""
+from __future__ import annotations
+
+import argparse
+import sqlite3
+import time
+
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from checkpoint_codec import CompressedSerializer, ZlibCodec, ZstdCodec, train_zstd_dictionary
+
+
+def load_objects(db: str) -> list:
+    conn = sqlite3.connect(f"file:{db}?mode=ro", uri=True)
+    reader = CompressedSerializer()
+    rows = conn.execute("SELECT type, checkpoint FROM checkpoints").fetchall()
+    rows += conn.execute("SELECT type, value FROM writes").fetchall()
+    return [reader.loads_typed((type_, blob)) for type_, blob in rows]
+
+
+def measure(name: str, serde, objects: list, repeat: int) -> dict:
+    encoded = [serde.dumps_typed(obj) for obj in objects]
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for obj in objects:
+            serde.dumps_typed(obj)
+    write_ms = (time.perf_counter() - started) * 1000 / repeat
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for blob in encoded:
+            serde.loads_typed(blob)
+    read_ms = (time.perf_counter() - started) * 1000 / repeat
+    return {
+        "name": name,
+        "bytes": sum(len(data) for _, data in encoded),
+        "write_ms": write_ms,
+        "read_ms": read_ms,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--db", default="chatbot.db")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--dict-size", type=int, default=16 * 1024)
+    args = parser.parse_args()
+
+    objects = load_objects(args.db)
+    plain = JsonPlusSerializer()
+    samples = [data for _, data in map(plain.dumps_typed, objects) if len(data) > 64]
+    # Train on half the blobs so the dictionary row is not purely in-sample
+    dictionary = train_zstd_dictionary(samples[::2], dict_size=args.dict_size)
+
+    results = [
+        measure("uncompressed", plain, objects, args.repeat),
+        measure("zlib-6", CompressedSerializer(ZlibCodec()), objects, args.repeat),
+        measure("zstd-3", CompressedSerializer(ZstdCodec()), objects, args.repeat),
+        measure("zstd-3+dict", CompressedSerializer(ZstdCodec(dictionary=dictionary)), objects, args.repeat),
+    ]
+    base = results[0]["bytes"]
+    print(f"{len(objects)} blobs from {args.db}")
+    print(f"{'codec':>12} {'bytes':>12} {'ratio':>6} {'write ms':>9} {'read ms':>8}")
+    for r in results:
+        print(
+            f"{r['name']:>12} {r['bytes']:>12,} {base / r['bytes']:>6.2f} "
+            f"{r['write_ms']:>9.1f} {r['read_ms']:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Bytes written per turn vs. history length, full vs. delta-encoded checkpoints.
+
+Runs a one-node chat graph against a fake chat model (no network), so only
+checkpoint serialization and storage are measured.
+
+    python -m benchmarks.checkpoint_delta --turns 200
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from typing import Annotated, TypedDict
+
+from langchain_core.language_models.fake_chat_models import FakeMessagesListChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langgraph.graph import END, START, StateGraph
+from langgraph.graph.message import add_messages
+
+from sqlite_checkpointer import IndexedSqliteSaver
+
+REPLY = "This is a fairly typical assistant reply with a bit of detail. " * 10
+
+
+class ChatState(TypedDict):
+    messages: Annotated[list[BaseMessage], add_messages]
+
+
+def stored_bytes(conn: sqlite3.Connection) -> int:
+    (checkpoints,) = conn.execute(
+        "SELECT COALESCE(SUM(LENGTH(checkpoint) + LENGTH(metadata)), 0) FROM checkpoints"
+    ).fetchone()
+    (writes,) = conn.execute("SELECT COALESCE(SUM(LENGTH(value)), 0) FROM writes").fetchone()
+    return checkpoints + writes
+
+
+def run(turns: int, delta: bool, report_every: int) -> dict:
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    conn = sqlite3.connect(path, check_same_thread=False)
+    saver = IndexedSqliteSaver(conn, delta_messages=delta)
+    saver.setup()
+    llm = FakeMessagesListChatModel(responses=[AIMessage(content=REPLY) for _ in range(turns)])
+
+    graph = StateGraph(ChatState)
+    graph.add_node("chat_node", lambda state: {"messages": [llm.invoke(state["messages"])]})
+    graph.add_edge(START, "chat_node")
+    graph.add_edge("chat_node", END)
+    chatbot = graph.compile(checkpointer=saver)
+
+    config = {"configurable": {"thread_id": "bench"}}
+    per_turn = {}
+    before = stored_bytes(conn)
+    started = time.perf_counter()
+    for turn in range(1, turns + 1):
+        chatbot.invoke({"messages": [HumanMessage(content=f"Question {turn}?")]}, config)
+        after = stored_bytes(conn)
+        if turn % report_every == 0 or turn == 1:
+            per_turn[turn] = after - before
+        before = after
+    write_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    state = chatbot.get_state(config)
+    read_ms = (time.perf_counter() - started) * 1000
+    assert len(state.values["messages"]) == 2 * turns
+
+    return {
+        "per_turn": per_turn,
+        "total": stored_bytes(conn),
+        "write_seconds": write_seconds,
+        "read_ms": read_ms,
+        "file_bytes": os.path.getsize(path),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--report-every", type=int, default=25)
+    args = parser.parse_args()
+
+    full = run(args.turns, delta=False, report_every=args.report_every)
+    delta = run(args.turns, delta=True, report_every=args.report_every)
+
+    print(f"{'turn':>6} {'history':>8} {'full B/turn':>12} {'delta B/turn':>13}")
+    for turn, full_bytes in full["per_turn"].items():
+        print(f"{turn:>6} {2 * turn:>8} {full_bytes:>12,} {delta['per_turn'][turn]:>13,}")
+    print()
+    for name, result in (("full", full), ("delta", delta)):
+        print(
+            f"{name:>5}: stored {result['total']:,} B, file {result['file_bytes']:,} B, "
+            f"{args.turns} turns in {result['write_seconds']:.2f}s, "
+            f"latest state read {result['read_ms']:.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
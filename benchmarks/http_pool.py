@@ -0,0 +1,71 @@
+"""
+Connection reuse with the shared HTTP pools, against fake_openai_server.
+
+Times tool-style GETs with a bare requests.get (a new connection per call)
+and with the shared client, then chat completions through chat_model(),
+and prints pool_stats(). Over TLS to a remote API the gap per new
+connection is a full TCP+TLS handshake, far more than on loopback.
+
+    python -m benchmarks.http_pool --calls 200
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import requests
+
+from fake_openai_server import FakeOpenAIServer
+
+
+def time_ms(fn, repeat: int) -> list[float]:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def report(name: str, timings: list[float]) -> None:
+    timings = sorted(timings)
+    p95 = timings[int(0.95 * (len(timings) - 1))]
+    print(f"{name:>28} {statistics.median(timings):>10.3f} {p95:>8.3f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calls", type=int, default=200)
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(port=0).start()
+    os.environ["FAKE_OPENAI_URL"] = server.base_url
+    # Imported after the switch is set
+    from http_clients import TOOL_TIMEOUT, http_client, pool_stats
+    from openai_clients import chat_model
+
+    url = f"{server.base_url}/models"
+    print(f"{'':>28} {'median ms':>10} {'p95 ms':>8}")
+    report("GET, requests.get", time_ms(lambda: requests.get(url, timeout=10).json(), args.calls))
+    report("GET, shared client", time_ms(lambda: http_client().get(url, timeout=TOOL_TIMEOUT).json(), args.calls))
+
+    llm = chat_model(model="gpt-4o-mini")
+    report("chat, invoke", time_ms(lambda: llm.invoke("hello"), args.calls))
+    report("chat, stream", time_ms(lambda: list(llm.stream("hello")), args.calls))
+
+    async def concurrent() -> None:
+        await asyncio.gather(*(llm.ainvoke(f"hello {i}") for i in range(args.calls)))
+
+    started = time.perf_counter()
+    asyncio.run(concurrent())
+    print(f"{args.calls} concurrent ainvoke: {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    for pool, usage in pool_stats().items():
+        print(f"{pool}: {usage}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Full-text thread search latency against a large synthetic history.
+
+Fills the message log and search index directly (no graph runs), then times
+search_threads() for rare, common and prefix queries, and the cost of
+indexing one more turn.
+
+    python -m benchmarks.thread_search --threads 2000 --messages 50
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from sqlite_checkpointer import IndexedSqliteSaver
+
+WORDS = (
+    "share price apple stock market news weather delhi india policy travel "
+    "python code error install model train data chart sales report budget "
+    "meeting email draft summary recipe pasta music movie book review"
+).split()
+
+QUERIES = {
+    "rare word": "zephyr",
+    "common word": "price",
+    "two words": "apple stock",
+    "prefix": "summ",
+}
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def build(threads: int, messages: int, seed: int = 0) -> IndexedSqliteSaver:
+    rng = random.Random(seed)
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    saver = IndexedSqliteSaver(sqlite3.connect(path, check_same_thread=False))
+    saver.setup()
+    with saver.cursor() as cur:
+        for thread in range(threads):
+            history = [
+                HumanMessage(content=sentence(rng, 12)) if i % 2 == 0 else AIMessage(content=sentence(rng, 40))
+                for i in range(messages)
+            ]
+            if thread % 97 == 0:
+                history[0] = HumanMessage(content="tell me about the zephyr wind")
+            saver._write_message_log(cur, f"t{thread}", 0, saver._message_log_rows(history))
+    return saver
+
+
+def time_ms(fn, repeat: int) -> list[float]:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--threads", type=int, default=2000)
+    parser.add_argument("--messages", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    saver = build(args.threads, args.messages)
+    print(
+        f"indexed {args.threads * args.messages:,} messages in {args.threads:,} threads "
+        f"in {time.perf_counter() - started:.1f}s"
+    )
+
+    print(f"{'query':>12} {'hits':>5} {'median ms':>10} {'p95 ms':>8}")
+    for name, query in QUERIES.items():
+        hits = len(saver.search_threads(query))
+        timings = sorted(time_ms(lambda: saver.search_threads(query), args.repeat))
+        p95 = timings[int(0.95 * (len(timings) - 1))]
+        print(f"{name:>12} {hits:>5} {statistics.median(timings):>10.2f} {p95:>8.2f}")
+
+    turn = [HumanMessage(content="one more question"), AIMessage(content="one more answer")]
+    rows = saver._message_log_rows(turn, 0)
+    rows = [(args.messages + i, *row[1:]) for i, row in enumerate(rows)]
+
+    def append_turn():
+        with saver.cursor() as cur:
+            saver._write_message_log(cur, "t0", args.messages, rows)
+
+    timings = time_ms(append_turn, args.repeat)
+    print(f"index one turn (2 messages): median {statistics.median(timings):.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import ast
+import re
+from functools import reduce
+from typing import Any, Optional, Union
+
+import numpy as np
+from langchain_core.tools import tool
+
+# -------------------
+# 1. Settings
+# -------------------
+MAX_EXPRESSIONS = 50
+MAX_EXPRESSION_CHARS = 500
+MAX_ARRAY_SIZE = 100_000
+# Exponents beyond this are refused rather than computed
+MAX_EXPONENT = 1_000
+# Longer array results are cut to this many items in the tool output
+MAX_RESULT_ITEMS = 100
+
+ASSIGNMENT = re.compile(r"^\s*([A-Za-z_]\w*)\s*=(?!=)\s*(.+)$", re.DOTALL)
+
+BINARY_OPERATORS = {
+    ast.Add: np.add,
+    ast.Sub: np.subtract,
+    ast.Mult: np.multiply,
+    ast.Div: np.true_divide,
+    ast.FloorDiv: np.floor_divide,
+    ast.Mod: np.mod,
+    ast.Pow: np.power,
+}
+UNARY_OPERATORS = {ast.UAdd: np.positive, ast.USub: np.negative}
+# Element-wise; round() also takes a number of decimals
+ELEMENTWISE = {
+    "abs": np.abs,
+    "sqrt": np.sqrt,
+    "exp": np.exp,
+    "log": np.log,
+    "log10": np.log10,
+    "log2": np.log2,
+    "sin": np.sin,
+    "cos": np.cos,
+    "tan": np.tan,
+    "floor": np.floor,
+    "ceil": np.ceil,
+    "round": np.round,
+}
+# Over one array, or across several arguments: max(a, b) is element-wise
+REDUCTIONS = {
+    "sum": np.sum,
+    "prod": np.prod,
+    "mean": np.mean,
+    "median": np.median,
+    "std": np.std,
+    "min": np.min,
+    "max": np.max,
+}
+CONSTANTS = {"pi": np.float64(np.pi), "e": np.float64(np.e)}
+RESERVED = set(ELEMENTWISE) | set(REDUCTIONS) | set(CONSTANTS)
+
+
+class ExpressionError(ValueError):
+    pass
+
+
+# -------------------
+# 2. Evaluator
+# -------------------
+def _array(value: Any) -> np.ndarray:
+    array = np.asarray(value, dtype=np.float64)
+    if array.ndim > 1 or array.size > MAX_ARRAY_SIZE:
+        raise ExpressionError(f"Arrays must be flat and at most {MAX_ARRAY_SIZE} items")
+    return array
+
+
+def _call(node: ast.Call, names: dict[str, Any]) -> Any:
+    if not isinstance(node.func, ast.Name) or node.keywords:
+        raise ExpressionError("Only plain calls like sqrt(x) are supported")
+    name = node.func.id
+    args = [_evaluate(arg, names) for arg in node.args]
+    if name in ELEMENTWISE:
+        if name == "round" and len(args) == 2:
+            return np.round(args[0], int(args[1]))
+        if len(args) != 1:
+            raise ExpressionError(f"{name}() takes one argument")
+        return ELEMENTWISE[name](args[0])
+    if name in REDUCTIONS:
+        if not args:
+            raise ExpressionError(f"{name}() needs an argument")
+        if len(args) == 1:
+            return REDUCTIONS[name](args[0])
+        if name in ("min", "max"):
+            return reduce(np.minimum if name == "min" else np.maximum, args)
+        return REDUCTIONS[name](np.stack(np.broadcast_arrays(*args)), axis=0)
+    raise ExpressionError(f"Unknown function '{name}'")
+
+
+def _evaluate(node: ast.AST, names: dict[str, Any]) -> Any:
+    if isinstance(node, ast.Expression):
+        return _evaluate(node.body, names)
+    if isinstance(node, ast.Constant):
+        if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+            raise ExpressionError(f"Unsupported constant {node.value!r}")
+        return np.float64(node.value)
+    if isinstance(node, ast.Name):
+        if node.id in names:
+            return names[node.id]
+        if node.id in CONSTANTS:
+            return CONSTANTS[node.id]
+        raise ExpressionError(f"Unknown name '{node.id}'")
+    if isinstance(node, (ast.List, ast.Tuple)):
+        items = [_evaluate(item, names) for item in node.elts]
+        if any(np.ndim(item) for item in items):
+            raise ExpressionError("List items must be numbers")
+        return _array(items)
+    if isinstance(node, ast.UnaryOp) and type(node.op) in UNARY_OPERATORS:
+        return UNARY_OPERATORS[type(node.op)](_evaluate(node.operand, names))
+    if isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPERATORS:
+        left, right = _evaluate(node.left, names), _evaluate(node.right, names)
+        if isinstance(node.op, ast.Pow) and np.any(np.abs(right) > MAX_EXPONENT):
+            raise ExpressionError(f"Exponents above {MAX_EXPONENT} are not supported")
+        if isinstance(node.op, (ast.Div, ast.FloorDiv, ast.Mod)) and np.any(right == 0):
+            raise ExpressionError("Division by zero is not allowed")
+        return BINARY_OPERATORS[type(node.op)](left, right)
+    if isinstance(node, ast.Call):
+        return _call(node, names)
+    raise ExpressionError(f"Unsupported syntax: {type(node).__name__}")
+
+
+def evaluate(expression: str, names: Optional[dict[str, Any]] = None) -> Any:
+    """
+    Value of one arithmetic expression: a float64 scalar or a 1-D array.
+
+    Only numbers, lists of numbers, + - * / // % ** (or ^), the functions in
+    ELEMENTWISE and REDUCTIONS, pi, e and `names` are allowed; anything else
+    raises ExpressionError before evaluation, and so do errors during it.
+    """
+    if len(expression) > MAX_EXPRESSION_CHARS:
+        raise ExpressionError(f"Expressions are limited to {MAX_EXPRESSION_CHARS} characters")
+    try:
+        tree = ast.parse(expression.replace("^", "**"), mode="eval")
+    except SyntaxError as e:
+        raise ExpressionError(f"Invalid expression: {e.msg}") from None
+    with np.errstate(divide="raise", over="raise", invalid="raise"):
+        try:
+            return _evaluate(tree, names or {})
+        except ExpressionError:
+            raise
+        except FloatingPointError as e:
+            raise ExpressionError(str(e).capitalize()) from None
+        # NumPy's own complaints: shapes that don't broadcast, bad arguments
+        except (ValueError, TypeError, ZeroDivisionError, OverflowError) as e:
+            raise ExpressionError(str(e) or type(e).__name__) from None
+
+
+def _plain(value: Any) -> Any:
+    """JSON-friendly: integral values as ints, long arrays cut to MAX_RESULT_ITEMS."""
+    if np.ndim(value):
+        return [_plain(item) for item in value[:MAX_RESULT_ITEMS]]
+    value = float(value)
+    return int(value) if value.is_integer() and abs(value) < 2**53 else value
+
+
+def evaluate_all(
+    expressions: list[str], variables: Optional[dict[str, Union[float, list[float]]]] = None
+) -> list[dict[str, Any]]:
+    """
+    Evaluate `expressions` in order. "name = expr" stores the value under
+    `name` for later expressions. A failed expression reports its error and
+    the rest still run; those using its name fail with a pointer to it.
+    """
+    names: dict[str, Any] = {}
+    failed: set[str] = set()
+    for name, value in (variables or {}).items():
+        names[name] = _array(value) if isinstance(value, list) else np.float64(value)
+
+    results = []
+    for expression in expressions[:MAX_EXPRESSIONS]:
+        entry: dict[str, Any] = {"expression": expression}
+        found = ASSIGNMENT.match(expression)
+        target, source = (found.group(1), found.group(2)) if found else (None, expression)
+        try:
+            if target in RESERVED:
+                raise ExpressionError(f"'{target}' is a reserved name")
+            value = evaluate(source, names)
+            if target:
+                names[target] = value
+                failed.discard(target)
+            entry["result"] = _plain(value)
+            if np.ndim(value) and np.size(value) > MAX_RESULT_ITEMS:
+                entry["size"] = int(np.size(value))
+        except ExpressionError as e:
+            message = str(e)
+            unknown = re.match(r"Unknown name '(\w+)'", message)
+            if unknown and unknown.group(1) in failed:
+                message = f"'{unknown.group(1)}' failed earlier"
+            if target:
+                failed.add(target)
+            entry["error"] = message
+        results.append(entry)
+    if len(expressions) > MAX_EXPRESSIONS:
+        results.append({"error": f"Only the first {MAX_EXPRESSIONS} expressions were evaluated"})
+    return results
+
+
+# -------------------
+# 3. Tool
+# -------------------
+@tool
+def calculator(
+    expressions: list[str], variables: Optional[dict[str, Union[float, list[float]]]] = None
+) -> dict:
+    """
+    Evaluate arithmetic expressions in one call, in order. Put every step of
+    a multi-step calculation in the same call instead of calling repeatedly.
+    Write "name = expression" to reuse a result later, e.g.
+    ["subtotal = 3 * 19.99", "tax = subtotal * 0.08", "subtotal + tax"].
+    Supports + - * / // % ** (or ^), parentheses, pi, e and
+    abs sqrt exp log log10 log2 sin cos tan floor ceil round
+    sum prod mean median std min max.
+    Lists like [1, 2, 3] (or list `variables`) are computed element-wise.
+    """
+    return {"results": evaluate_all(expressions, variables)}
@@ -1,6 +1,6 @@
 from typing import TypedDict, Annotated, List
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
+from openai_clients import chat_model
 from langgraph.graph import StateGraph, START, END
 from langchain_community.tools import DuckDuckGoSearchResults
 from langchain_core.messages import BaseMessage, HumanMessage
@@ -9,9 +9,18 @@ from langgraph.prebuilt import ToolNode, tools_condition
 from langchain_core.tools import tool
 import asyncio
 from langchain_mcp_adapters.client import MultiServerMCPClient
+from checkpoint_codec import CompressedSerializer
+from sqlite_checkpointer import PooledSqliteSaver
+from checkpoint_retention import start_compaction_from_env
+from llm_cache import ResponseCache
+from context_window import build_context
+from model_router import ModelRouter
+from http_clients import mcp_http_client_factory
+from tool_guard import guarded_tools
 
 load_dotenv()
-llm = ChatOpenAI(model="gpt-5")
+# Repeated prompts (and cached tool calls) are answered from llm_cache.db
+llm = chat_model(model="gpt-5", cache=ResponseCache())
 
 # @tool
 # def calculator(first_num:float, second_num: float, operation: str)-> dict:
@@ -48,7 +57,9 @@ client = MultiServerMCPClient(
         },
         "expense":{
             "transport":"streamable_http",
-            "url":"https://splendid-gold-dingo.fastmcp.app/mcp"
+            "url":"https://splendid-gold-dingo.fastmcp.app/mcp",
+            # Sessions reuse the process-wide async connection pool
+            "httpx_client_factory":mcp_http_client_factory
         }
     }
 )
@@ -61,14 +72,22 @@ client = MultiServerMCPClient(
 class ChatState(TypedDict):
     messages: Annotated[list[BaseMessage],add_messages]
 
-async def build_graph():
-    tools = await client.get_tools()
+async def build_graph(checkpointer=None):
+    """
+    Compile the MCP chatbot. Pass a checkpointer with async support (e.g.
+    PooledSqliteSaver) to persist conversations; None keeps them in-flight only.
+    """
+    # Each call has a deadline, a concurrency limit and a circuit breaker (tool_guard.py)
+    tools = guarded_tools(await client.get_tools())
     # print(tools)
-    llm_with_tools = llm.bind_tools(tools)
+    # Cheapest adequate model per turn when MODEL_ROUTING=1, else always llm
+    router = ModelRouter(llm, tools=tools)
 
     async def chat_node(state:ChatState):
-        messages = state["messages"]
-        response =await llm_with_tools.ainvoke(messages)
+        # Recent turns only, within the token budget
+        route = router.route(state["messages"])
+        context = build_context(state["messages"], model=route.model)
+        response = await router.ainvoke(route, context.messages)
         return {'messages':[response]}
     
     tool_node = ToolNode(tools)
@@ -82,17 +101,27 @@ async def build_graph():
     graph.add_conditional_edges("chat_node",tools_condition)
     graph.add_edge("tools","chat_node")
 
-    chatbot = graph.compile()
+    chatbot = graph.compile(checkpointer=checkpointer)
 
     return chatbot
 
 async def main():
-    chatbot = await build_graph()
+    # Same chatbot.db schema as the Streamlit backends; I/O runs off the event loop
+    checkpointer = PooledSqliteSaver(
+        "chatbot.db", serde=CompressedSerializer(), delta_messages=True
+    )
+    # Opt-in pruning of old checkpoints (CHECKPOINT_KEEP_LAST / CHECKPOINT_COMPACT_INTERVAL)
+    compaction = start_compaction_from_env(checkpointer)
+    chatbot = await build_graph(checkpointer)
+    config = {"configurable": {"thread_id": "async-demo"}}
 
     # result =await chatbot.ainvoke({"messages":[HumanMessage(content="Find the sum of 130 and 23 and give the answer like a cricket commentator.")]})
     # result =await chatbot.ainvoke({"messages":[HumanMessage(content="Add an expence - Rs 3000 on Dinner on 10th December")]})
-    result =await chatbot.ainvoke({"messages":[HumanMessage(content="give me all my expences for the month of December")]})
+    result =await chatbot.ainvoke({"messages":[HumanMessage(content="give me all my expences for the month of December")]}, config=config)
     print(result['messages'][-1].content)
+    if compaction:
+        compaction.set()
+    checkpointer.close()
 
 
 if __name__ == '__main__':
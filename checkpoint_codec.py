@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import zlib
+from typing import Any, Iterable, Optional, Protocol
+
+import zstandard
+from langgraph.checkpoint.base import SerializerProtocol
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+# -------------------
+# 1. Codecs
+# -------------------
+# Blobs smaller than this (branch markers, empty writes) are stored as-is
+MIN_COMPRESS_BYTES = 64
+TYPE_SEPARATOR = "+"
+
+
+class Codec(Protocol):
+    """A byte compressor. `name` is stored with each blob, so it must be stable."""
+
+    name: str
+
+    def compress(self, data: bytes) -> bytes: ...
+
+    def decompress(self, data: bytes) -> bytes: ...
+
+
+class ZstdCodec:
+    """Zstandard, optionally with a trained dictionary (see train_zstd_dictionary)."""
+
+    def __init__(self, level: int = 3, dictionary: Optional[bytes] = None) -> None:
+        self.level = level
+        self.dictionary = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+        self.name = f"zstd.{self.dictionary.dict_id()}" if self.dictionary else "zstd"
+
+    # zstandard contexts are not thread-safe, and cheap enough to create per call
+    def compress(self, data: bytes) -> bytes:
+        return zstandard.ZstdCompressor(level=self.level, dict_data=self.dictionary).compress(data)
+
+    def decompress(self, data: bytes) -> bytes:
+        return zstandard.ZstdDecompressor(dict_data=self.dictionary).decompress(data)
+
+
+class ZlibCodec:
+    """Standard-library fallback codec."""
+
+    def __init__(self, level: int = 6) -> None:
+        self.level = level
+        self.name = "zlib"
+
+    def compress(self, data: bytes) -> bytes:
+        return zlib.compress(data, self.level)
+
+    def decompress(self, data: bytes) -> bytes:
+        return zlib.decompress(data)
+
+
+def train_zstd_dictionary(samples: Iterable[bytes], dict_size: int = 64 * 1024) -> bytes:
+    """Train a zstd dictionary from uncompressed serialized blobs."""
+    return zstandard.train_dictionary(dict_size, list(samples)).as_bytes()
+
+
+# -------------------
+# 2. Serializer
+# -------------------
+class CompressedSerializer(SerializerProtocol):
+    """
+    Wraps a checkpoint serializer and compresses its output.
+
+    The codec name is prefixed to the stored type (e.g. "zstd+msgpack"), so rows
+    written before compression was enabled, or with another codec listed in
+    `read_codecs`, still load.
+    """
+
+    def __init__(
+        self,
+        codec: Optional[Codec] = None,
+        serde: Optional[SerializerProtocol] = None,
+        read_codecs: Iterable[Codec] = (),
+        min_size: int = MIN_COMPRESS_BYTES,
+    ) -> None:
+        self.codec = codec or ZstdCodec()
+        self.serde = serde or JsonPlusSerializer()
+        self.min_size = min_size
+        self.codecs = {c.name: c for c in (ZstdCodec(), ZlibCodec(), *read_codecs)}
+        self.codecs[self.codec.name] = self.codec
+
+    def dumps(self, obj: Any) -> bytes:
+        return self.serde.dumps(obj)
+
+    def loads(self, data: bytes) -> Any:
+        return self.serde.loads(data)
+
+    def dumps_typed(self, obj: Any) -> tuple[str, bytes]:
+        type_, data = self.serde.dumps_typed(obj)
+        if len(data) < self.min_size:
+            return type_, data
+        compressed = self.codec.compress(data)
+        if len(compressed) >= len(data):
+            return type_, data
+        return f"{self.codec.name}{TYPE_SEPARATOR}{type_}", compressed
+
+    def loads_typed(self, data: tuple[str, bytes]) -> Any:
+        type_, payload = data
+        codec_name, sep, inner_type = type_.partition(TYPE_SEPARATOR)
+        if sep and codec_name in self.codecs:
+            return self.serde.loads_typed((inner_type, self.codecs[codec_name].decompress(payload)))
+        if sep:
+            raise ValueError(f"No codec registered for stored type '{type_}'")
+        return self.serde.loads_typed(data)
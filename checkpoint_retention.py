@@ -0,0 +1,256 @@
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import sqlite3
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+from checkpoint_codec import CompressedSerializer
+from sqlite_checkpointer import IndexedSqliteSaver
+
+logger = logging.getLogger(__name__)
+
+# -------------------
+# 1. Policy
+# -------------------
+RETENTION_SCHEMA = """
+CREATE TABLE IF NOT EXISTS thread_compaction (
+    thread_id TEXT PRIMARY KEY,
+    compacted_at TEXT NOT NULL
+);
+"""
+
+# Stay well below SQLite's bound-parameter limit
+DELETE_CHUNK = 500
+
+
+@dataclass
+class RetentionPolicy:
+    """
+    What compaction keeps for each thread. The latest checkpoint is always kept.
+
+    keep_last: keep at most this many checkpoints (None keeps all candidates).
+    turn_boundaries_only: candidates are only checkpoints where a turn finished,
+        i.e. whose child is the next turn's input checkpoint (or was, before
+        an earlier run deleted it).
+    drop_completed_writes: delete pending writes of every checkpoint but the
+        latest; they have already been applied to its children.
+    vacuum_pages: pages to release with PRAGMA incremental_vacuum afterwards
+        (0 disables, None releases all free pages).
+    """
+
+    keep_last: Optional[int] = None
+    turn_boundaries_only: bool = False
+    drop_completed_writes: bool = True
+    vacuum_pages: Optional[int] = 0
+
+
+def _kept_checkpoints(rows: list[tuple[str, Optional[str], Optional[str]]], policy: RetentionPolicy) -> set:
+    """rows are (checkpoint_id, parent_checkpoint_id, source), newest first."""
+    candidates = [checkpoint_id for checkpoint_id, _, _ in rows]
+    if policy.turn_boundaries_only:
+        turn_ends = {parent_id for _, parent_id, source in rows if source == "input"}
+        # Boundaries kept by an earlier run have lost the input checkpoint after them
+        parents = {parent_id for _, parent_id, _ in rows}
+        turn_ends.update(checkpoint_id for checkpoint_id, _, _ in rows[1:] if checkpoint_id not in parents)
+        candidates = [checkpoint_id for checkpoint_id in candidates if checkpoint_id in turn_ends]
+    if policy.keep_last is not None:
+        candidates = candidates[: policy.keep_last]
+    return {rows[0][0], *candidates}
+
+
+# -------------------
+# 2. Compaction
+# -------------------
+def _compact_namespace(
+    saver: IndexedSqliteSaver, cur, thread_id: str, checkpoint_ns: str, policy: RetentionPolicy
+) -> dict:
+    rows = cur.execute(
+        "SELECT checkpoint_id, parent_checkpoint_id, "
+        "json_extract(CAST(metadata AS TEXT), '$.source') FROM checkpoints "
+        "WHERE thread_id = ? AND checkpoint_ns = ? ORDER BY checkpoint_id DESC",
+        (thread_id, checkpoint_ns),
+    ).fetchall()
+    stats = {"checkpoints_deleted": 0, "writes_deleted": 0, "snapshots_rewritten": 0}
+    if not rows:
+        return stats
+
+    kept = _kept_checkpoints(rows, policy)
+    dropped = [checkpoint_id for checkpoint_id, _, _ in rows if checkpoint_id not in kept]
+
+    # A kept delta whose parent goes away must become a full snapshot first
+    dropped_set = set(dropped)
+    for checkpoint_id, parent_id, _ in rows:
+        if checkpoint_id in kept and parent_id in dropped_set:
+            if saver.materialize_checkpoint(cur, thread_id, checkpoint_ns, checkpoint_id):
+                stats["snapshots_rewritten"] += 1
+
+    for start in range(0, len(dropped), DELETE_CHUNK):
+        chunk = dropped[start : start + DELETE_CHUNK]
+        placeholders = ", ".join("?" * len(chunk))
+        for table, key in (("checkpoints", "checkpoints_deleted"), ("writes", "writes_deleted")):
+            cur.execute(
+                f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_ns = ? "
+                f"AND checkpoint_id IN ({placeholders})",
+                (thread_id, checkpoint_ns, *chunk),
+            )
+            stats[key] += cur.rowcount
+
+    if policy.drop_completed_writes:
+        cur.execute(
+            "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id != ?",
+            (thread_id, checkpoint_ns, rows[0][0]),
+        )
+        stats["writes_deleted"] += cur.rowcount
+    return stats
+
+
+def compact_checkpoints(
+    saver: IndexedSqliteSaver, policy: RetentionPolicy, max_threads: Optional[int] = None
+) -> dict:
+    """
+    Apply the retention policy to threads with activity since their last compaction.
+
+    Each thread is compacted in its own short transaction under the saver's lock,
+    so graphs can keep writing while the job runs.
+    """
+    with saver.cursor() as cur:
+        cur.executescript(RETENTION_SCHEMA)
+        cur.execute(
+            "SELECT c.thread_id, c.last_activity FROM thread_catalog c "
+            "LEFT JOIN thread_compaction k ON k.thread_id = c.thread_id "
+            "WHERE k.compacted_at IS NULL OR k.compacted_at < c.last_activity "
+            "ORDER BY c.last_activity LIMIT ?",
+            (-1 if max_threads is None else max_threads,),
+        )
+        pending = cur.fetchall()
+
+    totals = {"threads": 0, "checkpoints_deleted": 0, "writes_deleted": 0, "snapshots_rewritten": 0}
+    for thread_id, last_activity in pending:
+        with saver.cursor() as cur:
+            namespaces = [
+                ns
+                for (ns,) in cur.execute(
+                    "SELECT DISTINCT checkpoint_ns FROM checkpoints WHERE thread_id = ?",
+                    (thread_id,),
+                ).fetchall()
+            ]
+            for checkpoint_ns in namespaces:
+                for key, value in _compact_namespace(saver, cur, thread_id, checkpoint_ns, policy).items():
+                    totals[key] += value
+            cur.execute(
+                "INSERT OR REPLACE INTO thread_compaction (thread_id, compacted_at) VALUES (?, ?)",
+                (thread_id, last_activity),
+            )
+        totals["threads"] += 1
+
+    totals["pages_freed"] = incremental_vacuum(saver, policy.vacuum_pages)
+    return totals
+
+
+# -------------------
+# 3. Vacuum
+# -------------------
+def enable_incremental_vacuum(conn: sqlite3.Connection) -> None:
+    """
+    Switch the database to auto_vacuum=INCREMENTAL.
+
+    Existing databases need one full VACUUM for this to take effect, which
+    rewrites the file; run it once during a quiet period.
+    """
+    (mode,) = conn.execute("PRAGMA auto_vacuum").fetchone()
+    if mode == 2:
+        return
+    conn.commit()
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("VACUUM")
+
+
+def incremental_vacuum(saver: IndexedSqliteSaver, pages: Optional[int]) -> int:
+    """Release up to `pages` free pages (all if None); returns how many were freed."""
+    if pages == 0:
+        return 0
+    with saver.cursor() as cur:
+        (mode,) = cur.execute("PRAGMA auto_vacuum").fetchone()
+        if mode != 2:
+            return 0
+        (before,) = cur.execute("PRAGMA freelist_count").fetchone()
+        # execute() only steps the pragma once (one page); executescript runs it to completion
+        if pages is None:
+            cur.executescript("PRAGMA incremental_vacuum;")
+        else:
+            cur.executescript(f"PRAGMA incremental_vacuum({int(pages)});")
+        (after,) = cur.execute("PRAGMA freelist_count").fetchone()
+    return before - after
+
+
+# -------------------
+# 4. Background job
+# -------------------
+def start_compaction(
+    saver: IndexedSqliteSaver,
+    policy: RetentionPolicy,
+    interval_seconds: float = 600,
+    max_threads: Optional[int] = 100,
+) -> threading.Event:
+    """Run compaction periodically on a daemon thread; set the returned event to stop it."""
+    stop = threading.Event()
+
+    def run() -> None:
+        while not stop.wait(interval_seconds):
+            try:
+                compact_checkpoints(saver, policy, max_threads=max_threads)
+            # Any failure (e.g. a delta whose parent is missing) is logged and
+            # retried next interval; an escaped exception would end the thread
+            except Exception:
+                logger.exception("Checkpoint compaction failed")
+
+    threading.Thread(target=run, name="checkpoint-compaction", daemon=True).start()
+    return stop
+
+
+def start_compaction_from_env(saver: IndexedSqliteSaver) -> Optional[threading.Event]:
+    """
+    start_compaction() as configured by the environment, for the backends.
+
+    Off unless CHECKPOINT_KEEP_LAST or CHECKPOINT_COMPACT_INTERVAL is set.
+    CHECKPOINT_KEEP_LAST limits checkpoints kept per thread (unset: keep
+    all, and only drop completed writes); CHECKPOINT_TURN_BOUNDARIES_ONLY=1
+    keeps only checkpoints where a turn finished; CHECKPOINT_COMPACT_INTERVAL
+    is the seconds between runs (default 600).
+    """
+    keep_last = os.getenv("CHECKPOINT_KEEP_LAST")
+    interval = os.getenv("CHECKPOINT_COMPACT_INTERVAL")
+    if not keep_last and not interval:
+        return None
+    policy = RetentionPolicy(
+        keep_last=int(keep_last) if keep_last else None,
+        turn_boundaries_only=os.getenv("CHECKPOINT_TURN_BOUNDARIES_ONLY") == "1",
+    )
+    return start_compaction(saver, policy, interval_seconds=float(interval or 600))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compact chatbot checkpoints.")
+    parser.add_argument("--db", default="chatbot.db")
+    parser.add_argument("--keep-last", type=int, default=None)
+    parser.add_argument("--turn-boundaries-only", action="store_true")
+    parser.add_argument("--keep-writes", action="store_true")
+    parser.add_argument("--vacuum", action="store_true", help="enable incremental vacuum and free all pages")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(database=args.db, check_same_thread=False)
+    saver = IndexedSqliteSaver(conn=conn, serde=CompressedSerializer())
+    if args.vacuum:
+        saver.setup()
+        enable_incremental_vacuum(conn)
+    policy = RetentionPolicy(
+        keep_last=args.keep_last,
+        turn_boundaries_only=args.turn_boundaries_only,
+        drop_completed_writes=not args.keep_writes,
+        vacuum_pages=None if args.vacuum else 0,
+    )
+    print(compact_checkpoints(saver, policy))
@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+
+import tiktoken
+from langchain_core.messages import (
+    AIMessage,
+    BaseMessage,
+    HumanMessage,
+    SystemMessage,
+    ToolMessage,
+)
+
+logger = logging.getLogger(__name__)
+
+# -------------------
+# 1. Token counting
+# -------------------
+DEFAULT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "8000"))
+FALLBACK_ENCODING = "o200k_base"
+# Used when tiktoken cannot load its BPE files (they are downloaded on first use)
+CHARS_PER_TOKEN = 4
+
+# Per-message framing overhead of the OpenAI chat format, and the reply primer
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_NAME = 1
+TOKENS_PER_REPLY = 3
+
+
+@lru_cache(maxsize=None)
+def _encoding_name(model: str) -> Optional[str]:
+    try:
+        try:
+            return tiktoken.encoding_for_model(model).name
+        except KeyError:
+            return tiktoken.get_encoding(FALLBACK_ENCODING).name
+    except Exception:
+        logger.warning("tiktoken encoding unavailable for %s; estimating token counts", model)
+        return None
+
+
+# History is re-counted every turn; cache the per-text counts, keyed by a
+# digest so the cache doesn't hold on to whole messages
+COUNT_CACHE_SIZE = 16384
+_counts: OrderedDict[tuple[Optional[str], bytes], int] = OrderedDict()
+_counts_lock = threading.Lock()
+
+
+def _count_text(encoding_name: Optional[str], text: str) -> int:
+    key = (encoding_name, hashlib.blake2b(text.encode(), digest_size=16).digest())
+    with _counts_lock:
+        count = _counts.get(key)
+        if count is not None:
+            _counts.move_to_end(key)
+            return count
+    if encoding_name is None:
+        count = len(text) // CHARS_PER_TOKEN + 1
+    else:
+        count = len(tiktoken.get_encoding(encoding_name).encode(text, disallowed_special=()))
+    with _counts_lock:
+        _counts[key] = count
+        if len(_counts) > COUNT_CACHE_SIZE:
+            _counts.popitem(last=False)
+    return count
+
+
+def count_text_tokens(text: str, model: str) -> int:
+    return _count_text(_encoding_name(model), text)
+
+
+def count_message_tokens(message: BaseMessage, model: str) -> int:
+    encoding = _encoding_name(model)
+    content = message.content
+    if not isinstance(content, str):
+        content = " ".join(
+            block.get("text", "") if isinstance(block, dict) else str(block)
+            for block in content
+        )
+    tokens = TOKENS_PER_MESSAGE + _count_text(encoding, content)
+    if message.name:
+        tokens += TOKENS_PER_NAME + _count_text(encoding, message.name)
+    for call in getattr(message, "tool_calls", None) or ():
+        tokens += _count_text(encoding, call["name"])
+        tokens += _count_text(encoding, json.dumps(call["args"], sort_keys=True))
+    return tokens
+
+
+def count_tokens(messages: list[BaseMessage], model: str) -> int:
+    """Approximate prompt tokens of a message list for an OpenAI chat model."""
+    return TOKENS_PER_REPLY + sum(count_message_tokens(m, model) for m in messages)
+
+
+# -------------------
+# 2. Context assembly
+# -------------------
+@dataclass
+class ContextWindow:
+    messages: list[BaseMessage]
+    total_tokens: int
+    kept_tokens: int
+    dropped_messages: int = 0
+    budget: int = DEFAULT_TOKEN_BUDGET
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.total_tokens - self.kept_tokens
+
+
+def turn_units(messages: list[BaseMessage]) -> list[list[BaseMessage]]:
+    """Split history into units that must be kept or dropped together."""
+    units: list[list[BaseMessage]] = []
+    for message in messages:
+        # A tool result belongs with the AI message that requested it
+        if isinstance(message, ToolMessage) and units and (
+            isinstance(units[-1][0], AIMessage) and units[-1][0].tool_calls
+        ):
+            units[-1].append(message)
+        else:
+            units.append([message])
+    return units
+
+
+def build_context(
+    messages: list[BaseMessage],
+    *,
+    model: str,
+    budget: int = DEFAULT_TOKEN_BUDGET,
+) -> ContextWindow:
+    """
+    The messages to send this turn, within `budget` tokens.
+
+    Leading system messages and the current turn (the latest user message and
+    any tool rounds after it) are always kept. Older units are added back
+    newest first until the next one would not fit, then trimmed to start at a
+    user message; anything older is replaced by a short note. Tool calls and
+    their results are never separated.
+    """
+    split = 0
+    while split < len(messages) and isinstance(messages[split], SystemMessage):
+        split += 1
+    system, history = list(messages[:split]), messages[split:]
+
+    total = count_tokens(messages, model)
+    if total <= budget:
+        return ContextWindow(list(messages), total, total, budget=budget)
+
+    units = turn_units(history)
+    note = SystemMessage(content="(Earlier conversation omitted to fit the context window.)")
+    used = count_tokens(system, model) + count_message_tokens(note, model)
+    # Units of the current turn: from the latest user message to the end
+    current = len(units) - max(
+        (i for i, unit in enumerate(units) if isinstance(unit[0], HumanMessage)),
+        default=max(len(units) - 1, 0),
+    )
+    kept: list[tuple[list[BaseMessage], int]] = []
+    for unit in reversed(units):
+        cost = sum(count_message_tokens(m, model) for m in unit)
+        if len(kept) >= current and used + cost > budget:
+            break
+        kept.append((unit, cost))
+        used += cost
+    # Start the kept history at a user message, not halfway through a turn
+    while len(kept) > current and not isinstance(kept[-1][0][0], HumanMessage):
+        used -= kept.pop()[1]
+
+    kept_messages = [m for unit, _ in reversed(kept) for m in unit]
+    dropped = len(history) - len(kept_messages)
+    window = ContextWindow(
+        [*system, note, *kept_messages] if dropped else [*system, *kept_messages],
+        total,
+        used if dropped else total,
+        dropped,
+        budget,
+    )
+    logger.info(
+        "context window: %d of %d tokens sent, %d saved, %d messages omitted",
+        window.kept_tokens,
+        window.total_tokens,
+        window.saved_tokens,
+        window.dropped_messages,
+    )
+    return window
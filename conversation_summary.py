@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import os
+from typing import Any, Callable
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import (
+    AIMessage,
+    BaseMessage,
+    HumanMessage,
+    SystemMessage,
+    ToolMessage,
+)
+from langgraph.constants import TAG_NOSTREAM
+
+from context_window import count_message_tokens, count_tokens, turn_units
+from rate_limiter import BACKGROUND, EXPECTED_COMPLETION_TOKENS, reserve
+
+# -------------------
+# 1. Settings
+# -------------------
+# The summarize node is opt-in per deployment
+SUMMARIZE_HISTORY = os.getenv("SUMMARIZE_HISTORY") == "1"
+# Summarize once the unsummarized history is larger than this...
+SUMMARY_TRIGGER_TOKENS = int(os.getenv("SUMMARY_TRIGGER_TOKENS", "3000"))
+# ...keeping roughly this much of the most recent history verbatim
+SUMMARY_KEEP_TOKENS = int(os.getenv("SUMMARY_KEEP_TOKENS", "1200"))
+SUMMARY_MAX_WORDS = 250
+# Long tool outputs are cut in the transcript handed to the summarizer
+TOOL_OUTPUT_CHARS = 500
+
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a conversation between a user and an "
+    "assistant. Update the current summary with the new messages. Keep facts, "
+    "names, numbers, decisions, user preferences and open questions; drop "
+    f"pleasantries. Reply with the updated summary only, at most {SUMMARY_MAX_WORDS} words."
+)
+
+
+def _transcript(messages: list[BaseMessage]) -> str:
+    lines = []
+    for message in messages:
+        content = message.content if isinstance(message.content, str) else str(message.content)
+        if isinstance(message, HumanMessage):
+            lines.append(f"User: {content}")
+        elif isinstance(message, ToolMessage):
+            lines.append(f"Tool ({message.name or 'tool'}): {content[:TOOL_OUTPUT_CHARS]}")
+        elif isinstance(message, AIMessage):
+            calls = ", ".join(call["name"] for call in message.tool_calls)
+            if content:
+                lines.append(f"Assistant: {content}")
+            if calls:
+                lines.append(f"Assistant called: {calls}")
+    return "\n".join(lines)
+
+
+# -------------------
+# 2. Prompt assembly
+# -------------------
+def summarized_messages(state: dict) -> list[BaseMessage]:
+    """History for chat_node: the running summary, then the messages it does not cover."""
+    messages = state["messages"]
+    summary = state.get("summary") or ""
+    start = state.get("summary_upto") or 0
+    if not summary or start > len(messages):
+        return list(messages)
+    note = SystemMessage(content=f"Summary of the earlier conversation:\n{summary}")
+    return [note, *messages[start:]]
+
+
+def _summary_cut(messages: list[BaseMessage], start: int, model: str, keep_tokens: int) -> int:
+    """Index up to which to summarize: before the recent turns worth ~keep_tokens."""
+    units = turn_units(messages[start:])
+    kept, cut = 0, len(messages)
+    for unit in reversed(units):
+        cost = sum(count_message_tokens(m, model) for m in unit)
+        if kept + cost > keep_tokens and cut < len(messages):
+            break
+        kept += cost
+        cut -= len(unit)
+    # Recent history must start at a user message
+    while cut < len(messages) and not isinstance(messages[cut], HumanMessage):
+        cut += 1
+    return cut
+
+
+# -------------------
+# 3. Node
+# -------------------
+def make_summarize_node(
+    llm: BaseChatModel,
+    *,
+    model: str,
+    trigger_tokens: int = SUMMARY_TRIGGER_TOKENS,
+    keep_tokens: int = SUMMARY_KEEP_TOKENS,
+) -> Callable[[dict], dict[str, Any]]:
+    """
+    Graph node that folds older messages into state["summary"].
+
+    Runs after the answer, so its model call is not on the user's critical
+    path. Only messages added since the last summary are sent, together with
+    that summary, so each call stays small; most turns skip it entirely.
+    """
+
+    def summarize(state: dict) -> dict[str, Any]:
+        messages = state["messages"]
+        start = state.get("summary_upto") or 0
+        if start > len(messages):
+            # History was rewritten under us; start over
+            start = 0
+        pending = sum(count_message_tokens(m, model) for m in messages[start:])
+        if pending <= trigger_tokens:
+            return {}
+
+        cut = _summary_cut(messages, start, model, keep_tokens)
+        if cut <= start:
+            return {}
+        current = (state.get("summary") or "(none)") if start else "(none)"
+        prompt = [
+            SystemMessage(content=SUMMARY_PROMPT),
+            HumanMessage(
+                content=f"Current summary:\n{current}\n\nNew messages:\n{_transcript(messages[start:cut])}"
+            ),
+        ]
+        # Live turns on the same model go first
+        estimate = count_tokens(prompt, model) + EXPECTED_COMPLETION_TOKENS
+        with reserve(model, estimate, BACKGROUND) as reservation:
+            # Keep the summary out of stream_mode="messages", which the UIs render
+            response = llm.invoke(prompt, config={"tags": [TAG_NOSTREAM]})
+            reservation.usage = (response.usage_metadata or {}).get("total_tokens")
+        return {"summary": response.content, "summary_upto": cut}
+
+    return summarize
@@ -0,0 +1,461 @@
+from __future__ import annotations
+
+import argparse
+import ast
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from typing import Any, Optional
+
+# -------------------
+# 1. Scripted behaviour
+# -------------------
+# Run with e.g.
+#   python fake_openai_server.py --port 8765 --latency 0.3 --tokens-per-second 40
+# and start any frontend with FAKE_OPENAI_URL=http://127.0.0.1:8765/v1 to point
+# every backend at it (see openai_clients.py); ALPHA_VANTAGE_URL=
+# http://127.0.0.1:8765/query does the same for stock quotes.
+#
+# A rule fires when its tool was offered and the user's message matches.
+# Offered the old two-number calculator instead, the fake model works through
+# the arithmetic one level of nesting per round trip (see calculator_rounds)
+NUMBER = r"-?\d+(?:\.\d+)?"
+EXPRESSION = rf"([(\s]*{NUMBER}[)\s]*(?:[-+*/^][(\s]*{NUMBER}[)\s]*)+)"
+DEFAULT_RULES = [
+    {"match": EXPRESSION, "tool": "calculator", "arguments": {"expressions": ["$1"]}},
+    {
+        "match": r"\b(?:buy|purchase)\s+(\d+)\s+shares?\s+of\s+((?-i:[A-Z]{1,5}))\b",
+        "tool": "purchase_stock",
+        "arguments": {"symbol": "$2", "quantity": "$1"},
+    },
+    {
+        "match": r"\b(?:price|stock|shares?|quote)\b.*?\b((?-i:[A-Z]{1,5}))\b",
+        "tool": "get_stock_price",
+        "arguments": {"symbol": "$1"},
+    },
+    {"match": r"\b(news|latest|search)\b", "tool": "duckduckgo_search", "arguments": {"query": "$q"}},
+    {"match": r"\b(pdf|document)\b", "tool": "rag_tool", "arguments": {"query": "$q"}},
+]
+OPERATIONS = {
+    ast.Add: ("add", lambda a, b: a + b),
+    ast.Sub: ("sub", lambda a, b: a - b),
+    ast.Mult: ("mul", lambda a, b: a * b),
+    ast.Div: ("div", lambda a, b: a / b if b else math.nan),
+}
+FILLER = (
+    "This is a canned answer from the offline test server so that latency "
+    "and throughput can be measured without calling a real model"
+).split()
+
+
+@dataclass
+class FakeModelConfig:
+    latency: float = 0.0  # seconds before the first token
+    # A slow tail: this fraction of chat requests waits tail_latency instead
+    tail_fraction: float = 0.0
+    tail_latency: float = 0.0
+    tokens_per_second: float = 0.0  # 0: no per-token delay
+    reply_tokens: int = 40
+    embedding_dimensions: int = 1536
+    # Alpha Vantage stand-in (GET /query?function=GLOBAL_QUOTE&symbol=...)
+    quote_latency: float = 0.0
+    quote_error_rate: float = 0.0  # fraction answered with a rate-limit note
+    rules: list = field(default_factory=lambda: list(DEFAULT_RULES))
+    # Every matching rule fires, as parallel tool calls in one message
+    parallel_tool_calls: bool = False
+
+
+@dataclass
+class ServerStats:
+    chat_requests: int = 0
+    streamed_requests: int = 0
+    tool_calls: int = 0
+    embedding_inputs: int = 0
+    quote_requests: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def add(self, **counts: int) -> None:
+        with self.lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def as_dict(self) -> dict:
+        with self.lock:
+            return {
+                "chat_requests": self.chat_requests,
+                "streamed_requests": self.streamed_requests,
+                "tool_calls": self.tool_calls,
+                "embedding_inputs": self.embedding_inputs,
+                "quote_requests": self.quote_requests,
+            }
+
+
+def _text(content: Any) -> str:
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return ""
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _substitute(value: Any, found: re.Match, question: str) -> Any:
+    """Fill "$1".. with regex groups and "$q" with the question; numbers become floats."""
+    if isinstance(value, dict):
+        return {k: _substitute(v, found, question) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_substitute(v, found, question) for v in value]
+    if not isinstance(value, str):
+        return value
+    text = re.sub(r"\$(\d)", lambda m: found.group(int(m.group(1))) or "", value.replace("$q", question))
+    if re.fullmatch(r"-?\d+(\.\d+)?", text):
+        return float(text)
+    return text.strip()
+
+
+def calculator_rounds(question: str) -> Optional[list[list[dict]]]:
+    """
+    Two-number calculator calls for the arithmetic in `question`, grouped by
+    round trip: a step can only be asked for once the results it uses are
+    back, so each level of nesting costs the model another round.
+    """
+    found = re.search(EXPRESSION, question)
+    if not found:
+        return None
+    rounds: list[list[dict]] = []
+
+    def visit(node: ast.AST) -> tuple[float, int]:
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+            return float(node.value), 0
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+            value, depth = visit(node.operand)
+            return -value, depth
+        if isinstance(node, ast.BinOp) and type(node.op) in OPERATIONS:
+            (left, left_depth), (right, right_depth) = visit(node.left), visit(node.right)
+            name, apply = OPERATIONS[type(node.op)]
+            depth = max(left_depth, right_depth) + 1
+            if len(rounds) < depth:
+                rounds.append([])
+            rounds[depth - 1].append({"first_num": left, "second_num": right, "operation": name})
+            return apply(left, right), depth
+        raise ValueError(f"unsupported {type(node).__name__}")
+
+    try:
+        visit(ast.parse(found.group(1).strip(), mode="eval").body)
+    except (SyntaxError, ValueError):
+        return None
+    return rounds or None
+
+
+def _tool_call(name: str, arguments: dict) -> dict:
+    return {
+        "id": f"call_{uuid.uuid4().hex[:24]}",
+        "type": "function",
+        "function": {"name": name, "arguments": json.dumps(arguments)},
+    }
+
+
+def _takes_two_numbers(body: dict) -> bool:
+    for spec in body.get("tools") or []:
+        function = spec.get("function", {})
+        if function.get("name") == "calculator":
+            return "first_num" in (function.get("parameters") or {}).get("properties", {})
+    return False
+
+
+def plan_reply(body: dict, config: FakeModelConfig) -> tuple[str, list]:
+    """(content, tool_calls) for a chat completion request."""
+    messages = body.get("messages", [])
+    offered = {t.get("function", {}).get("name") for t in body.get("tools") or []}
+    last = messages[-1] if messages else {}
+    asked = max((i for i, m in enumerate(messages) if m.get("role") == "user"), default=-1)
+    question = _text(messages[asked].get("content")) if asked >= 0 else ""
+
+    if _takes_two_numbers(body):
+        rounds = calculator_rounds(question)
+        done = sum(1 for m in messages[asked + 1 :] if m.get("role") == "assistant" and m.get("tool_calls"))
+        if rounds and done < len(rounds):
+            return "", [_tool_call("calculator", arguments) for arguments in rounds[done]]
+
+    # After tool results, answer from them instead of calling again
+    if last.get("role") == "tool":
+        results = [_text(m.get("content")) for m in messages if m.get("role") == "tool"]
+        return f"Based on the tool result: {results[-1][:200]}", []
+
+    calls = []
+    for rule in config.rules:
+        if rule["tool"] not in offered:
+            continue
+        # "each": one call per match, e.g. a quote per ticker in the question
+        matches = list(re.finditer(rule["match"], question, flags=re.IGNORECASE))
+        for found in matches if rule.get("each") else matches[:1]:
+            calls.append(_tool_call(rule["tool"], _substitute(rule.get("arguments", {}), found, question)))
+        if calls and not config.parallel_tool_calls:
+            break
+    if calls:
+        return "", calls
+
+    words = [f"Reply to: {question[:80]}."]
+    words += [FILLER[i % len(FILLER)] for i in range(max(0, config.reply_tokens - 1))]
+    return " ".join(words), []
+
+
+def quote(symbol: str) -> dict:
+    """Deterministic GLOBAL_QUOTE payload in Alpha Vantage's format."""
+    seed = int.from_bytes(hashlib.blake2b(symbol.encode(), digest_size=4).digest(), "little")
+    price = 20 + seed % 48000 / 100
+    change = (seed % 1001 - 500) / 100
+    return {
+        "Global Quote": {
+            "01. symbol": symbol,
+            "05. price": f"{price:.4f}",
+            "07. latest trading day": time.strftime("%Y-%m-%d"),
+            "09. change": f"{change:.4f}",
+            "10. change percent": f"{change / price * 100:.4f}%",
+        }
+    }
+
+
+def embed(text: str, dimensions: int) -> list[float]:
+    """Deterministic bag-of-words vector: texts sharing words are similar."""
+    vector = [0.0] * dimensions
+    for word in re.findall(r"\w+", text.lower()):
+        digest = hashlib.blake2b(word.encode(), digest_size=8).digest()
+        index = int.from_bytes(digest[:4], "little") % dimensions
+        vector[index] += 1.0 if digest[4] & 1 else -1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+# -------------------
+# 2. HTTP server
+# -------------------
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; don't let Nagle delay the body
+    disable_nagle_algorithm = True
+    server: "FakeOpenAIServer"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _json(self, status: int, payload: dict) -> None:
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self) -> None:
+        if self.path.rstrip("/").endswith("/models"):
+            self._json(200, {"object": "list", "data": [{"id": "fake", "object": "model"}]})
+        elif self.path.rstrip("/").endswith("/stats"):
+            self._json(200, self.server.stats.as_dict())
+        elif urlparse(self.path).path.rstrip("/").endswith("/query"):
+            self._quote(parse_qs(urlparse(self.path).query))
+        else:
+            self._json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if self.path.endswith("/chat/completions"):
+            try:
+                self._chat(body)
+            except (BrokenPipeError, ConnectionResetError):
+                # Client gave up mid-stream (e.g. a cancelled hedge)
+                self.close_connection = True
+        elif self.path.endswith("/embeddings"):
+            self._embeddings(body)
+        else:
+            self._json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    def _chat(self, body: dict) -> None:
+        config = self.server.config
+        content, tool_calls = plan_reply(body, config)
+        stream = bool(body.get("stream"))
+        self.server.stats.add(chat_requests=1, streamed_requests=int(stream), tool_calls=len(tool_calls))
+
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        model = body.get("model", "fake")
+        prompt_tokens = sum(_estimate_tokens(_text(m.get("content"))) for m in body.get("messages", []))
+        tokens = content.split(" ") if content else []
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(tokens) or 1,
+            "total_tokens": prompt_tokens + (len(tokens) or 1),
+        }
+        finish_reason = "tool_calls" if tool_calls else "stop"
+        per_token = 1.0 / config.tokens_per_second if config.tokens_per_second else 0.0
+        slow = config.tail_fraction and random.random() < config.tail_fraction
+        time.sleep(config.tail_latency if slow else config.latency)
+
+        if not stream:
+            time.sleep(per_token * len(tokens))
+            message = {"role": "assistant", "content": content or None}
+            if tool_calls:
+                message["tool_calls"] = tool_calls
+            self._json(
+                200,
+                {
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+                    "usage": usage,
+                },
+            )
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        # Chunked, so the connection stays open for keep-alive clients
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def write(data: bytes) -> None:
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+
+        def send(delta: dict, finish: Optional[str] = None, **extra: Any) -> None:
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish}] if delta is not None else [],
+                **extra,
+            }
+            write(f"data: {json.dumps(chunk)}\n\n".encode())
+
+        send({"role": "assistant", "content": ""})
+        for index, call in enumerate(tool_calls):
+            send({"tool_calls": [{"index": index, **call}]})
+        for position, token in enumerate(tokens):
+            send({"content": token if position == 0 else " " + token})
+            time.sleep(per_token)
+        send({}, finish_reason)
+        if (body.get("stream_options") or {}).get("include_usage"):
+            send(None, usage=usage)
+        write(b"data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _quote(self, params: dict) -> None:
+        config = self.server.config
+        self.server.stats.add(quote_requests=1)
+        time.sleep(config.quote_latency)
+        if config.quote_error_rate and random.random() < config.quote_error_rate:
+            self._json(200, {"Note": "API call frequency exceeded (fake server)."})
+            return
+        symbol = (params.get("symbol") or [""])[0].upper()
+        self._json(200, quote(symbol) if symbol else {"Error Message": "Invalid API call."})
+
+    def _embeddings(self, body: dict) -> None:
+        inputs = body.get("input", [])
+        if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        dimensions = body.get("dimensions") or self.server.config.embedding_dimensions
+        # Token-id inputs (tiktoken pre-chunking) have no text; hash their ids instead
+        texts = [i if isinstance(i, str) else " ".join(map(str, i)) for i in inputs]
+        self.server.stats.add(embedding_inputs=len(texts))
+        time.sleep(self.server.config.latency)
+        self._json(
+            200,
+            {
+                "object": "list",
+                "model": body.get("model", "fake"),
+                "data": [
+                    {"object": "embedding", "index": i, "embedding": embed(text, dimensions)}
+                    for i, text in enumerate(texts)
+                ],
+                "usage": {
+                    "prompt_tokens": sum(map(_estimate_tokens, texts)),
+                    "total_tokens": sum(map(_estimate_tokens, texts)),
+                },
+            },
+        )
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    """
+    OpenAI-compatible /v1/chat/completions and /v1/embeddings, served locally.
+
+    Replies wait `config.latency` seconds, then stream at
+    `config.tokens_per_second`; tool calls follow `config.rules`. GET /v1/stats
+    returns request counters.
+    """
+
+    daemon_threads = True
+    # Load tests open many connections at once
+    request_queue_size = 256
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8765, config: Optional[FakeModelConfig] = None):
+        super().__init__((host, port), FakeOpenAIHandler)
+        self.config = config or FakeModelConfig()
+        self.stats = ServerStats()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "FakeOpenAIServer":
+        """Serve from a daemon thread (for benchmarks that run in-process)."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+# -------------------
+# 3. CLI
+# -------------------
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline OpenAI-compatible chat and embeddings server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before the first token")
+    parser.add_argument("--tail-fraction", type=float, default=0.0, help="fraction of slow chat requests")
+    parser.add_argument("--tail-latency", type=float, default=0.0, help="first-token delay of slow requests")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="0 for no per-token delay")
+    parser.add_argument("--reply-tokens", type=int, default=40)
+    parser.add_argument("--quote-latency", type=float, default=0.0, help="delay of /query stock quotes")
+    parser.add_argument("--quote-error-rate", type=float, default=0.0, help="fraction of rate-limited quotes")
+    parser.add_argument("--parallel-tool-calls", action="store_true", help="fire every matching rule at once")
+    parser.add_argument("--rules", help="JSON file with tool-calling rules (see DEFAULT_RULES)")
+    args = parser.parse_args()
+
+    config = FakeModelConfig(
+        latency=args.latency,
+        tail_fraction=args.tail_fraction,
+        tail_latency=args.tail_latency,
+        tokens_per_second=args.tokens_per_second,
+        reply_tokens=args.reply_tokens,
+        quote_latency=args.quote_latency,
+        quote_error_rate=args.quote_error_rate,
+        parallel_tool_calls=args.parallel_tool_calls,
+    )
+    if args.rules:
+        with open(args.rules) as f:
+            config.rules = json.load(f)
+
+    server = FakeOpenAIServer(args.host, args.port, config)
+    print(f"Fake OpenAI API on {server.base_url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import json
+import os
+import re
+import threading
+import uuid
+from dataclasses import dataclass
+from typing import Any, Callable, Optional, Sequence
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langgraph.graph import END
+
+# -------------------
+# 1. Settings
+# -------------------
+# The fast path is opt-in per deployment
+FAST_PATH = os.getenv("FAST_PATH") == "1"
+
+NUMBER = r"(-?\d+(?:\.\d+)?)"
+OPERATORS = {
+    "+": "+", "plus": "+",
+    "-": "-", "minus": "-",
+    "*": "*", "x": "*", "×": "*", "times": "*", "multiplied by": "*",
+    "/": "/", "÷": "/", "divided by": "/", "over": "/",
+}
+SYMBOLS = {"*": "×", "/": "÷"}
+
+# Whole-message patterns only: anything more ("... like a cricket commentator")
+# is left to the model
+ARITHMETIC_PATTERN = re.compile(
+    r"^\s*(?:(?:what\s+is|what's|whats|calculate|compute|evaluate)\s+)?"
+    rf"{NUMBER}\s*(\+|-|\*|x|×|/|÷|plus|minus|times|multiplied by|divided by|over)\s*{NUMBER}"
+    r"\s*[?.!=]*\s*$",
+    re.IGNORECASE,
+)
+# Tickers must be written in capitals to count as unambiguous
+QUOTE_PATTERNS = [
+    re.compile(
+        r"^\s*(?i:(?:what\s+is\s+|what's\s+)?(?:the\s+)?(?:current\s+|latest\s+)?"
+        r"(?:stock\s+|share\s+)?(?:price|quote)\s+(?:of|for)\s+)"
+        r"([A-Z]{1,5})(?i:\s+stock)?\s*\??\s*$"
+    ),
+    re.compile(r"^\s*([A-Z]{1,5})\s+(?i:(?:stock\s+|share\s+)?(?:price|quote))\s*\??\s*$"),
+]
+
+
+@dataclass
+class FastPathCall:
+    tool: str
+    args: dict
+
+
+def match_fast_path(question: str) -> Optional[FastPathCall]:
+    """The tool call a question unambiguously asks for, else None."""
+    found = ARITHMETIC_PATTERN.match(question)
+    if found:
+        first, operator, second = found.groups()
+        expression = f"{first} {OPERATORS[operator.lower()]} {second}"
+        return FastPathCall("calculator", {"expressions": [expression]})
+    for pattern in QUOTE_PATTERNS:
+        found = pattern.match(question)
+        if found:
+            return FastPathCall("get_stock_price", {"symbol": found.group(1)})
+    return None
+
+
+# -------------------
+# 2. Answer templates
+# -------------------
+def _number(value: Any) -> str:
+    value = float(value)
+    return str(int(value)) if value.is_integer() else f"{value:,.6g}"
+
+
+def _calculator_answer(args: dict, result: Any) -> Optional[str]:
+    results = result.get("results") if isinstance(result, dict) else None
+    if not results or "result" not in results[0]:
+        return None
+    first, operator, second = args["expressions"][0].split(" ")
+    return f"{_number(first)} {SYMBOLS.get(operator, operator)} {_number(second)} = {_number(results[0]['result'])}"
+
+
+def _quote_answer(args: dict, result: Any) -> Optional[str]:
+    # A stale fallback (the fetch failed) goes to chat_node, which can say so
+    if not isinstance(result, dict) or result.get("stale") or result.get("error"):
+        return None
+    quote = result.get("Global Quote")
+    if not quote or "05. price" not in quote:
+        return None
+    answer = f"{quote.get('01. symbol', args['symbol'])} is trading at ${float(quote['05. price']):,.2f}"
+    if quote.get("09. change") and quote.get("10. change percent"):
+        answer += f" ({float(quote['09. change']):+,.2f}, {quote['10. change percent']})"
+    if quote.get("07. latest trading day"):
+        answer += f" as of {quote['07. latest trading day']}"
+    return answer + "."
+
+
+TEMPLATES: dict[str, Callable[[dict, Any], Optional[str]]] = {
+    "calculator": _calculator_answer,
+    "get_stock_price": _quote_answer,
+}
+
+
+# -------------------
+# 3. Node
+# -------------------
+class FastPathNode:
+    """
+    Graph node that answers unambiguous calculator and stock-quote questions
+    without the model.
+
+    The tool call and its result are added to the history as if the model had
+    made them. If the result does not fit the answer template (an API error or
+    rate-limit note), chat_node writes the answer from it, which still saves
+    one model call. Any other question passes through untouched.
+    """
+
+    def __init__(self, tools: Sequence[Any]) -> None:
+        self.tools = {t.name: t for t in tools if t.name in TEMPLATES}
+        self.lock = threading.Lock()
+        self.turns = 0
+        self.served = 0
+        self.tool_only = 0
+
+    def __call__(self, state: dict) -> dict[str, Any]:
+        with self.lock:
+            self.turns += 1
+        last = state["messages"][-1]
+        if not isinstance(last, HumanMessage) or not isinstance(last.content, str):
+            return {}
+        call = match_fast_path(last.content)
+        if call is None or call.tool not in self.tools:
+            return {}
+
+        call_id = f"fast_{uuid.uuid4().hex[:24]}"
+        request = AIMessage(content="", tool_calls=[{"name": call.tool, "args": call.args, "id": call_id}])
+        try:
+            result = self.tools[call.tool].invoke(call.args)
+        except Exception as e:
+            result = {"error": str(e)}
+        content = result if isinstance(result, str) else json.dumps(result)
+        messages = [request, ToolMessage(content=content, name=call.tool, tool_call_id=call_id)]
+
+        answer = TEMPLATES[call.tool](call.args, result)
+        with self.lock:
+            if answer is None:
+                self.tool_only += 1
+            else:
+                self.served += 1
+        if answer is not None:
+            messages.append(AIMessage(content=answer, response_metadata={"fast_path": call.tool}))
+        return {"messages": messages}
+
+    def stats(self) -> dict[str, Any]:
+        """Turns seen, turns answered without any model call, and their fraction."""
+        with self.lock:
+            return {
+                "turns": self.turns,
+                "served": self.served,
+                "tool_only": self.tool_only,
+                "served_fraction": self.served / self.turns if self.turns else 0.0,
+            }
+
+
+def fast_path_condition(state: dict) -> str:
+    """END when the fast path answered, else on to chat_node."""
+    last = state["messages"][-1]
+    if isinstance(last, AIMessage) and not last.tool_calls:
+        return END
+    return "chat_node"
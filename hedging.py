@@ -0,0 +1,347 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Iterator, Optional, Sequence
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.language_models.chat_models import agenerate_from_stream, generate_from_stream
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+
+from context_window import count_tokens
+from rate_limiter import EXPECTED_COMPLETION_TOKENS, INTERACTIVE, limiter_for
+
+logger = logging.getLogger(__name__)
+
+# -------------------
+# 1. Settings
+# -------------------
+# Hedging is opt-in: it trades extra upstream calls for a shorter tail
+HEDGE_REQUESTS = os.getenv("HEDGE_REQUESTS") == "1"
+# Hedge once the first token is later than this percentile of recent calls
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))
+HEDGE_WINDOW = 200
+# No hedging until a model has this much history
+HEDGE_MIN_SAMPLES = 20
+# Never hedge sooner than this, however fast the model usually is
+HEDGE_MIN_SECONDS = 0.25
+
+
+def percentile(samples: Sequence[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+class LatencyTracker:
+    """Recent time-to-first-token per model (of winning attempts), and hedge counters."""
+
+    def __init__(self, window: int = HEDGE_WINDOW) -> None:
+        self.window = window
+        self.lock = threading.Lock()
+        self.samples: dict[str, deque] = {}
+        self.counts: dict[str, dict[str, int]] = {}
+
+    def record(self, model: str, seconds: float) -> None:
+        with self.lock:
+            self.samples.setdefault(model, deque(maxlen=self.window)).append(seconds)
+
+    def count(self, model: str, event: str) -> None:
+        with self.lock:
+            counts = self.counts.setdefault(model, {"calls": 0, "hedged": 0, "hedge_wins": 0, "hedge_skipped": 0})
+            counts[event] += 1
+
+    def hedge_after(self, model: str) -> Optional[float]:
+        """Seconds to wait for a first token before hedging; None: too little history."""
+        with self.lock:
+            samples = list(self.samples.get(model, ()))
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return max(HEDGE_MIN_SECONDS, percentile(samples, HEDGE_PERCENTILE))
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        """p50/p95/p99 time-to-first-token and hedge counters per model."""
+        with self.lock:
+            models = {m: list(s) for m, s in self.samples.items()}
+            counts = {m: dict(c) for m, c in self.counts.items()}
+        result = {}
+        for model, samples in models.items():
+            result[model] = {
+                "samples": len(samples),
+                "ttft_p50": percentile(samples, 50),
+                "ttft_p95": percentile(samples, 95),
+                "ttft_p99": percentile(samples, 99),
+                "hedge_after": self.hedge_after(model),
+                **counts.get(model, {}),
+            }
+        return result
+
+
+latency_tracker = LatencyTracker()
+
+
+# -------------------
+# 2. Hedged model
+# -------------------
+_DONE = object()
+
+
+def _tally(index: int, chunk: ChatGenerationChunk, seen: list, usage: list) -> None:
+    seen[index] += 1
+    reported = getattr(chunk.message, "usage_metadata", None)
+    if reported:
+        usage[index] = reported.get("total_tokens")
+
+
+class HedgedChatModel(BaseChatModel):
+    """
+    Streams from `inner`, firing a second identical request when the first
+    token is late, and keeps whichever attempt produces a token first.
+
+    "Late" is HEDGE_PERCENTILE of the model's recent time-to-first-token. A
+    hedge only goes out if the model's rate limiter has spare capacity right
+    now; that reservation is settled when the stream ends (_settle_hedge).
+    The losing attempt is cancelled: immediately for async calls, and at its
+    next chunk for sync calls, which closes its HTTP stream. Non-streaming
+    calls are served from the stream too, so they hedge the same way.
+    """
+
+    inner: BaseChatModel
+    tracker: Any = None
+
+    @property
+    def model_name(self) -> str:
+        return getattr(self.inner, "model_name", "model")
+
+    @property
+    def _llm_type(self) -> str:
+        return f"hedged-{self.inner._llm_type}"
+
+    @property
+    def _identifying_params(self) -> dict[str, Any]:
+        # Base URL too, so fake-server replies never share cache keys with the real API
+        return {
+            **self.inner._identifying_params,
+            "base_url": getattr(self.inner, "openai_api_base", None),
+        }
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any):
+        # Let the inner model format the tools, then bind the same kwargs here
+        return self.bind(**self.inner.bind_tools(tools, **kwargs).kwargs)
+
+    def _tracker(self) -> LatencyTracker:
+        return self.tracker or latency_tracker
+
+    def _reserve_hedge(self, messages: list[BaseMessage]) -> Optional[int]:
+        """The tokens reserved for a hedge, or None if the limiter has no spare capacity."""
+        estimate = count_tokens(messages, self.model_name) + EXPECTED_COMPLETION_TOKENS
+        if limiter_for(self.model_name).try_acquire(estimate, INTERACTIVE):
+            return estimate
+        self._tracker().count(self.model_name, "hedge_skipped")
+        return None
+
+    def _settle_hedge(self, reserved: Optional[int], winner: Optional[int], seen: list, usage: list) -> None:
+        """
+        Settle the hedge's reservation. The caller settles its own with the
+        winner's usage (the response's usage_metadata), so the hedge's covers
+        the losing attempt: its reported usage, or, as it was cancelled before
+        reporting, the prompt plus the chunks it streamed. Without a winner
+        (every attempt failed) the caller's covers the first attempt and the
+        hedge's covers the hedge itself.
+        """
+        if reserved is None:
+            return
+        charged = 1 if winner is None else 1 - winner
+        actual = usage[charged]
+        if actual is None:
+            actual = reserved - EXPECTED_COMPLETION_TOKENS + seen[charged]
+        limiter_for(self.model_name).record_usage(reserved, actual)
+
+    def _stream(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        tracker, model = self._tracker(), self.model_name
+        tracker.count(model, "calls")
+        chunks: queue.Queue = queue.Queue()
+        cancelled = [threading.Event(), threading.Event()]
+        started: list[float] = []
+        # Chunks streamed and reported total tokens per attempt, for _settle_hedge
+        seen, usage = [0, 0], [None, None]
+
+        def attempt(index: int) -> None:
+            stream = self.inner._stream(messages, stop=stop, stream_usage=True, **kwargs)
+            try:
+                for chunk in stream:
+                    _tally(index, chunk, seen, usage)
+                    if cancelled[index].is_set():
+                        break
+                    chunks.put((index, chunk))
+                chunks.put((index, _DONE))
+            except Exception as e:
+                chunks.put((index, e))
+            finally:
+                stream.close()
+
+        def launch() -> None:
+            started.append(time.monotonic())
+            threading.Thread(target=attempt, args=(len(started) - 1,), daemon=True).start()
+
+        launch()
+        reserved, winner = None, None
+        try:
+            hedge_after = tracker.hedge_after(model)
+            first, failed = None, set()
+            while winner is None:
+                timeout = None
+                if len(started) == 1 and hedge_after is not None:
+                    timeout = max(0.0, started[0] + hedge_after - time.monotonic())
+                try:
+                    index, item = chunks.get(timeout=timeout)
+                except queue.Empty:
+                    hedge_after = None
+                    reserved = self._reserve_hedge(messages)
+                    if reserved is not None:
+                        tracker.count(model, "hedged")
+                        logger.info("no first token from %s after %.2fs; hedging", model, time.monotonic() - started[0])
+                        launch()
+                    continue
+                if isinstance(item, Exception):
+                    failed.add(index)
+                    if len(failed) == len(started):
+                        raise item
+                    continue
+                winner, first = index, item
+
+            for index in range(len(started)):
+                if index != winner:
+                    cancelled[index].set()
+            tracker.record(model, time.monotonic() - started[winner])
+            if winner == 1:
+                tracker.count(model, "hedge_wins")
+
+            item = first
+            while item is not _DONE:
+                if isinstance(item, Exception):
+                    raise item
+                if run_manager:
+                    run_manager.on_llm_new_token(item.text, chunk=item)
+                yield item
+                index, item = chunks.get()
+                while index != winner:
+                    index, item = chunks.get()
+        finally:
+            for event in cancelled:
+                event.set()
+            self._settle_hedge(reserved, winner, seen, usage)
+
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        tracker, model = self._tracker(), self.model_name
+        tracker.count(model, "calls")
+        chunks: asyncio.Queue = asyncio.Queue()
+        tasks: list[asyncio.Task] = []
+        started: list[float] = []
+        seen, usage = [0, 0], [None, None]
+
+        async def attempt(index: int) -> None:
+            try:
+                async for chunk in self.inner._astream(messages, stop=stop, stream_usage=True, **kwargs):
+                    _tally(index, chunk, seen, usage)
+                    await chunks.put((index, chunk))
+                await chunks.put((index, _DONE))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                await chunks.put((index, e))
+
+        def launch() -> None:
+            started.append(time.monotonic())
+            tasks.append(asyncio.create_task(attempt(len(started) - 1)))
+
+        launch()
+        hedge_after = tracker.hedge_after(model)
+        reserved, winner, first, failed = None, None, None, set()
+        try:
+            while winner is None:
+                timeout = None
+                if len(started) == 1 and hedge_after is not None:
+                    timeout = max(0.0, started[0] + hedge_after - time.monotonic())
+                try:
+                    index, item = await asyncio.wait_for(chunks.get(), timeout)
+                except asyncio.TimeoutError:
+                    hedge_after = None
+                    reserved = self._reserve_hedge(messages)
+                    if reserved is not None:
+                        tracker.count(model, "hedged")
+                        logger.info("no first token from %s after %.2fs; hedging", model, time.monotonic() - started[0])
+                        launch()
+                    continue
+                if isinstance(item, Exception):
+                    failed.add(index)
+                    if len(failed) == len(started):
+                        raise item
+                    continue
+                winner, first = index, item
+
+            for index, task in enumerate(tasks):
+                if index != winner:
+                    task.cancel()
+            tracker.record(model, time.monotonic() - started[winner])
+            if winner == 1:
+                tracker.count(model, "hedge_wins")
+
+            item = first
+            while item is not _DONE:
+                if isinstance(item, Exception):
+                    raise item
+                if run_manager:
+                    await run_manager.on_llm_new_token(item.text, chunk=item)
+                yield item
+                index, item = await chunks.get()
+                while index != winner:
+                    index, item = await chunks.get()
+        finally:
+            for task in tasks:
+                task.cancel()
+            self._settle_hedge(reserved, winner, seen, usage)
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return generate_from_stream(self._stream(messages, stop, run_manager, **kwargs))
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return await agenerate_from_stream(self._astream(messages, stop, run_manager, **kwargs))
+
+
+def hedged(llm: BaseChatModel) -> BaseChatModel:
+    """`llm` wrapped for hedging when HEDGE_REQUESTS=1, else `llm` itself."""
+    if not HEDGE_REQUESTS:
+        return llm
+    return HedgedChatModel(inner=llm, cache=llm.cache, rate_limiter=llm.rate_limiter)
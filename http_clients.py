@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import importlib.util
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+import httpx
+
+# -------------------
+# 1. Settings
+# -------------------
+# HTTP/2 needs the optional h2 package (pip install "httpx[http2]")
+HTTP2 = importlib.util.find_spec("h2") is not None
+CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+# Between bytes, not per request: long non-streamed completions need headroom
+READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "120"))
+MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+KEEPALIVE_EXPIRY = 30.0
+
+DEFAULT_TIMEOUT = httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT)
+# Tool APIs (quotes, search) answer quickly or not at all
+TOOL_TIMEOUT = httpx.Timeout(10.0, connect=CONNECT_TIMEOUT)
+LIMITS = httpx.Limits(
+    max_connections=MAX_CONNECTIONS,
+    max_keepalive_connections=MAX_KEEPALIVE,
+    keepalive_expiry=KEEPALIVE_EXPIRY,
+)
+
+
+@dataclass
+class PoolStats:
+    requests: int = 0
+    connections_opened: int = 0
+    errors: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def add(self, **counts: int) -> None:
+        with self.lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+
+def _pool_usage(transport: Any, stats: PoolStats) -> dict[str, Any]:
+    # httpcore does not expose its pool publicly; read it defensively
+    connections = list(getattr(getattr(transport, "_pool", None), "connections", []))
+    idle = sum(1 for c in connections if c.is_idle())
+    with stats.lock:
+        requests, opened, errors = stats.requests, stats.connections_opened, stats.errors
+    return {
+        "requests": requests,
+        "connections_opened": opened,
+        "reuse_rate": 1 - opened / requests if requests else 0.0,
+        "errors": errors,
+        "open_connections": len(connections),
+        "idle_connections": idle,
+    }
+
+
+# -------------------
+# 2. Shared transports
+# -------------------
+class SharedTransport(httpx.BaseTransport):
+    """
+    One keep-alive pool for every sync client in the process.
+
+    Counts requests and newly opened connections; closing a client that uses
+    it leaves the pool open for the others.
+    """
+
+    def __init__(self) -> None:
+        self.inner = httpx.HTTPTransport(http2=HTTP2, limits=LIMITS)
+        self.stats = PoolStats()
+
+    def _trace(self, event: str, info: dict) -> None:
+        if event == "connection.connect_tcp.complete":
+            self.stats.add(connections_opened=1)
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        self.stats.add(requests=1)
+        request.extensions.setdefault("trace", self._trace)
+        try:
+            return self.inner.handle_request(request)
+        except httpx.TransportError:
+            self.stats.add(errors=1)
+            raise
+
+    def close(self) -> None:
+        pass
+
+    def usage(self) -> dict[str, Any]:
+        return _pool_usage(self.inner, self.stats)
+
+
+class SharedAsyncTransport(httpx.AsyncBaseTransport):
+    """Async counterpart of SharedTransport."""
+
+    def __init__(self) -> None:
+        self.inner = httpx.AsyncHTTPTransport(http2=HTTP2, limits=LIMITS)
+        self.stats = PoolStats()
+
+    async def _trace(self, event: str, info: dict) -> None:
+        if event == "connection.connect_tcp.complete":
+            self.stats.add(connections_opened=1)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.stats.add(requests=1)
+        request.extensions.setdefault("trace", self._trace)
+        try:
+            return await self.inner.handle_async_request(request)
+        except httpx.TransportError:
+            self.stats.add(errors=1)
+            raise
+
+    async def aclose(self) -> None:
+        pass
+
+    def usage(self) -> dict[str, Any]:
+        return _pool_usage(self.inner, self.stats)
+
+
+_lock = threading.Lock()
+_transport: Optional[SharedTransport] = None
+_async_transport: Optional[SharedAsyncTransport] = None
+_client: Optional[httpx.Client] = None
+_async_client: Optional[httpx.AsyncClient] = None
+
+
+def _transports() -> tuple[SharedTransport, SharedAsyncTransport]:
+    global _transport, _async_transport
+    with _lock:
+        if _transport is None:
+            _transport = SharedTransport()
+            _async_transport = SharedAsyncTransport()
+        return _transport, _async_transport
+
+
+# -------------------
+# 3. Clients
+# -------------------
+def http_client() -> httpx.Client:
+    """Process-wide sync client (LLM and embedding calls, tool APIs)."""
+    global _client
+    transport, _ = _transports()
+    with _lock:
+        if _client is None:
+            _client = httpx.Client(transport=transport, timeout=DEFAULT_TIMEOUT, follow_redirects=True)
+        return _client
+
+
+def async_http_client() -> httpx.AsyncClient:
+    """Process-wide async client, sharing the async pool."""
+    global _async_client
+    _, transport = _transports()
+    with _lock:
+        if _async_client is None:
+            _async_client = httpx.AsyncClient(transport=transport, timeout=DEFAULT_TIMEOUT, follow_redirects=True)
+        return _async_client
+
+
+def mcp_http_client_factory(
+    headers: Optional[dict[str, str]] = None,
+    timeout: Optional[httpx.Timeout] = None,
+    auth: Optional[httpx.Auth] = None,
+) -> httpx.AsyncClient:
+    """
+    httpx_client_factory for MCP streamable-HTTP connections.
+
+    The MCP client closes the client it gets when a session ends; it is built
+    on the shared async pool, so the connections outlive it.
+    """
+    _, transport = _transports()
+    return httpx.AsyncClient(
+        transport=transport,
+        headers=headers,
+        timeout=timeout or DEFAULT_TIMEOUT,
+        auth=auth,
+        follow_redirects=True,
+    )
+
+
+def pool_stats() -> dict[str, Any]:
+    """Requests, connections opened, reuse rate and pool occupancy per pool."""
+    transport, async_transport = _transports()
+    return {"http2": HTTP2, "sync": transport.usage(), "async": async_transport.usage()}
@@ -1,25 +1,33 @@
 from langgraph.graph import StateGraph, START, END
 from typing import TypedDict, Annotated
 from langchain_core.messages import BaseMessage
-from langchain_openai import ChatOpenAI
-from langgraph.checkpoint.memory import InMemorySaver
+from openai_clients import chat_model
+from memory_checkpointer import BoundedMemorySaver
+from llm_cache import ResponseCache
+from context_window import build_context
+from model_router import ModelRouter
 from langgraph.graph.message import add_messages
 from dotenv import load_dotenv
 
 load_dotenv()
 
-llm = ChatOpenAI()
+# Repeated prompts are answered from llm_cache.db
+llm = chat_model(cache=ResponseCache())
+# Cheapest adequate model per turn when MODEL_ROUTING=1, else always llm
+router = ModelRouter(llm)
 
 class ChatState(TypedDict):
     messages: Annotated[list[BaseMessage], add_messages]
 
 def chat_node(state: ChatState):
-    messages = state['messages']
-    response = llm.invoke(messages)
+    # Recent turns only, within the token budget
+    route = router.route(state['messages'])
+    context = build_context(state['messages'], model=route.model)
+    response = router.invoke(route, context.messages)
     return {"messages": [response]}
 
-# Checkpointer
-checkpointer = InMemorySaver()
+# Checkpointer (LRU over threads, cold threads spill to a temp file past 64 MB)
+checkpointer = BoundedMemorySaver()
 
 graph = StateGraph(ChatState)
 graph.add_node("chat_node", chat_node)
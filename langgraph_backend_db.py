@@ -1,39 +1,82 @@
 from langgraph.graph import StateGraph, START, END
-from typing import TypedDict, Annotated
+from typing import TypedDict, Annotated, NotRequired
 from langchain_core.messages import BaseMessage, HumanMessage
-from langchain_openai import ChatOpenAI
-from langgraph.checkpoint.sqlite import SqliteSaver
+from openai_clients import chat_model
 from langgraph.graph.message import add_messages
 from dotenv import load_dotenv
-import sqlite3
+from checkpoint_codec import CompressedSerializer
+from sqlite_checkpointer import DEFAULT_TITLE, PooledSqliteSaver
+from checkpoint_retention import start_compaction_from_env
+from llm_cache import ResponseCache
+from context_window import build_context
+from model_router import ModelRouter
+from conversation_summary import SUMMARIZE_HISTORY, make_summarize_node, summarized_messages
 
 load_dotenv()
 
-llm = ChatOpenAI()
+# Repeated prompts are answered from llm_cache.db
+llm = chat_model(cache=ResponseCache())
+# Cheapest adequate model per turn when MODEL_ROUTING=1, else always llm
+router = ModelRouter(llm)
 
 class ChatState(TypedDict):
     messages: Annotated[list[BaseMessage], add_messages]
+    # Running summary of messages[:summary_upto], kept by the summarize node
+    summary: NotRequired[str]
+    summary_upto: NotRequired[int]
 
 def chat_node(state: ChatState):
-    messages = state['messages']
-    response = llm.invoke(messages)
+    # Summary + recent turns only, within the token budget
+    history = summarized_messages(state)
+    route = router.route(history)
+    context = build_context(history, model=route.model)
+    response = router.invoke(route, context.messages)
     return {"messages": [response]}
 
-conn = sqlite3.connect(database='chatbot.db', check_same_thread=False)
-# Checkpointer
-checkpointer = SqliteSaver(conn=conn)
+# WAL + read pool + single writer thread, shared by every Streamlit session
+checkpointer = PooledSqliteSaver(
+    'chatbot.db', serde=CompressedSerializer(), delta_messages=True
+)
+# Old checkpoints are pruned in the background when CHECKPOINT_KEEP_LAST or
+# CHECKPOINT_COMPACT_INTERVAL is set (checkpoint_retention.py)
+compaction = start_compaction_from_env(checkpointer)
 
 graph = StateGraph(ChatState)
 graph.add_node("chat_node", chat_node)
 graph.add_edge(START, "chat_node")
-graph.add_edge("chat_node", END)
+if SUMMARIZE_HISTORY:
+    # Runs after the answer has been streamed
+    graph.add_node("summarize", make_summarize_node(llm, model=llm.model_name))
+    graph.add_edge("chat_node", "summarize")
+    graph.add_edge("summarize", END)
+else:
+    graph.add_edge("chat_node", END)
 
 chatbot = graph.compile(checkpointer=checkpointer)
 
-def retrieve_all_threads():
-    all_threads = set()
-    for checkpoint in checkpointer.list(None):
-        all_threads.add(checkpoint.config['configurable']['thread_id'])
+def list_threads(limit=None, offset=0):
+    return checkpointer.list_threads(limit=limit, offset=offset)
 
-    return list(all_threads)
+def retrieve_all_threads(limit=None, offset=0):
+    # Most recently active first
+    return [t['thread_id'] for t in list_threads(limit=limit, offset=offset)]
 
+def get_thread_titles(thread_ids):
+    # One indexed query for the whole sidebar
+    stored = checkpointer.get_thread_titles(thread_ids)
+    return {
+        tid: stored.get(str(tid), {}).get('title', DEFAULT_TITLE)
+        for tid in thread_ids
+    }
+
+def load_messages(thread_id, limit=30, before=None):
+    # Tail-first page of the latest state plus a cursor for older messages
+    return checkpointer.get_messages(thread_id, limit=limit, before=before)
+
+def search_threads(query, limit=20):
+    # FTS5 over human/AI message text; best match per thread, most relevant first
+    return checkpointer.search_threads(query, limit=limit)
+
+def model_router_stats():
+    # Calls, fallbacks, latency, tokens and cost per route
+    return router.stats()
@@ -3,39 +3,30 @@
 from langgraph.graph import StateGraph, START
 from typing import TypedDict, Annotated
 from langchain_core.messages import BaseMessage, HumanMessage
-from langchain_openai import ChatOpenAI
-from langgraph.checkpoint.memory import MemorySaver
+from openai_clients import chat_model
+from memory_checkpointer import BoundedMemorySaver
+from llm_cache import ResponseCache
+from context_window import build_context
+from model_router import ModelRouter
+from stock_quotes import get_stock_price
+from tool_guard import guarded_tools
 from langgraph.graph.message import add_messages
 from langgraph.prebuilt import ToolNode, tools_condition
 from langchain_core.tools import tool
 from langgraph.types import interrupt, Command
 from dotenv import load_dotenv
-import requests
 
 load_dotenv()
 
 # -------------------
-# 1. LLM
+# 1. LLM (repeated prompts, tool calls included, come from llm_cache.db)
 # -------------------
-llm = ChatOpenAI()
+llm = chat_model(cache=ResponseCache())
 
 # -------------------
 # 2. Tools
 # -------------------
-@tool
-def get_stock_price(symbol: str) -> dict:
-    """
-    Fetch latest stock price for a given symbol (e.g. 'AAPL', 'TSLA') 
-    using Alpha Vantage with API key in the URL.
-    """
-    url = (
-        "https://www.alphavantage.co/query"
-        f"?function=GLOBAL_QUOTE&symbol={symbol}&apikey=C9PE94QUEW9VWGFM"
-    )
-    r = requests.get(url)
-    return r.json()
-
-
+# get_stock_price comes from stock_quotes.py (shared TTL cache)
 @tool
 def purchase_stock(symbol: str, quantity: int) -> dict:
     """
@@ -65,8 +56,10 @@ def purchase_stock(symbol: str, quantity: int) -> dict:
         }
 
 
-tools = [get_stock_price, purchase_stock]
-llm_with_tools = llm.bind_tools(tools)
+# Each call has a deadline, a concurrency limit and a circuit breaker (tool_guard.py)
+tools = guarded_tools([get_stock_price, purchase_stock])
+# Cheapest adequate model per turn when MODEL_ROUTING=1, else always llm
+router = ModelRouter(llm, tools=tools)
 
 # -------------------
 # 3. State
@@ -79,16 +72,18 @@ class ChatState(TypedDict):
 # -------------------
 def chat_node(state: ChatState):
     """LLM node that may answer or request a tool call."""
-    messages = state["messages"]
-    response = llm_with_tools.invoke(messages)
+    # Recent turns only, within the token budget
+    route = router.route(state["messages"])
+    context = build_context(state["messages"], model=route.model)
+    response = router.invoke(route, context.messages)
     return {"messages": [response]}
 
 tool_node = ToolNode(tools)
 
 # -------------------
-# 5. Checkpointer (in-memory)
+# 5. Checkpointer (in-memory, bounded; cold threads spill to disk)
 # -------------------
-memory = MemorySaver()
+memory = BoundedMemorySaver()
 
 # -------------------
 # 6. Graph
@@ -1,31 +1,57 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import os
-import sqlite3
 import tempfile
-from typing import Annotated, Any, Dict, Optional, TypedDict
+import time
+from typing import Annotated, Any, Dict, NotRequired, Optional, TypedDict
 
 from dotenv import load_dotenv
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import PyPDFLoader
-from langchain_community.tools import DuckDuckGoSearchRun
 from langchain_community.vectorstores import FAISS
-from langchain_core.messages import BaseMessage, SystemMessage
-from langchain_core.tools import tool
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
-from langgraph.checkpoint.sqlite import SqliteSaver
-from langgraph.graph import START, StateGraph
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.tools import StructuredTool
+from langgraph.graph import END, START, StateGraph
 from langgraph.graph.message import add_messages
 from langgraph.prebuilt import ToolNode, tools_condition
-import requests
+
+from checkpoint_codec import CompressedSerializer
+from llm_cache import ResponseCache
+from openai_clients import chat_model, embeddings_model
+from semantic_cache import DEFAULT_THRESHOLD, GLOBAL_SCOPE, SemanticCache
+from context_window import build_context
+from model_router import ModelRouter
+from stock_quotes import get_stock_price, get_stock_prices
+from web_search import cached_search_tool, search_cache_stats
+from calculator import calculator
+from tool_guard import guarded_tools, tool_stats
+from rate_limiter import RateLimitedEmbeddings
+from fast_path import FAST_PATH, FastPathNode, fast_path_condition
+from conversation_summary import SUMMARIZE_HISTORY, make_summarize_node, summarized_messages
+from sqlite_checkpointer import DEFAULT_TITLE, PooledSqliteSaver
+from checkpoint_retention import start_compaction_from_env
 
 load_dotenv()
 
 # -------------------
 # 1. LLM + embeddings
 # -------------------
-llm = ChatOpenAI(model="gpt-4o-mini")
-embeddings = OpenAIEmbeddings(model="text-embedding-3-small")
+# Repeated prompts, tool calls included, are answered from llm_cache.db
+llm = chat_model(model="gpt-4o-mini", cache=ResponseCache())
+# PDF ingestion queues behind live turns' query embeddings
+embeddings = RateLimitedEmbeddings(embeddings_model(model="text-embedding-3-small"))
+
+# Answers to first-turn questions, reused for paraphrases; off unless SEMANTIC_CACHE=1
+semantic_cache = (
+    SemanticCache(
+        embeddings,
+        threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", DEFAULT_THRESHOLD)),
+    )
+    if os.getenv("SEMANTIC_CACHE") == "1"
+    else None
+)
 
 # -------------------
 # 2. PDF retriever store (per thread)
@@ -73,6 +99,8 @@ def ingest_pdf(file_bytes: bytes, thread_id: str, filename: Optional[str] = None
             "filename": filename or os.path.basename(temp_path),
             "documents": len(docs),
             "chunks": len(chunks),
+            # Semantic-cache scope: threads with the same PDF share answers
+            "document_id": hashlib.sha256(file_bytes).hexdigest()[:16],
         }
 
         return {
@@ -91,98 +119,97 @@ def ingest_pdf(file_bytes: bytes, thread_id: str, filename: Optional[str] = None
 # -------------------
 # 3. Tools
 # -------------------
-search_tool = DuckDuckGoSearchRun(region="us-en")
+# Cached on disk (search_cache.db), deduplicated and size-capped
+search_tool = cached_search_tool(region="us-en")
 
 
-@tool
-def calculator(first_num: float, second_num: float, operation: str) -> dict:
-    """
-    Perform a basic arithmetic operation on two numbers.
-    Supported operations: add, sub, mul, div
-    """
-    try:
-        if operation == "add":
-            result = first_num + second_num
-        elif operation == "sub":
-            result = first_num - second_num
-        elif operation == "mul":
-            result = first_num * second_num
-        elif operation == "div":
-            if second_num == 0:
-                return {"error": "Division by zero is not allowed"}
-            result = first_num / second_num
-        else:
-            return {"error": f"Unsupported operation '{operation}'"}
-
-        return {
-            "first_num": first_num,
-            "second_num": second_num,
-            "operation": operation,
-            "result": result,
-        }
-    except Exception as e:
-        return {"error": str(e)}
+def _rag_result(query: str, thread_id: Optional[str], result: list) -> dict:
+    return {
+        "query": query,
+        "context": [doc.page_content for doc in result],
+        "metadata": [doc.metadata for doc in result],
+        "source_file": _THREAD_METADATA.get(str(thread_id), {}).get("filename"),
+    }
 
 
-@tool
-def get_stock_price(symbol: str) -> dict:
-    """
-    Fetch latest stock price for a given symbol (e.g. 'AAPL', 'TSLA') 
-    using Alpha Vantage with API key in the URL.
-    """
-    url = (
-        "https://www.alphavantage.co/query"
-        f"?function=GLOBAL_QUOTE&symbol={symbol}&apikey=C9PE94QUEW9VWGFM"
-    )
-    r = requests.get(url)
-    return r.json()
+def _no_document(query: str) -> dict:
+    return {
+        "error": "No document indexed for this chat. Upload a PDF first.",
+        "query": query,
+    }
 
 
-@tool
-def rag_tool(query: str, thread_id: Optional[str] = None) -> dict:
+def _rag_tool(query: str, thread_id: Optional[str] = None) -> dict:
     """
     Retrieve relevant information from the uploaded PDF for this chat thread.
     Always include the thread_id when calling this tool.
     """
     retriever = _get_retriever(thread_id)
     if retriever is None:
-        return {
-            "error": "No document indexed for this chat. Upload a PDF first.",
-            "query": query,
-        }
+        return _no_document(query)
+    return _rag_result(query, thread_id, retriever.invoke(query))
 
-    result = retriever.invoke(query)
-    context = [doc.page_content for doc in result]
-    metadata = [doc.metadata for doc in result]
 
-    return {
-        "query": query,
-        "context": context,
-        "metadata": metadata,
-        "source_file": _THREAD_METADATA.get(str(thread_id), {}).get("filename"),
-    }
+async def _arag_tool(query: str, thread_id: Optional[str] = None) -> dict:
+    retriever = _get_retriever(thread_id)
+    if retriever is None:
+        return _no_document(query)
+    # The query embedding goes out on the async pool
+    return _rag_result(query, thread_id, await retriever.ainvoke(query))
+
 
+# Async graphs (ainvoke/astream) use the coroutine
+rag_tool = StructuredTool.from_function(func=_rag_tool, coroutine=_arag_tool, name="rag_tool")
 
-tools = [search_tool, get_stock_price, calculator, rag_tool]
-llm_with_tools = llm.bind_tools(tools)
+
+# Quotes come from a shared TTL cache (stock_quotes.py); calculator takes a
+# whole multi-step calculation in one call (calculator.py)
+# Each call has a deadline, a concurrency limit and a circuit breaker (tool_guard.py)
+tools = guarded_tools([search_tool, get_stock_price, get_stock_prices, calculator, rag_tool])
+# Cheapest adequate model per turn when MODEL_ROUTING=1, else always llm
+router = ModelRouter(llm, tools=tools)
 
 # -------------------
 # 4. State
 # -------------------
 class ChatState(TypedDict):
     messages: Annotated[list[BaseMessage], add_messages]
+    # Running summary of messages[:summary_upto], kept by the summarize node
+    summary: NotRequired[str]
+    summary_upto: NotRequired[int]
 
 
 # -------------------
 # 5. Nodes
 # -------------------
-def chat_node(state: ChatState, config=None):
-    """LLM node that may answer or request a tool call."""
-    thread_id = None
+# thread_id -> (question embedding, start time) of first turns still being answered
+_PENDING_ANSWERS: Dict[str, tuple] = {}
+# Answers built on these tools' results go out of date, so they are never cached
+LIVE_DATA_TOOLS = {"get_stock_price", "get_stock_prices", search_tool.name}
+
+
+def _cache_scope(thread_id: Optional[str]) -> str:
+    return _THREAD_METADATA.get(str(thread_id), {}).get("document_id", GLOBAL_SCOPE)
+
+
+def _first_turn_question(messages: list) -> Optional[str]:
+    """The user's question if this is the thread's first turn, else None."""
+    if not messages or not isinstance(messages[0], HumanMessage):
+        return None
+    if any(isinstance(m, HumanMessage) for m in messages[1:]):
+        return None
+    content = messages[0].content
+    return content if isinstance(content, str) else None
+
+
+def _thread_id(config) -> Optional[str]:
     if config and isinstance(config, dict):
-        thread_id = config.get("configurable", {}).get("thread_id")
+        return config.get("configurable", {}).get("thread_id")
+    return None
+
 
-    system_message = SystemMessage(
+def _system_message(thread_id: Optional[str]) -> SystemMessage:
+    return SystemMessage(
         content=(
             "You are a helpful assistant. For questions about the uploaded PDF, call "
             "the `rag_tool` and include the thread_id "
@@ -192,40 +219,168 @@ def chat_node(state: ChatState, config=None):
         )
     )
 
-    messages = [system_message, *state["messages"]]
-    response = llm_with_tools.invoke(messages, config=config)
+
+def _semantic_lookup(state: ChatState, thread_id: Optional[str]) -> tuple[Optional[dict], Optional[str]]:
+    """(cached reply, first-turn question); the reply is None on a miss."""
+    question = _first_turn_question(state["messages"]) if semantic_cache else None
+    if question is not None and len(state["messages"]) == 1:
+        vector = semantic_cache.embed(question)
+        cached = semantic_cache.lookup(question, _cache_scope(thread_id), vector=vector)
+        if cached is not None:
+            return {
+                "messages": [
+                    AIMessage(
+                        content=cached.answer,
+                        response_metadata={
+                            "semantic_cache": {
+                                "question": cached.question,
+                                "similarity": cached.similarity,
+                            }
+                        },
+                    )
+                ]
+            }, question
+        _PENDING_ANSWERS[str(thread_id)] = (vector, time.perf_counter())
+    return None, question
+
+
+def _route(state: ChatState, thread_id: Optional[str]):
+    # System prompt, summary and recent turns, within the token budget
+    history = [_system_message(thread_id), *summarized_messages(state)]
+    route = router.route(history, has_document=str(thread_id) in _THREAD_RETRIEVERS)
+    return route, build_context(history, model=route.model)
+
+
+def _uses_live_data(messages: list) -> bool:
+    return any(isinstance(m, ToolMessage) and m.name in LIVE_DATA_TOOLS for m in messages)
+
+
+def _remember_answer(
+    thread_id: Optional[str], question: Optional[str], response: AIMessage, messages: list
+) -> None:
+    # Cache the final answer of a first turn, after any tool calls it needed
+    pending = None if response.tool_calls else _PENDING_ANSWERS.pop(str(thread_id), None)
+    if pending and _uses_live_data(messages):
+        return
+    if pending and question is not None and isinstance(response.content, str):
+        vector, started = pending
+        semantic_cache.add(
+            question,
+            response.content,
+            _cache_scope(thread_id),
+            latency=time.perf_counter() - started,
+            vector=vector,
+        )
+
+
+def chat_node(state: ChatState, config=None):
+    """LLM node that may answer or request a tool call."""
+    thread_id = _thread_id(config)
+    cached, question = _semantic_lookup(state, thread_id)
+    if cached is not None:
+        return cached
+    route, context = _route(state, thread_id)
+    response = router.invoke(route, context.messages, config=config)
+    _remember_answer(thread_id, question, response, state["messages"])
+    return {"messages": [response]}
+
+
+async def achat_node(state: ChatState, config=None):
+    """chat_node for async_chatbot: the model call awaits on the event loop."""
+    thread_id = _thread_id(config)
+    # The semantic cache embeds synchronously; keep that off the loop
+    cached, question = (
+        await asyncio.to_thread(_semantic_lookup, state, thread_id)
+        if semantic_cache
+        else (None, None)
+    )
+    if cached is not None:
+        return cached
+    route, context = _route(state, thread_id)
+    response = await router.ainvoke(route, context.messages, config=config)
+    _remember_answer(thread_id, question, response, state["messages"])
     return {"messages": [response]}
 
 
 tool_node = ToolNode(tools)
+# Answers obvious tool questions without the model; off unless FAST_PATH=1
+fast_path = FastPathNode(tools) if FAST_PATH else None
 
 # -------------------
 # 6. Checkpointer
 # -------------------
-conn = sqlite3.connect(database="chatbot.db", check_same_thread=False)
-checkpointer = SqliteSaver(conn=conn)
+# WAL + read pool + single writer thread, shared by every Streamlit session
+checkpointer = PooledSqliteSaver(
+    "chatbot.db", serde=CompressedSerializer(), delta_messages=True
+)
+# Old checkpoints are pruned in the background when CHECKPOINT_KEEP_LAST or
+# CHECKPOINT_COMPACT_INTERVAL is set (checkpoint_retention.py)
+compaction = start_compaction_from_env(checkpointer)
 
 # -------------------
 # 7. Graph
 # -------------------
-graph = StateGraph(ChatState)
-graph.add_node("chat_node", chat_node)
-graph.add_node("tools", tool_node)
-
-graph.add_edge(START, "chat_node")
-graph.add_conditional_edges("chat_node", tools_condition)
-graph.add_edge("tools", "chat_node")
-
-chatbot = graph.compile(checkpointer=checkpointer)
+def _build_graph(chat) -> StateGraph:
+    graph = StateGraph(ChatState)
+    graph.add_node("chat_node", chat)
+    graph.add_node("tools", tool_node)
+
+    if fast_path:
+        # Unambiguous calculator and stock-quote questions skip the model
+        graph.add_node("fast_path", fast_path)
+        graph.add_edge(START, "fast_path")
+        graph.add_conditional_edges(
+            "fast_path",
+            fast_path_condition,
+            {"chat_node": "chat_node", END: "summarize" if SUMMARIZE_HISTORY else END},
+        )
+    else:
+        graph.add_edge(START, "chat_node")
+    if SUMMARIZE_HISTORY:
+        # Final answers go through the summarize node, after they have been streamed
+        graph.add_node("summarize", make_summarize_node(llm, model=llm.model_name))
+        graph.add_conditional_edges("chat_node", tools_condition, {"tools": "tools", END: "summarize"})
+        graph.add_edge("summarize", END)
+    else:
+        graph.add_conditional_edges("chat_node", tools_condition)
+    graph.add_edge("tools", "chat_node")
+    return graph
+
+
+chatbot = _build_graph(chat_node).compile(checkpointer=checkpointer)
+# Same graph and checkpointer for ainvoke/astream callers: model calls and
+# tools run as coroutines, and a turn's parallel tool calls overlap
+async_chatbot = _build_graph(achat_node).compile(checkpointer=checkpointer)
 
 # -------------------
 # 8. Helpers
 # -------------------
-def retrieve_all_threads():
-    all_threads = set()
-    for checkpoint in checkpointer.list(None):
-        all_threads.add(checkpoint.config["configurable"]["thread_id"])
-    return list(all_threads)
+def list_threads(limit: Optional[int] = None, offset: int = 0) -> list[dict]:
+    """Paginated thread catalog entries, most recently active first."""
+    return checkpointer.list_threads(limit=limit, offset=offset)
+
+
+def retrieve_all_threads(limit: Optional[int] = None, offset: int = 0) -> list[str]:
+    return [t["thread_id"] for t in list_threads(limit=limit, offset=offset)]
+
+
+def get_thread_titles(thread_ids) -> dict:
+    """Sidebar titles for many threads from a single query; unknown ids get a default."""
+    stored = checkpointer.get_thread_titles(thread_ids)
+    return {
+        tid: stored.get(str(tid), {}).get("title", DEFAULT_TITLE)
+        for tid in thread_ids
+    }
+
+
+def load_messages(
+    thread_id: str, limit: int = 30, before: Optional[int] = None
+) -> tuple[list, Optional[int]]:
+    """
+    Last `limit` messages of a thread (oldest first) and a cursor for the page
+    before them; pass the cursor back as `before`. The cursor is None at the start.
+    """
+    return checkpointer.get_messages(thread_id, limit=limit, before=before)
 
 
 def thread_has_document(thread_id: str) -> bool:
@@ -233,4 +388,29 @@ def thread_has_document(thread_id: str) -> bool:
 
 
 def thread_document_metadata(thread_id: str) -> dict:
-    return _THREAD_METADATA.get(str(thread_id), {})
\ No newline at end of file
+    return _THREAD_METADATA.get(str(thread_id), {})
+
+
+def semantic_cache_stats() -> dict:
+    """Hit rate and latency saved by the semantic cache (empty when it is off)."""
+    return semantic_cache.stats() if semantic_cache else {}
+
+
+def fast_path_stats() -> dict:
+    """Fraction of turns answered without any model call (empty when off)."""
+    return fast_path.stats() if fast_path else {}
+
+
+def web_search_stats() -> dict:
+    """Hit rate and stale fallbacks of the shared search cache."""
+    return search_cache_stats()
+
+
+def tool_guard_stats() -> dict:
+    """Calls, errors, timeouts, latency and circuit state per tool."""
+    return tool_stats()
+
+
+def model_router_stats() -> dict:
+    """Calls, fallbacks, latency, tokens and cost per route."""
+    return router.stats()
\ No newline at end of file
@@ -1,115 +1,169 @@
 # backend.py
 
 from langgraph.graph import StateGraph, START, END
-from typing import TypedDict, Annotated
+from typing import TypedDict, Annotated, NotRequired
 from langchain_core.messages import BaseMessage, HumanMessage
-from langchain_openai import ChatOpenAI
-from langgraph.checkpoint.sqlite import SqliteSaver
+from openai_clients import chat_model
 from langgraph.graph.message import add_messages
 from langgraph.prebuilt import ToolNode, tools_condition
-from langchain_community.tools import DuckDuckGoSearchRun
-from langchain_core.tools import tool
 from dotenv import load_dotenv
-import sqlite3
-import requests
+from checkpoint_codec import CompressedSerializer
+from sqlite_checkpointer import DEFAULT_TITLE, PooledSqliteSaver
+from checkpoint_retention import start_compaction_from_env
+from llm_cache import ResponseCache
+from context_window import build_context
+from model_router import ModelRouter
+from stock_quotes import get_stock_price, get_stock_prices
+from web_search import cached_search_tool, search_cache_stats
+from calculator import calculator
+from tool_guard import guarded_tools, tool_stats
+from fast_path import FAST_PATH, FastPathNode, fast_path_condition
+from conversation_summary import SUMMARIZE_HISTORY, make_summarize_node, summarized_messages
 
 load_dotenv()
 
 # -------------------
-# 1. LLM
+# 1. LLM (repeated prompts, tool calls included, come from llm_cache.db)
 # -------------------
-llm = ChatOpenAI()
+llm = chat_model(cache=ResponseCache())
 
 # -------------------
 # 2. Tools
 # -------------------
 # Tools
-search_tool = DuckDuckGoSearchRun(region="us-en")
+# Cached on disk (search_cache.db), deduplicated and size-capped
+search_tool = cached_search_tool(region="us-en")
 
-@tool
-def calculator(first_num: float, second_num: float, operation: str) -> dict:
-    """
-    Perform a basic arithmetic operation on two numbers.
-    Supported operations: add, sub, mul, div
-    """
-    try:
-        if operation == "add":
-            result = first_num + second_num
-        elif operation == "sub":
-            result = first_num - second_num
-        elif operation == "mul":
-            result = first_num * second_num
-        elif operation == "div":
-            if second_num == 0:
-                return {"error": "Division by zero is not allowed"}
-            result = first_num / second_num
-        else:
-            return {"error": f"Unsupported operation '{operation}'"}
-        
-        return {"first_num": first_num, "second_num": second_num, "operation": operation, "result": result}
-    except Exception as e:
-        return {"error": str(e)}
-
-
-
-
-@tool
-def get_stock_price(symbol: str) -> dict:
-    """
-    Fetch latest stock price for a given symbol (e.g. 'AAPL', 'TSLA') 
-    using Alpha Vantage with API key in the URL.
-    """
-    url = f"https://www.alphavantage.co/query?function=GLOBAL_QUOTE&symbol={symbol}&apikey=C9PE94QUEW9VWGFM"
-    r = requests.get(url)
-    return r.json()
-
-
-
-tools = [search_tool, get_stock_price, calculator]
-llm_with_tools = llm.bind_tools(tools)
+# Quotes come from a shared TTL cache (stock_quotes.py); calculator takes a
+# whole multi-step calculation in one call (calculator.py)
+# Each call has a deadline, a concurrency limit and a circuit breaker (tool_guard.py)
+tools = guarded_tools([search_tool, get_stock_price, get_stock_prices, calculator])
+# Cheapest adequate model per turn when MODEL_ROUTING=1, else always llm
+router = ModelRouter(llm, tools=tools)
 
 # -------------------
 # 3. State
 # -------------------
 class ChatState(TypedDict):
     messages: Annotated[list[BaseMessage], add_messages]
+    # Running summary of messages[:summary_upto], kept by the summarize node
+    summary: NotRequired[str]
+    summary_upto: NotRequired[int]
 
 # -------------------
 # 4. Nodes
 # -------------------
 def chat_node(state: ChatState):
     """LLM node that may answer or request a tool call."""
-    messages = state["messages"]
-    response = llm_with_tools.invoke(messages)
+    # Summary + recent turns only, within the token budget
+    history = summarized_messages(state)
+    route = router.route(history)
+    context = build_context(history, model=route.model)
+    response = router.invoke(route, context.messages)
+    return {"messages": [response]}
+
+async def achat_node(state: ChatState):
+    """chat_node for async_chatbot: the model call awaits on the event loop."""
+    history = summarized_messages(state)
+    route = router.route(history)
+    context = build_context(history, model=route.model)
+    response = await router.ainvoke(route, context.messages)
     return {"messages": [response]}
 
 tool_node = ToolNode(tools)
+# Answers obvious tool questions without the model; off unless FAST_PATH=1
+fast_path = FastPathNode(tools) if FAST_PATH else None
 
 # -------------------
 # 5. Checkpointer
 # -------------------
-conn = sqlite3.connect(database="chatbot.db", check_same_thread=False)
-checkpointer = SqliteSaver(conn=conn)
+# WAL + read pool + single writer thread, shared by every Streamlit session
+checkpointer = PooledSqliteSaver(
+    "chatbot.db", serde=CompressedSerializer(), delta_messages=True
+)
+# Old checkpoints are pruned in the background when CHECKPOINT_KEEP_LAST or
+# CHECKPOINT_COMPACT_INTERVAL is set (checkpoint_retention.py)
+compaction = start_compaction_from_env(checkpointer)
 
 # -------------------
 # 6. Graph
 # -------------------
-graph = StateGraph(ChatState)
-graph.add_node("chat_node", chat_node)
-graph.add_node("tools", tool_node)
-
-graph.add_edge(START, "chat_node")
-
-graph.add_conditional_edges("chat_node",tools_condition)
-graph.add_edge('tools', 'chat_node')
-
-chatbot = graph.compile(checkpointer=checkpointer)
+def _build_graph(chat):
+    graph = StateGraph(ChatState)
+    graph.add_node("chat_node", chat)
+    graph.add_node("tools", tool_node)
+
+    if fast_path:
+        # Unambiguous calculator and stock-quote questions skip the model
+        graph.add_node("fast_path", fast_path)
+        graph.add_edge(START, "fast_path")
+        graph.add_conditional_edges(
+            "fast_path",
+            fast_path_condition,
+            {"chat_node": "chat_node", END: "summarize" if SUMMARIZE_HISTORY else END},
+        )
+    else:
+        graph.add_edge(START, "chat_node")
+
+    if SUMMARIZE_HISTORY:
+        # Final answers go through the summarize node, after they have been streamed
+        graph.add_node("summarize", make_summarize_node(llm, model=llm.model_name))
+        graph.add_conditional_edges("chat_node", tools_condition, {"tools": "tools", END: "summarize"})
+        graph.add_edge("summarize", END)
+    else:
+        graph.add_conditional_edges("chat_node",tools_condition)
+    graph.add_edge('tools', 'chat_node')
+    return graph
+
+chatbot = _build_graph(chat_node).compile(checkpointer=checkpointer)
+# Same graph and checkpointer for ainvoke/astream callers: model calls and
+# tools run as coroutines, and a turn's parallel tool calls overlap
+async_chatbot = _build_graph(achat_node).compile(checkpointer=checkpointer)
 
 # -------------------
 # 7. Helper
 # -------------------
-def retrieve_all_threads():
-    all_threads = set()
-    for checkpoint in checkpointer.list(None):
-        all_threads.add(checkpoint.config["configurable"]["thread_id"])
-    return list(all_threads)
\ No newline at end of file
+def list_threads(limit=None, offset=0):
+    """Paginated thread catalog entries, most recently active first."""
+    return checkpointer.list_threads(limit=limit, offset=offset)
+
+
+def retrieve_all_threads(limit=None, offset=0):
+    return [t["thread_id"] for t in list_threads(limit=limit, offset=offset)]
+
+
+def get_thread_titles(thread_ids):
+    """Sidebar titles for many threads from a single query; unknown ids get a default."""
+    stored = checkpointer.get_thread_titles(thread_ids)
+    return {
+        tid: stored.get(str(tid), {}).get("title", DEFAULT_TITLE)
+        for tid in thread_ids
+    }
+
+
+def load_messages(thread_id, limit=30, before=None):
+    """
+    Last `limit` messages of a thread (oldest first) and a cursor for the page
+    before them; pass the cursor back as `before`. The cursor is None at the start.
+    """
+    return checkpointer.get_messages(thread_id, limit=limit, before=before)
+
+
+def fast_path_stats():
+    """Fraction of turns answered without any model call (empty when off)."""
+    return fast_path.stats() if fast_path else {}
+
+
+def web_search_stats():
+    """Hit rate and stale fallbacks of the shared search cache."""
+    return search_cache_stats()
+
+
+def tool_guard_stats():
+    """Calls, errors, timeouts, latency and circuit state per tool."""
+    return tool_stats()
+
+
+def model_router_stats():
+    """Calls, fallbacks, latency, tokens and cost per route."""
+    return router.stats()
@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumps, loads
+
+# -------------------
+# 1. Cache keys
+# -------------------
+CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used ON llm_cache (last_used);
+CREATE INDEX IF NOT EXISTS idx_llm_cache_expires_at ON llm_cache (expires_at);
+"""
+
+DEFAULT_CACHE_PATH = "llm_cache.db"
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 10_000
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Everything else on a message (ids, token usage, finish reasons) differs between
+# otherwise identical conversations, so it is left out of the key
+KEY_FIELDS = ("type", "content", "name", "tool_calls", "tool_call_id")
+
+
+def canonical_messages(prompt: str) -> list:
+    """The parts of each serialized message that determine the model's answer."""
+    canonical = []
+    for message in json.loads(prompt):
+        fields = message.get("kwargs", message)
+        canonical.append({k: fields[k] for k in KEY_FIELDS if fields.get(k)})
+    return canonical
+
+
+def cache_key(prompt: str, llm_string: str) -> str:
+    """
+    Hash of the model configuration and the conversation.
+
+    `llm_string` covers the model name, its parameters and the tools bound with
+    bind_tools(); `prompt` is the message list as serialized by LangChain.
+    """
+    payload = json.dumps([llm_string, canonical_messages(prompt)], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+# -------------------
+# 2. Cache
+# -------------------
+class ResponseCache(BaseCache):
+    """
+    Persistent exact-match cache for chat model responses.
+
+    Pass it as ChatOpenAI(cache=...). Whole generations are stored, tool calls
+    included, so a cached turn replays the same tool calls. Entries expire
+    after `ttl` seconds (None: never); past `max_entries` or `max_bytes` the
+    least recently used entries are evicted.
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_CACHE_PATH,
+        *,
+        ttl: Optional[float] = DEFAULT_TTL_SECONDS,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(CACHE_SCHEMA)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        # Running totals, so a write doesn't scan the table to check the limits
+        self.entries, self.bytes = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache"
+        ).fetchone()
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = cache_key(prompt, llm_string)
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT value FROM llm_cache WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (key, now),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.conn.execute("UPDATE llm_cache SET last_used = ? WHERE key = ?", (now, key))
+        return loads(row[0])
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        key = cache_key(prompt, llm_string)
+        value = dumps(list(return_val))
+        now = time.time()
+        expires_at = now + self.ttl if self.ttl is not None else None
+        with self.lock:
+            replaced = self.conn.execute("SELECT size FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, size, expires_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value), expires_at, now),
+            )
+            if replaced is None:
+                self.entries += 1
+            self.bytes += len(value) - (replaced[0] if replaced else 0)
+            self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        # Both steps use an index and touch only the rows they remove
+        expired, expired_size = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache WHERE expires_at <= ?", (now,)
+        ).fetchone()
+        if expired:
+            self.conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,))
+            self.entries -= expired
+            self.bytes -= expired_size
+        if self.entries <= self.max_entries and self.bytes <= self.max_bytes:
+            return
+        victims = []
+        for key, entry_size in self.conn.execute(
+            "SELECT key, size FROM llm_cache ORDER BY last_used"
+        ):
+            if self.entries <= self.max_entries and self.bytes <= self.max_bytes:
+                break
+            victims.append((key,))
+            self.entries -= 1
+            self.bytes -= entry_size
+        self.conn.executemany("DELETE FROM llm_cache WHERE key = ?", victims)
+
+    def clear(self, **kwargs: Any) -> None:
+        with self.lock:
+            self.conn.execute("DELETE FROM llm_cache")
+            self.entries = self.bytes = 0
+
+    def stats(self) -> dict[str, Any]:
+        with self.lock:
+            entries, size = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "bytes": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def close(self) -> None:
+        self.conn.close()
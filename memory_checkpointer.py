@@ -0,0 +1,323 @@
+from __future__ import annotations
+
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict, defaultdict
+from typing import Any, Iterator, Optional, Sequence
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    SerializerProtocol,
+)
+from langgraph.checkpoint.memory import InMemorySaver
+
+# -------------------
+# 1. Spill store
+# -------------------
+SPILL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS spilled_threads (
+    thread_id TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    data BLOB NOT NULL
+);
+"""
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def _payload_size(value: Any) -> int:
+    """Bytes held by a stored entry: serialized (type, bytes) pairs, possibly nested."""
+    if isinstance(value, (bytes, str)):
+        return len(value)
+    if isinstance(value, tuple):
+        return sum(_payload_size(v) for v in value)
+    return 0
+
+
+def _close_spill_file(conn: sqlite3.Connection, temporary_path: Optional[str]) -> None:
+    conn.close()
+    if temporary_path:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(temporary_path + suffix):
+                os.remove(temporary_path + suffix)
+
+
+class SpillStore:
+    """Cold threads of a BoundedMemorySaver, one pickled row per thread."""
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        # Without a path the store is a private temp file, removed on close()
+        self.temporary = path is None
+        if path is None:
+            fd, path = tempfile.mkstemp(prefix="langgraph-spill-", suffix=".db")
+            os.close(fd)
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SPILL_SCHEMA)
+        # Module-level savers are never closed explicitly; clean up at exit too
+        self._finalizer = weakref.finalize(
+            self, _close_spill_file, self.conn, path if self.temporary else None
+        )
+
+    def save(self, thread_id: str, size: int, data: dict) -> None:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO spilled_threads (thread_id, size, data) VALUES (?, ?, ?)",
+            (thread_id, size, pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)),
+        )
+
+    def pop(self, thread_id: str) -> Optional[tuple[int, dict]]:
+        row = self.conn.execute(
+            "SELECT size, data FROM spilled_threads WHERE thread_id = ?", (thread_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        self.conn.execute("DELETE FROM spilled_threads WHERE thread_id = ?", (thread_id,))
+        return row[0], pickle.loads(row[1])
+
+    def delete(self, thread_id: str) -> None:
+        self.conn.execute("DELETE FROM spilled_threads WHERE thread_id = ?", (thread_id,))
+
+    def thread_ids(self) -> list[str]:
+        return [row[0] for row in self.conn.execute("SELECT thread_id FROM spilled_threads")]
+
+    def stats(self) -> tuple[int, int]:
+        count, size = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM spilled_threads"
+        ).fetchone()
+        return count, size
+
+    def close(self) -> None:
+        self._finalizer()
+
+
+# -------------------
+# 2. Saver
+# -------------------
+class BoundedMemorySaver(InMemorySaver):
+    """
+    InMemorySaver with a memory budget.
+
+    Threads are kept in LRU order. When the resident checkpoints exceed
+    `max_bytes` (or `max_threads`), the least recently used threads are moved
+    to a SQLite spill file and loaded back transparently on their next access.
+    The most recently used thread always stays resident.
+    """
+
+    def __init__(
+        self,
+        *,
+        serde: Optional[SerializerProtocol] = None,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        max_threads: Optional[int] = None,
+        spill_path: Optional[str] = None,
+    ) -> None:
+        super().__init__(serde=serde)
+        self.max_bytes = max_bytes
+        self.max_threads = max_threads
+        self.spill = SpillStore(spill_path)
+        self.lock = threading.RLock()
+        # thread_id -> serialized bytes, least recently used first
+        self._lru: OrderedDict[str, int] = OrderedDict()
+        # thread_id -> keys of its entries in self.writes / self.blobs
+        self._write_keys: defaultdict[str, set] = defaultdict(set)
+        self._blob_keys: defaultdict[str, set] = defaultdict(set)
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # -------------------
+    # 3. Residency
+    # -------------------
+    def _touch(self, thread_id: str, lookup: bool = False) -> None:
+        """
+        Make a thread resident (loading it from the spill file) and most recent.
+
+        Only lookups (get_tuple, list) count as hits or misses; a put follows
+        the read of its own thread and would inflate the hit rate.
+        """
+        if thread_id in self._lru:
+            if lookup:
+                self.hits += 1
+            self._lru.move_to_end(thread_id)
+            return
+        spilled = self.spill.pop(thread_id)
+        if spilled is None:
+            return
+        if lookup:
+            self.misses += 1
+        size, data = spilled
+        for checkpoint_ns, checkpoints in data["storage"].items():
+            self.storage[thread_id][checkpoint_ns].update(checkpoints)
+        for key, writes in data["writes"].items():
+            self.writes[key] = writes
+            self._write_keys[thread_id].add(key)
+        for key, blob in data["blobs"].items():
+            self.blobs[key] = blob
+            self._blob_keys[thread_id].add(key)
+        self._lru[thread_id] = size
+        self._bytes += size
+        self._evict()
+
+    def _grow(self, thread_id: str, delta: int) -> None:
+        self._lru[thread_id] = self._lru.get(thread_id, 0) + delta
+        self._lru.move_to_end(thread_id)
+        self._bytes += delta
+        self._evict()
+
+    def _over_budget(self) -> bool:
+        if self.max_threads is not None and len(self._lru) > self.max_threads:
+            return True
+        return self._bytes > self.max_bytes
+
+    def _evict(self) -> None:
+        while len(self._lru) > 1 and self._over_budget():
+            thread_id, size = self._lru.popitem(last=False)
+            storage = self.storage.pop(thread_id, {})
+            write_keys = self._write_keys.pop(thread_id, set())
+            blob_keys = self._blob_keys.pop(thread_id, set())
+            data = {
+                "storage": {ns: dict(checkpoints) for ns, checkpoints in storage.items()},
+                "writes": {k: self.writes.pop(k) for k in write_keys if k in self.writes},
+                "blobs": {k: self.blobs.pop(k) for k in blob_keys if k in self.blobs},
+            }
+            self.spill.save(thread_id, size, data)
+            self._bytes -= size
+            self.evictions += 1
+
+    def _forget(self, thread_id: str) -> None:
+        self._bytes -= self._lru.pop(thread_id, 0)
+        self._write_keys.pop(thread_id, None)
+        self._blob_keys.pop(thread_id, None)
+
+    # -------------------
+    # 4. Checkpointer API
+    # -------------------
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        with self.lock:
+            self._touch(thread_id, lookup=True)
+            checkpoint_tuple = super().get_tuple(config)
+            # The parent's defaultdicts leave an empty entry behind for unknown threads
+            if thread_id not in self._lru and not any(self.storage.get(thread_id, {}).values()):
+                self.storage.pop(thread_id, None)
+            return checkpoint_tuple
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        if config is not None:
+            with self.lock:
+                self._touch(config["configurable"]["thread_id"], lookup=True)
+                # Materialized so the lock is not held across yields
+                checkpoint_tuples = [*super().list(config, filter=filter, before=before, limit=limit)]
+            yield from checkpoint_tuples
+            return
+
+        for thread_id in self.thread_ids():
+            if limit is not None and limit <= 0:
+                return
+            for checkpoint_tuple in self.list(
+                {"configurable": {"thread_id": thread_id}},
+                filter=filter,
+                before=before,
+                limit=limit,
+            ):
+                if limit is not None:
+                    limit -= 1
+                yield checkpoint_tuple
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        with self.lock:
+            self._touch(thread_id)
+            next_config = super().put(config, checkpoint, metadata, new_versions)
+            size = _payload_size(self.storage[thread_id][checkpoint_ns][checkpoint["id"]])
+            for channel, version in new_versions.items():
+                key = (thread_id, checkpoint_ns, channel, version)
+                if key not in self._blob_keys[thread_id]:
+                    self._blob_keys[thread_id].add(key)
+                    size += _payload_size(self.blobs[key])
+            self._grow(thread_id, size)
+            return next_config
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        key = (
+            thread_id,
+            config["configurable"].get("checkpoint_ns", ""),
+            config["configurable"]["checkpoint_id"],
+        )
+        with self.lock:
+            self._touch(thread_id)
+            before = sum(_payload_size(w) for w in self.writes.get(key, {}).values())
+            super().put_writes(config, writes, task_id, task_path)
+            after = sum(_payload_size(w) for w in self.writes.get(key, {}).values())
+            self._write_keys[thread_id].add(key)
+            self._grow(thread_id, after - before)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self.lock:
+            # Only this thread's keys are dropped, instead of the parent's full scan
+            for key in self._write_keys.get(thread_id, ()):
+                self.writes.pop(key, None)
+            for key in self._blob_keys.get(thread_id, ()):
+                self.blobs.pop(key, None)
+            self.storage.pop(thread_id, None)
+            self._forget(thread_id)
+            self.spill.delete(thread_id)
+
+    # -------------------
+    # 5. Monitoring
+    # -------------------
+    def thread_ids(self) -> list[str]:
+        """Every stored thread, resident (most recent first) and spilled."""
+        with self.lock:
+            return [*reversed(self._lru), *self.spill.thread_ids()]
+
+    def stats(self) -> dict[str, Any]:
+        with self.lock:
+            spilled_threads, spilled_bytes = self.spill.stats()
+            lookups = self.hits + self.misses
+            return {
+                "resident_threads": len(self._lru),
+                "resident_bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "spilled_threads": spilled_threads,
+                "spilled_bytes": spilled_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 1.0,
+                "evictions": self.evictions,
+            }
+
+    def close(self) -> None:
+        with self.lock:
+            self.spill.close()
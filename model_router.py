@@ -0,0 +1,291 @@
+from __future__ import annotations
+
+import logging
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Optional, Sequence
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.runnables import Runnable
+from langchain_openai import ChatOpenAI
+
+from context_window import count_tokens
+from hedging import hedged
+from openai_clients import chat_model
+from rate_limiter import EXPECTED_COMPLETION_TOKENS, INTERACTIVE, reserve
+
+logger = logging.getLogger(__name__)
+
+# -------------------
+# 1. Models and tiers
+# -------------------
+# Routing is opt-in; without it every turn goes to the backend's own model
+MODEL_ROUTING = os.getenv("MODEL_ROUTING") == "1"
+# Models the router may pick from, when routing is on
+ROUTER_MODELS = [
+    m.strip() for m in os.getenv("ROUTER_MODELS", "gpt-4o-mini,gpt-5-mini,gpt-5").split(",") if m.strip()
+]
+
+
+@dataclass(frozen=True)
+class ModelSpec:
+    name: str
+    tier: int  # 1: small, 2: mid-size, 3: frontier
+    input_cost: float  # USD per 1M tokens
+    output_cost: float
+
+    @property
+    def cost(self) -> float:
+        return self.input_cost + self.output_cost
+
+
+MODEL_CATALOG = {
+    spec.name: spec
+    for spec in (
+        ModelSpec("gpt-3.5-turbo", 1, 0.50, 1.50),
+        ModelSpec("gpt-4o-mini", 1, 0.15, 0.60),
+        ModelSpec("gpt-4.1-mini", 2, 0.40, 1.60),
+        ModelSpec("gpt-5-mini", 2, 0.25, 2.00),
+        ModelSpec("gpt-4o", 2, 2.50, 10.00),
+        ModelSpec("gpt-4.1", 3, 2.00, 8.00),
+        ModelSpec("gpt-5", 3, 1.25, 10.00),
+    )
+}
+
+
+def model_spec(name: str) -> ModelSpec:
+    # Unknown models are treated as mid-size and unpriced
+    return MODEL_CATALOG.get(name, ModelSpec(name, 2, 0.0, 0.0))
+
+
+# -------------------
+# 2. Turn classification
+# -------------------
+CHIT_CHAT = "chit_chat"
+TOOL = "tool"
+DOCUMENT = "document"
+REASONING = "reasoning"
+GENERAL = "general"
+
+# Lowest model tier each route needs
+ROUTE_TIERS = {CHIT_CHAT: 1, GENERAL: 1, TOOL: 1, DOCUMENT: 2, REASONING: 3}
+
+CHIT_CHAT_PATTERN = re.compile(
+    r"^\W*(hi|hello|hey|yo|thanks|thank you|thx|ok|okay|cool|great|nice|bye|goodbye|"
+    r"good (morning|afternoon|evening|night)|how are you|who are you|what'?s up)\b",
+    re.IGNORECASE,
+)
+TOOL_PATTERN = re.compile(
+    r"\d\s*[-+*/x]\s*\d|\b(calculate|compute|sum of|product of|price|stock|shares?|ticker|"
+    r"quote|news|latest|today|current|search|look up|weather)\b",
+    re.IGNORECASE,
+)
+DOCUMENT_PATTERN = re.compile(
+    r"\b(pdf|document|doc|file|page|section|chapter|paper|report|upload(ed)?|according to)\b",
+    re.IGNORECASE,
+)
+REASONING_PATTERN = re.compile(
+    r"\b(why|explain|prove|derive|compare|contrast|analy[sz]e|evaluate|trade-?offs?|"
+    r"step by step|design|architect|plan|debug|optimi[sz]e|reason|implications?)\b",
+    re.IGNORECASE,
+)
+# Questions longer than this are treated as hard whatever their wording
+REASONING_WORDS = 80
+CHIT_CHAT_WORDS = 8
+
+
+def _last_question(messages: Sequence[BaseMessage]) -> str:
+    for message in reversed(messages):
+        if isinstance(message, HumanMessage):
+            content = message.content
+            return content if isinstance(content, str) else " ".join(
+                b.get("text", "") for b in content if isinstance(b, dict)
+            )
+    return ""
+
+
+def classify_turn(
+    messages: Sequence[BaseMessage], *, has_tools: bool = False, has_document: bool = False
+) -> str:
+    """
+    Route for the current turn, from the latest user message.
+
+    Keyword rules rather than a model call: classifying must cost far less
+    than the savings it buys. Later rounds of a tool loop classify the same
+    question, so a turn keeps its route.
+    """
+    question = _last_question(messages)
+    words = len(question.split())
+    if has_document and DOCUMENT_PATTERN.search(question):
+        return DOCUMENT
+    if words > REASONING_WORDS:
+        return REASONING
+    if has_tools and TOOL_PATTERN.search(question):
+        return TOOL
+    if REASONING_PATTERN.search(question):
+        return REASONING
+    if words <= CHIT_CHAT_WORDS and CHIT_CHAT_PATTERN.search(question):
+        return CHIT_CHAT
+    return GENERAL
+
+
+# -------------------
+# 3. Router
+# -------------------
+@dataclass(frozen=True)
+class Route:
+    name: str
+    model: str
+
+
+@dataclass
+class RouteStats:
+    calls: int = 0
+    fallbacks: int = 0
+    seconds: float = 0.0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cost: float = 0.0
+
+
+class ModelRouter:
+    """
+    Sends each turn to the cheapest model whose tier meets its route's need.
+
+    `llm` is the backend's own model; it answers every turn unless routing is
+    enabled (MODEL_ROUTING=1), in which case the candidates are `models`
+    (ROUTER_MODELS). Other candidates are built lazily with the same cache
+    and bound to the same tools. A reply whose tool calls cannot be parsed,
+    or that names an unknown tool, is retried once on the next tier up.
+    Every upstream call waits its turn on the model's shared rate limiter;
+    response-cache hits skip it.
+    """
+
+    def __init__(
+        self,
+        llm: ChatOpenAI,
+        *,
+        tools: Sequence[Any] = (),
+        enabled: bool = MODEL_ROUTING,
+        models: Optional[Sequence[str]] = None,
+        priority: int = INTERACTIVE,
+    ) -> None:
+        self.llm = llm
+        self.priority = priority
+        self.tools = list(tools)
+        self.tool_names = {t.name for t in self.tools}
+        names = list(models or ROUTER_MODELS) if enabled else [llm.model_name]
+        # Cheapest first; ties keep the configured order
+        self.candidates = sorted((model_spec(n) for n in dict.fromkeys(names)), key=lambda s: s.cost)
+        self.lock = threading.Lock()
+        self._runnables: dict[str, Runnable] = {}
+        self._stats: dict[str, RouteStats] = {}
+
+    def _pick(self, tier: int, above: Optional[ModelSpec] = None) -> Optional[ModelSpec]:
+        for spec in self.candidates:
+            if spec.tier >= tier and (above is None or spec.tier > above.tier):
+                return spec
+        if above is None:
+            return max(self.candidates, key=lambda s: s.tier)
+        return None
+
+    def route(self, messages: Sequence[BaseMessage], *, has_document: bool = False) -> Route:
+        name = classify_turn(messages, has_tools=bool(self.tools), has_document=has_document)
+        return Route(name, self._pick(ROUTE_TIERS[name]).name)
+
+    def runnable(self, model: str) -> Runnable:
+        with self.lock:
+            if model not in self._runnables:
+                llm = self.llm if model == self.llm.model_name else chat_model(model=model, cache=self.llm.cache)
+                # Duplicates slow first tokens when HEDGE_REQUESTS=1
+                llm = hedged(llm)
+                self._runnables[model] = llm.bind_tools(self.tools) if self.tools else llm
+            return self._runnables[model]
+
+    def _needs_fallback(self, response: AIMessage) -> bool:
+        if not self.tools:
+            return False
+        if response.invalid_tool_calls:
+            return True
+        return any(call["name"] not in self.tool_names for call in response.tool_calls)
+
+    def _record(self, route: Route, model: str, response: AIMessage, seconds: float, fallback: bool) -> None:
+        usage = response.usage_metadata or {}
+        spec = model_spec(model)
+        with self.lock:
+            stats = self._stats.setdefault(route.name, RouteStats())
+            stats.calls += 1
+            stats.fallbacks += int(fallback)
+            stats.seconds += seconds
+            stats.input_tokens += usage.get("input_tokens", 0)
+            stats.output_tokens += usage.get("output_tokens", 0)
+            stats.cost += (
+                usage.get("input_tokens", 0) * spec.input_cost + usage.get("output_tokens", 0) * spec.output_cost
+            ) / 1e6
+
+    def _fallback_model(self, route: Route, response: AIMessage) -> Optional[str]:
+        if not self._needs_fallback(response):
+            return None
+        bigger = self._pick(ROUTE_TIERS[route.name], above=model_spec(route.model))
+        if bigger is None:
+            return None
+        logger.warning("unusable tool calls from %s; retrying on %s", route.model, bigger.name)
+        return bigger.name
+
+    def _estimate(self, model: str, messages: Sequence[BaseMessage]) -> int:
+        return count_tokens(list(messages), model) + EXPECTED_COMPLETION_TOKENS
+
+    def _call(
+        self, route: Route, model: str, messages: Sequence[BaseMessage], config: Optional[dict], fallback: bool
+    ) -> AIMessage:
+        # Waits on the model's limiter only if the response cache misses
+        with reserve(model, self._estimate(model, messages), self.priority) as reservation:
+            started = time.perf_counter()
+            response = self.runnable(model).invoke(messages, config=config)
+            reservation.usage = (response.usage_metadata or {}).get("total_tokens")
+        self._record(route, model, response, time.perf_counter() - started, fallback)
+        return response
+
+    async def _acall(
+        self, route: Route, model: str, messages: Sequence[BaseMessage], config: Optional[dict], fallback: bool
+    ) -> AIMessage:
+        with reserve(model, self._estimate(model, messages), self.priority) as reservation:
+            started = time.perf_counter()
+            response = await self.runnable(model).ainvoke(messages, config=config)
+            reservation.usage = (response.usage_metadata or {}).get("total_tokens")
+        self._record(route, model, response, time.perf_counter() - started, fallback)
+        return response
+
+    def invoke(self, route: Route, messages: Sequence[BaseMessage], config: Optional[dict] = None) -> AIMessage:
+        response = self._call(route, route.model, messages, config, False)
+        fallback = self._fallback_model(route, response)
+        if fallback is None:
+            return response
+        return self._call(route, fallback, messages, config, True)
+
+    async def ainvoke(
+        self, route: Route, messages: Sequence[BaseMessage], config: Optional[dict] = None
+    ) -> AIMessage:
+        response = await self._acall(route, route.model, messages, config, False)
+        fallback = self._fallback_model(route, response)
+        if fallback is None:
+            return response
+        return await self._acall(route, fallback, messages, config, True)
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        """Per route: model calls, fallbacks, mean latency, tokens and estimated cost."""
+        with self.lock:
+            return {
+                name: {
+                    "calls": s.calls,
+                    "fallbacks": s.fallbacks,
+                    "mean_seconds": s.seconds / s.calls if s.calls else 0.0,
+                    "input_tokens": s.input_tokens,
+                    "output_tokens": s.output_tokens,
+                    "cost_usd": s.cost,
+                }
+                for name, s in self._stats.items()
+            }
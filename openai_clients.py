@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import os
+from typing import Any, Optional
+
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+
+from http_clients import async_http_client, http_client
+from rate_limiter import reserved_rate_limiter
+
+# -------------------
+# 1. Settings
+# -------------------
+# Base URL of an OpenAI-compatible server to use instead of the live API,
+# e.g. http://127.0.0.1:8765/v1 for fake_openai_server.py
+FAKE_OPENAI_URL_ENV = "FAKE_OPENAI_URL"
+
+
+def fake_openai_url() -> Optional[str]:
+    return os.getenv(FAKE_OPENAI_URL_ENV) or None
+
+
+def _pooled(kwargs: dict) -> dict:
+    # Every model shares one keep-alive pool instead of opening its own
+    kwargs.setdefault("http_client", http_client())
+    kwargs.setdefault("http_async_client", async_http_client())
+    return kwargs
+
+
+# -------------------
+# 2. Model factories
+# -------------------
+def chat_model(**kwargs: Any) -> ChatOpenAI:
+    """ChatOpenAI(**kwargs), pointed at the fake server when FAKE_OPENAI_URL is set."""
+    kwargs = _pooled(kwargs)
+    # Calls inside rate_limiter.reserve() wait for capacity, unless the cache answers
+    kwargs.setdefault("rate_limiter", reserved_rate_limiter)
+    url = fake_openai_url()
+    if url:
+        kwargs.setdefault("base_url", url)
+        kwargs.setdefault("api_key", "fake")
+    return ChatOpenAI(**kwargs)
+
+
+def embeddings_model(**kwargs: Any) -> OpenAIEmbeddings:
+    """OpenAIEmbeddings(**kwargs), pointed at the fake server when FAKE_OPENAI_URL is set."""
+    kwargs = _pooled(kwargs)
+    url = fake_openai_url()
+    if url:
+        kwargs.setdefault("base_url", url)
+        kwargs.setdefault("api_key", "fake")
+        # Pre-chunking by token needs tiktoken's BPE files, which are downloaded
+        kwargs.setdefault("check_embedding_ctx_length", False)
+    return OpenAIEmbeddings(**kwargs)
@@ -0,0 +1,363 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Iterator, Optional
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.rate_limiters import BaseRateLimiter
+
+from context_window import count_text_tokens
+
+# -------------------
+# 1. Settings
+# -------------------
+# Per model; set them a little under the account's OpenAI limits
+REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "500"))
+TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "200000"))
+EMBEDDING_REQUESTS_PER_MINUTE = int(os.getenv("EMBEDDING_REQUESTS_PER_MINUTE", "3000"))
+EMBEDDING_TOKENS_PER_MINUTE = int(os.getenv("EMBEDDING_TOKENS_PER_MINUTE", "1000000"))
+
+# Lower runs first: a user waiting on a turn goes ahead of PDF ingestion or summaries
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+# Completion tokens reserved per chat call; corrected from the usage afterwards
+EXPECTED_COMPLETION_TOKENS = 256
+# Texts per embedding request during ingestion
+EMBEDDING_BATCH = 64
+POLL_SECONDS = 0.05
+
+
+@dataclass
+class TokenBucket:
+    capacity: float
+    per_second: float
+    level: float = field(default=-1.0)
+    updated: float = field(default_factory=time.monotonic)
+
+    def __post_init__(self) -> None:
+        if self.level < 0:
+            self.level = self.capacity
+
+    def refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.per_second)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        return max(0.0, (amount - self.level) / self.per_second)
+
+
+@dataclass
+class PriorityStats:
+    admitted: int = 0
+    waited: int = 0
+    wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+
+
+# -------------------
+# 2. Scheduler
+# -------------------
+class RateLimiter:
+    """
+    Token buckets for requests/min and tokens/min, with a priority queue.
+
+    Callers are admitted one at a time, lowest priority value first and in
+    arrival order within a priority, once both buckets can cover them. Token
+    costs are estimates; record_usage() settles the difference once the real
+    usage is known, so an underestimate delays the callers after it.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int) -> None:
+        self.requests = TokenBucket(requests_per_minute, requests_per_minute / 60)
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60)
+        self.cond = threading.Condition()
+        self._queue: list[tuple[int, int]] = []
+        self._order = itertools.count()
+        self.max_queue_depth = 0
+        self.tokens_used = 0
+        self._stats = {p: PriorityStats() for p in PRIORITY_NAMES}
+        # (loop, event) of coroutines in aacquire, woken like the condition's waiters
+        self._async_waiters: set[tuple[asyncio.AbstractEventLoop, asyncio.Event]] = set()
+
+    def _enqueue(self, priority: int) -> tuple[int, int]:
+        ticket = (priority, next(self._order))
+        heapq.heappush(self._queue, ticket)
+        self.max_queue_depth = max(self.max_queue_depth, len(self._queue))
+        return ticket
+
+    def _dequeue(self, ticket: tuple[int, int]) -> None:
+        self._queue.remove(ticket)
+        heapq.heapify(self._queue)
+        self.cond.notify_all()
+        for loop, event in self._async_waiters:
+            loop.call_soon_threadsafe(event.set)
+
+    def _try_admit(self, ticket: tuple[int, int], tokens: float) -> float:
+        """0 if admitted, else how long to wait before trying again."""
+        if self._queue[0] != ticket:
+            return POLL_SECONDS
+        now = time.monotonic()
+        self.requests.refill(now)
+        self.tokens.refill(now)
+        wait = max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+        if wait > 0:
+            return wait
+        self.requests.level -= 1
+        self.tokens.level -= tokens
+        return 0.0
+
+    def _admitted(self, priority: int, waited: float) -> None:
+        stats = self._stats[priority]
+        stats.admitted += 1
+        if waited > 0.001:
+            stats.waited += 1
+            stats.wait_seconds += waited
+            stats.max_wait_seconds = max(stats.max_wait_seconds, waited)
+
+    def acquire(self, tokens: int, priority: int = INTERACTIVE) -> float:
+        """Block until one request of ~`tokens` may go out; returns the seconds waited."""
+        tokens = min(tokens, self.tokens.capacity)
+        started = time.monotonic()
+        with self.cond:
+            ticket = self._enqueue(priority)
+            try:
+                while (wait := self._try_admit(ticket, tokens)) > 0:
+                    self.cond.wait(wait)
+            finally:
+                self._dequeue(ticket)
+            waited = time.monotonic() - started
+            self._admitted(priority, waited)
+        return waited
+
+    def try_acquire(self, tokens: int, priority: int = INTERACTIVE) -> bool:
+        """Take capacity only if nobody is queued and it is available now."""
+        tokens = min(tokens, self.tokens.capacity)
+        with self.cond:
+            if self._queue:
+                return False
+            ticket = self._enqueue(priority)
+            try:
+                admitted = self._try_admit(ticket, tokens) == 0
+            finally:
+                self._dequeue(ticket)
+            if admitted:
+                self._admitted(priority, 0.0)
+            return admitted
+
+    async def aacquire(self, tokens: int, priority: int = INTERACTIVE) -> float:
+        """acquire() for coroutines: waits with asyncio.sleep instead of blocking."""
+        tokens = min(tokens, self.tokens.capacity)
+        started = time.monotonic()
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self.cond:
+            ticket = self._enqueue(priority)
+            self._async_waiters.add(waiter)
+        try:
+            while True:
+                with self.cond:
+                    waiter[1].clear()
+                    wait = self._try_admit(ticket, tokens)
+                if wait <= 0:
+                    break
+                try:
+                    await asyncio.wait_for(waiter[1].wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            with self.cond:
+                self._async_waiters.discard(waiter)
+                self._dequeue(ticket)
+        waited = time.monotonic() - started
+        with self.cond:
+            self._admitted(priority, waited)
+        return waited
+
+    def record_usage(self, estimated: int, actual: Optional[int]) -> None:
+        """Charge (or refund) the difference between estimated and actual tokens."""
+        if actual is None:
+            actual = estimated
+        with self.cond:
+            self.tokens.level -= actual - min(estimated, self.tokens.capacity)
+            self.tokens_used += actual
+
+    def stats(self) -> dict[str, Any]:
+        with self.cond:
+            now = time.monotonic()
+            self.requests.refill(now)
+            self.tokens.refill(now)
+            depth = {name: 0 for name in PRIORITY_NAMES.values()}
+            for priority, _ in self._queue:
+                depth[PRIORITY_NAMES[priority]] += 1
+            stats: dict[str, Any] = {
+                "queue_depth": depth,
+                "max_queue_depth": self.max_queue_depth,
+                "requests_available": int(self.requests.level),
+                "tokens_available": int(self.tokens.level),
+                "tokens_used": self.tokens_used,
+            }
+            for priority, name in PRIORITY_NAMES.items():
+                s = self._stats[priority]
+                stats[name] = {
+                    "admitted": s.admitted,
+                    "waited": s.waited,
+                    "mean_wait_seconds": s.wait_seconds / s.admitted if s.admitted else 0.0,
+                    "max_wait_seconds": s.max_wait_seconds,
+                }
+            return stats
+
+
+_limiters: dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def limiter_for(model: str) -> RateLimiter:
+    """The process-wide limiter for one model, shared by every backend."""
+    with _limiters_lock:
+        if model not in _limiters:
+            if "embedding" in model:
+                _limiters[model] = RateLimiter(EMBEDDING_REQUESTS_PER_MINUTE, EMBEDDING_TOKENS_PER_MINUTE)
+            else:
+                _limiters[model] = RateLimiter(REQUESTS_PER_MINUTE, TOKENS_PER_MINUTE)
+        return _limiters[model]
+
+
+def rate_limiter_stats() -> dict[str, dict[str, Any]]:
+    """Queue depth, waits and remaining capacity per model."""
+    with _limiters_lock:
+        limiters = dict(_limiters)
+    return {model: limiter.stats() for model, limiter in limiters.items()}
+
+
+# -------------------
+# 3. Chat models
+# -------------------
+@dataclass
+class Reservation:
+    limiter: RateLimiter
+    estimate: int
+    priority: int
+    acquired: bool = False
+    # Total tokens of the response, set by the caller once it has one
+    usage: Optional[int] = None
+
+
+_reservation: ContextVar[Optional[Reservation]] = ContextVar("rate_limiter_reservation", default=None)
+
+
+class ReservedRateLimiter(BaseRateLimiter):
+    """
+    A chat model's `rate_limiter` hook. LangChain calls it after a response
+    cache miss, right before the upstream request; it waits for the
+    reservation the caller opened with reserve(). Calls made outside
+    reserve() are not limited here.
+    """
+
+    def acquire(self, *, blocking: bool = True) -> bool:
+        reservation = _reservation.get()
+        if reservation is not None and not reservation.acquired:
+            reservation.limiter.acquire(reservation.estimate, reservation.priority)
+            reservation.acquired = True
+        return True
+
+    async def aacquire(self, *, blocking: bool = True) -> bool:
+        reservation = _reservation.get()
+        if reservation is not None and not reservation.acquired:
+            await reservation.limiter.aacquire(reservation.estimate, reservation.priority)
+            reservation.acquired = True
+        return True
+
+
+reserved_rate_limiter = ReservedRateLimiter()
+
+
+@contextmanager
+def reserve(model: str, estimate: int, priority: int = INTERACTIVE) -> Iterator[Reservation]:
+    """
+    Reserve ~`estimate` tokens for one chat call on a model whose rate_limiter
+    is reserved_rate_limiter. Capacity is only taken if the call goes
+    upstream, so response-cache hits neither wait nor pay. On exit the
+    reservation is settled with `usage`; a call that raised is charged its
+    prompt only.
+    """
+    reservation = Reservation(limiter_for(model), estimate, priority)
+    token = _reservation.set(reservation)
+    try:
+        yield reservation
+    except BaseException:
+        if reservation.usage is None:
+            reservation.usage = max(0, estimate - EXPECTED_COMPLETION_TOKENS)
+        raise
+    finally:
+        _reservation.reset(token)
+        if reservation.acquired:
+            reservation.limiter.record_usage(estimate, reservation.usage)
+
+
+# -------------------
+# 4. Embeddings
+# -------------------
+class RateLimitedEmbeddings(Embeddings):
+    """
+    Embeddings that go through the model's limiter.
+
+    embed_documents() (PDF ingestion) runs in batches at BACKGROUND priority,
+    so a large upload cannot starve the query embeddings of live turns, which
+    run at INTERACTIVE priority. The async methods wait on the event loop
+    and call the wrapped model's async API.
+    """
+
+    def __init__(self, embeddings: Any, *, batch_size: int = EMBEDDING_BATCH) -> None:
+        self.embeddings = embeddings
+        self.model = getattr(embeddings, "model", "embeddings")
+        self.batch_size = batch_size
+
+    def _cost(self, texts: list[str]) -> int:
+        return sum(count_text_tokens(text, self.model) for text in texts)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        limiter = limiter_for(self.model)
+        vectors: list[list[float]] = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start : start + self.batch_size]
+            cost = self._cost(batch)
+            limiter.acquire(cost, BACKGROUND)
+            vectors.extend(self.embeddings.embed_documents(batch))
+            limiter.record_usage(cost, cost)
+        return vectors
+
+    def embed_query(self, text: str) -> list[float]:
+        limiter = limiter_for(self.model)
+        cost = self._cost([text])
+        limiter.acquire(cost, INTERACTIVE)
+        vector = self.embeddings.embed_query(text)
+        limiter.record_usage(cost, cost)
+        return vector
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        limiter = limiter_for(self.model)
+        vectors: list[list[float]] = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start : start + self.batch_size]
+            cost = self._cost(batch)
+            await limiter.aacquire(cost, BACKGROUND)
+            vectors.extend(await self.embeddings.aembed_documents(batch))
+            limiter.record_usage(cost, cost)
+        return vectors
+
+    async def aembed_query(self, text: str) -> list[float]:
+        limiter = limiter_for(self.model)
+        cost = self._cost([text])
+        await limiter.aacquire(cost, INTERACTIVE)
+        vector = await self.embeddings.aembed_query(text)
+        limiter.record_usage(cost, cost)
+        return vector
@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Optional
+
+import faiss
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# -------------------
+# 1. Entries
+# -------------------
+GLOBAL_SCOPE = "global"
+DEFAULT_THRESHOLD = 0.92
+DEFAULT_MAX_ENTRIES = 5000
+
+
+@dataclass
+class CachedAnswer:
+    question: str
+    answer: str
+    scope: str
+    latency: float
+    similarity: float = 1.0
+
+
+# -------------------
+# 2. Cache
+# -------------------
+class SemanticCache:
+    """
+    Answers to earlier questions, looked up by embedding similarity.
+
+    Each scope (GLOBAL_SCOPE, or e.g. one per uploaded document) has its own
+    FAISS inner-product index over normalized embeddings, so scores are cosine
+    similarities; a lookup hits when the nearest earlier question in the same
+    scope scores at least `threshold`. Past `max_entries` the least recently
+    used answers are evicted.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        *,
+        threshold: float = DEFAULT_THRESHOLD,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+    ) -> None:
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.indexes: dict[str, faiss.IndexIDMap2] = {}
+        # entry id -> CachedAnswer, least recently used first
+        self.entries: OrderedDict[int, CachedAnswer] = OrderedDict()
+        self._next_id = 0
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self.embed_seconds = 0.0
+
+    def embed(self, text: str) -> np.ndarray:
+        started = time.perf_counter()
+        vector = np.asarray([self.embeddings.embed_query(text)], dtype="float32")
+        faiss.normalize_L2(vector)
+        with self.lock:
+            self.embed_seconds += time.perf_counter() - started
+        return vector
+
+    def lookup(
+        self, question: str, scope: str = GLOBAL_SCOPE, vector: Optional[np.ndarray] = None
+    ) -> Optional[CachedAnswer]:
+        """Best earlier answer in `scope` at or above the threshold, else None."""
+        if vector is None:
+            vector = self.embed(question)
+        with self.lock:
+            index = self.indexes.get(scope)
+            if index is None or index.ntotal == 0:
+                self.misses += 1
+                return None
+            scores, ids = index.search(vector, 1)
+            similarity, entry_id = float(scores[0][0]), int(ids[0][0])
+            if entry_id < 0 or similarity < self.threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+            entry = self.entries[entry_id]
+            self.entries.move_to_end(entry_id)
+            self.saved_seconds += entry.latency
+        return CachedAnswer(entry.question, entry.answer, scope, entry.latency, similarity)
+
+    def add(
+        self,
+        question: str,
+        answer: str,
+        scope: str = GLOBAL_SCOPE,
+        latency: float = 0.0,
+        vector: Optional[np.ndarray] = None,
+    ) -> None:
+        """Store an answer; `latency` is what a later hit saves (for the metrics)."""
+        if vector is None:
+            vector = self.embed(question)
+        with self.lock:
+            index = self.indexes.get(scope)
+            if index is None:
+                index = self.indexes[scope] = faiss.IndexIDMap2(faiss.IndexFlatIP(vector.shape[1]))
+            entry_id = self._next_id
+            self._next_id += 1
+            index.add_with_ids(vector, np.asarray([entry_id], dtype="int64"))
+            self.entries[entry_id] = CachedAnswer(question, answer, scope, latency)
+            while len(self.entries) > self.max_entries:
+                evicted_id, evicted = self.entries.popitem(last=False)
+                self.indexes[evicted.scope].remove_ids(np.asarray([evicted_id], dtype="int64"))
+
+    def clear(self, scope: Optional[str] = None) -> None:
+        """Drop every answer, or only those of one scope (e.g. a replaced document)."""
+        with self.lock:
+            scopes = [scope] if scope is not None else list(self.indexes)
+            for name in scopes:
+                self.indexes.pop(name, None)
+            for entry_id in [i for i, e in self.entries.items() if e.scope in scopes]:
+                del self.entries[entry_id]
+
+    def stats(self) -> dict[str, Any]:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "scopes": len(self.indexes),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "saved_seconds": self.saved_seconds,
+                "embed_seconds": self.embed_seconds,
+            }
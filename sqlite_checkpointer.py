@@ -0,0 +1,913 @@
+from __future__ import annotations
+
+import asyncio
+import queue
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import closing, contextmanager
+from typing import Any, AsyncIterator, Callable, Iterator, Optional, Sequence
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    SerializerProtocol,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.sqlite import SqliteSaver
+from langgraph.checkpoint.sqlite.utils import search_where
+
+# -------------------
+# 1. Schema
+# -------------------
+CATALOG_SCHEMA = """
+CREATE TABLE IF NOT EXISTS thread_catalog (
+    thread_id TEXT PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    last_activity TEXT NOT NULL,
+    message_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_thread_catalog_last_activity
+    ON thread_catalog (last_activity DESC);
+CREATE TABLE IF NOT EXISTS thread_titles (
+    thread_id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    preview TEXT NOT NULL DEFAULT ''
+);
+-- Messages of each thread's latest state, one row each, for paging without checkpoints
+CREATE TABLE IF NOT EXISTS thread_messages (
+    thread_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    type TEXT NOT NULL,
+    message BLOB,
+    PRIMARY KEY (thread_id, position)
+);
+-- Text of the human/AI messages in thread_messages, full-text indexed by message_search
+CREATE TABLE IF NOT EXISTS message_text (
+    id INTEGER PRIMARY KEY,
+    thread_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    text TEXT NOT NULL,
+    UNIQUE (thread_id, position)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS message_search USING fts5(
+    text, content='message_text', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS message_text_insert AFTER INSERT ON message_text BEGIN
+    INSERT INTO message_search (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS message_text_delete AFTER DELETE ON message_text BEGIN
+    INSERT INTO message_search (message_search, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+"""
+
+TITLE_CHARS = 40
+PREVIEW_CHARS = 80
+DEFAULT_TITLE = "New Chat"
+
+# Delta-encoded checkpoints store this marker in place of the message list
+DELTA_KEY = "__delta__"
+DEFAULT_SNAPSHOT_EVERY = 16
+MESSAGE_CACHE_THREADS = 256
+
+SEARCH_ROLES = ("human", "ai")
+SNIPPET_TOKENS = 12
+# bm25 is computed for every match; above this, order by recency instead
+RANKED_MATCHES = 5000
+
+
+def search_query(text: str) -> Optional[str]:
+    """
+    FTS5 query for free text typed by a user: every word must match, the
+    last one as a prefix (search-as-you-type). Operators and quotes are not
+    interpreted, so any input is a valid query. None if there are no words.
+    """
+    words = re.findall(r"\w+", text)
+    if not words:
+        return None
+    return " ".join(f'"{word}"' for word in words) + "*"
+
+
+def is_delta(value: Any) -> bool:
+    return isinstance(value, dict) and DELTA_KEY in value
+
+
+def message_text(message) -> str:
+    """Plain text of a message, flattening multimodal content blocks."""
+    content = message.content
+    if isinstance(content, str):
+        return content
+    return " ".join(
+        block.get("text", "") if isinstance(block, dict) else str(block)
+        for block in content
+    )
+
+
+def thread_title(messages) -> tuple[str, str]:
+    """Sidebar title (last user question) and preview (last message) for a thread."""
+    title = DEFAULT_TITLE
+    for message in reversed(messages):
+        if message.type == "human":
+            title = message_text(message)[:TITLE_CHARS]
+            break
+    preview = message_text(messages[-1])[:PREVIEW_CHARS] if messages else ""
+    return title, preview
+
+
+# -------------------
+# 2. Saver
+# -------------------
+class IndexedSqliteSaver(SqliteSaver):
+    """
+    SqliteSaver that keeps small side tables up to date on every checkpoint write,
+    so the UI can list threads without deserializing checkpoints.
+
+    With delta_messages=True, root-graph checkpoints store only the messages
+    appended since their parent checkpoint. Reads rebuild the list by walking
+    parent ids; a full snapshot is written every `snapshot_every` checkpoints
+    (or whenever history was rewritten) to bound that walk.
+    """
+
+    delta_channel = "messages"
+
+    def __init__(
+        self,
+        conn: sqlite3.Connection,
+        *,
+        serde: Optional[SerializerProtocol] = None,
+        delta_messages: bool = False,
+        snapshot_every: int = DEFAULT_SNAPSHOT_EVERY,
+    ) -> None:
+        super().__init__(conn, serde=serde)
+        self.delta_messages = delta_messages
+        self.snapshot_every = snapshot_every
+        # thread_id -> (checkpoint_id, messages, delta depth) of the last checkpoint seen
+        self._message_cache: OrderedDict[str, tuple[str, list, int]] = OrderedDict()
+
+    def setup(self) -> None:
+        if self.is_setup:
+            return
+        super().setup()
+        self.conn.executescript(CATALOG_SCHEMA)
+        self._backfill_catalog()
+        self._backfill_search()
+        self.conn.commit()
+
+    def _backfill_catalog(self) -> None:
+        """One-time import of threads written before the index tables existed."""
+        if self.conn.execute(
+            "SELECT 1 FROM thread_catalog WHERE EXISTS (SELECT 1 FROM thread_titles)"
+        ).fetchone():
+            return
+
+        bounds = self.conn.execute(
+            "SELECT thread_id, MIN(checkpoint_id), MAX(checkpoint_id) FROM checkpoints "
+            "WHERE checkpoint_ns = '' GROUP BY thread_id"
+        ).fetchall()
+        for thread_id, first_id, last_id in bounds:
+            first = self._load_checkpoint_row(thread_id, first_id)
+            last = self._load_checkpoint_row(thread_id, last_id)
+            messages = last["channel_values"].get("messages", [])
+            self.conn.execute(
+                "INSERT OR IGNORE INTO thread_catalog "
+                "(thread_id, created_at, last_activity, message_count) VALUES (?, ?, ?, ?)",
+                (thread_id, first["ts"], last["ts"], len(messages)),
+            )
+            self.conn.execute(
+                "INSERT OR IGNORE INTO thread_titles (thread_id, title, preview) VALUES (?, ?, ?)",
+                (thread_id, *thread_title(messages)),
+            )
+
+    def _backfill_search(self) -> None:
+        """Index the messages of threads written before the search tables existed."""
+        thread_ids = self.conn.execute(
+            "SELECT thread_id, (SELECT MAX(checkpoint_id) FROM checkpoints k "
+            "WHERE k.thread_id = c.thread_id AND k.checkpoint_ns = '') "
+            "FROM thread_catalog c WHERE message_count > 0 "
+            "AND NOT EXISTS (SELECT 1 FROM message_text t WHERE t.thread_id = c.thread_id)"
+        ).fetchall()
+        with closing(self.conn.cursor()) as cur:
+            for thread_id, last_id in thread_ids:
+                if last_id is None:
+                    continue
+                messages = self._load_checkpoint_row(thread_id, last_id)["channel_values"].get(
+                    self.delta_channel, []
+                )
+                self._write_message_log(cur, thread_id, 0, self._message_log_rows(messages))
+
+    def _load_checkpoint_row(self, thread_id: str, checkpoint_id: str) -> Checkpoint:
+        with closing(self.conn.cursor()) as cur:
+            checkpoint = self._fetch_checkpoint(cur, thread_id, "", checkpoint_id)
+            self._resolve_messages(cur, thread_id, "", checkpoint)
+        return checkpoint
+
+    def _fetch_checkpoint(
+        self, cur, thread_id: str, checkpoint_ns: str, checkpoint_id: str
+    ) -> Checkpoint:
+        cur.execute(
+            "SELECT type, checkpoint FROM checkpoints "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        )
+        row = cur.fetchone()
+        if row is None:
+            raise ValueError(
+                f"Checkpoint {checkpoint_id} of thread {thread_id} is missing; "
+                "a delta-encoded checkpoint cannot be rebuilt without it."
+            )
+        return self.serde.loads_typed(row)
+
+    # -------------------
+    # 3. Message deltas
+    # -------------------
+    def _remember(self, thread_id: str, checkpoint_id: str, messages: list, depth: int) -> None:
+        self._message_cache[thread_id] = (checkpoint_id, list(messages), depth)
+        self._message_cache.move_to_end(thread_id)
+        while len(self._message_cache) > MESSAGE_CACHE_THREADS:
+            self._message_cache.popitem(last=False)
+
+    def _prepare_messages(
+        self, thread_id: str, parent_id: Optional[str], checkpoint: Checkpoint
+    ) -> tuple[Checkpoint, Optional[tuple[int, list]]]:
+        """
+        Compare the checkpoint's messages with its parent's (when cached).
+
+        Returns the checkpoint to store, a delta against the parent when possible,
+        and the message-log update: the first changed position and the serialized
+        messages from there on.
+        """
+        messages = checkpoint["channel_values"].get(self.delta_channel)
+        if messages is None:
+            return checkpoint, None
+
+        stored, depth, unchanged = checkpoint, 0, 0
+        cached = self._message_cache.get(thread_id)
+        if cached and cached[0] == parent_id:
+            _, parent_messages, parent_depth = cached
+            for old, new in zip(parent_messages, messages):
+                if old is not new and old != new:
+                    break
+                unchanged += 1
+            # add_messages can replace or remove earlier messages; only pure appends are deltas
+            if (
+                self.delta_messages
+                and unchanged == len(parent_messages)
+                and parent_depth + 1 < self.snapshot_every
+            ):
+                depth = parent_depth + 1
+                marker = {
+                    DELTA_KEY: {
+                        "parent": parent_id,
+                        "start": unchanged,
+                        "depth": depth,
+                        "messages": messages[unchanged:],
+                    }
+                }
+                stored = {
+                    **checkpoint,
+                    "channel_values": {**checkpoint["channel_values"], self.delta_channel: marker},
+                }
+
+        self._remember(thread_id, checkpoint["id"], messages, depth)
+        return stored, (unchanged, self._message_log_rows(messages, unchanged))
+
+    def _message_log_rows(self, messages: list, start: int = 0) -> list:
+        """(position, type, serialized message, role, text) for messages[start:]."""
+        return [
+            (position, *self.serde.dumps_typed(message), message.type, message_text(message))
+            for position, message in enumerate(messages[start:], start=start)
+        ]
+
+    def _resolve_messages(
+        self,
+        cur,
+        thread_id: str,
+        checkpoint_ns: str,
+        checkpoint: Checkpoint,
+        memo: Optional[dict] = None,
+    ) -> None:
+        """
+        Replace a delta marker in a loaded checkpoint with the full message list.
+
+        `memo` maps checkpoint ids to rebuilt lists so that listing a history
+        reuses the parents it has already rebuilt.
+        """
+        value = checkpoint["channel_values"].get(self.delta_channel)
+        if not is_delta(value):
+            return
+
+        chain = []
+        current_id = checkpoint["id"]
+        while is_delta(value):
+            delta = value[DELTA_KEY]
+            chain.append((current_id, delta))
+            current_id = delta["parent"]
+            if memo is not None and current_id in memo:
+                value = memo[current_id]
+                break
+            parent = self._fetch_checkpoint(cur, thread_id, checkpoint_ns, current_id)
+            value = parent["channel_values"].get(self.delta_channel, [])
+
+        messages = value
+        for checkpoint_id, delta in reversed(chain):
+            messages = messages[: delta["start"]] + delta["messages"]
+            if memo is not None:
+                memo[checkpoint_id] = messages
+        checkpoint["channel_values"][self.delta_channel] = messages
+
+    def materialize_checkpoint(
+        self, cur, thread_id: str, checkpoint_ns: str, checkpoint_id: str
+    ) -> bool:
+        """
+        Rewrite a delta-encoded checkpoint as a full snapshot, in place.
+
+        Needed before deleting its ancestors; returns False if it was already full.
+        """
+        checkpoint = self._fetch_checkpoint(cur, thread_id, checkpoint_ns, checkpoint_id)
+        if not is_delta(checkpoint["channel_values"].get(self.delta_channel)):
+            return False
+        self._resolve_messages(cur, thread_id, checkpoint_ns, checkpoint)
+        cur.execute(
+            "UPDATE checkpoints SET type = ?, checkpoint = ? "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+            (*self.serde.dumps_typed(checkpoint), thread_id, checkpoint_ns, checkpoint_id),
+        )
+        return True
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        checkpoint_tuple = super().get_tuple(config)
+        if checkpoint_tuple is None:
+            return None
+
+        checkpoint = checkpoint_tuple.checkpoint
+        value = checkpoint["channel_values"].get(self.delta_channel)
+        if value is None:
+            return checkpoint_tuple
+
+        configurable = checkpoint_tuple.config["configurable"]
+        thread_id = str(configurable["thread_id"])
+        depth = value[DELTA_KEY]["depth"] if is_delta(value) else 0
+        with self.cursor(transaction=False) as cur:
+            self._resolve_messages(cur, thread_id, configurable["checkpoint_ns"], checkpoint)
+        if configurable["checkpoint_ns"] == "" and not get_checkpoint_id(config):
+            # The next put on this thread usually has its latest checkpoint as parent
+            self._remember(
+                thread_id, checkpoint["id"], checkpoint["channel_values"][self.delta_channel], depth
+            )
+        return checkpoint_tuple
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        """Same as SqliteSaver.list, rebuilding delta-encoded message lists as it goes."""
+        where, param_values = search_where(config, filter, before)
+        query = f"""SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata
+        FROM checkpoints
+        {where}
+        ORDER BY checkpoint_id DESC"""
+        if limit:
+            query += f" LIMIT {int(limit)}"
+        # Fetch everything before each yield: a caller may stop iterating at any
+        # point, and must not keep a (pooled) connection while it holds the generator
+        with self.cursor(transaction=False) as cur:
+            rows = cur.execute(query, param_values).fetchall()
+        memo: dict = {}
+        for (
+            thread_id,
+            checkpoint_ns,
+            checkpoint_id,
+            parent_checkpoint_id,
+            type_,
+            checkpoint,
+            metadata,
+        ) in rows:
+            loaded = self.serde.loads_typed((type_, checkpoint))
+            with self.cursor(transaction=False) as cur:
+                self._resolve_messages(cur, thread_id, checkpoint_ns, loaded, memo)
+                writes = cur.execute(
+                    "SELECT task_id, channel, type, value FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                ).fetchall()
+            yield CheckpointTuple(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": checkpoint_id,
+                    }
+                },
+                loaded,
+                self.jsonplus_serde.loads(metadata) if metadata is not None else {},
+                (
+                    {
+                        "configurable": {
+                            "thread_id": thread_id,
+                            "checkpoint_ns": checkpoint_ns,
+                            "checkpoint_id": parent_checkpoint_id,
+                        }
+                    }
+                    if parent_checkpoint_id
+                    else None
+                ),
+                [
+                    (task_id, channel, self.serde.loads_typed((type_, value)))
+                    for task_id, channel, type_, value in writes
+                ],
+            )
+
+    # -------------------
+    # 4. Writes
+    # -------------------
+    def _write(self, fn: Callable[[sqlite3.Cursor], Any]) -> Any:
+        """Run fn(cursor) in a write transaction; subclasses may route this elsewhere."""
+        with self.cursor() as cur:
+            return fn(cur)
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """Save a checkpoint and update the thread indexes in the same transaction."""
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        parent_id = config["configurable"].get("checkpoint_id")
+        stored, message_log = checkpoint, None
+        if checkpoint_ns == "":
+            stored, message_log = self._prepare_messages(thread_id, parent_id, checkpoint)
+        type_, serialized_checkpoint = self.serde.dumps_typed(stored)
+        serialized_metadata = self.jsonplus_serde.dumps(
+            get_checkpoint_metadata(config, metadata)
+        )
+
+        def write(cur: sqlite3.Cursor) -> None:
+            cur.execute(
+                "INSERT OR REPLACE INTO checkpoints (thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    thread_id,
+                    checkpoint_ns,
+                    checkpoint["id"],
+                    parent_id,
+                    type_,
+                    serialized_checkpoint,
+                    serialized_metadata,
+                ),
+            )
+            # Subgraph checkpoints share the thread id; only the root graph is indexed.
+            if checkpoint_ns == "":
+                self._index_checkpoint(cur, thread_id, checkpoint, message_log)
+
+        self._write(write)
+        return {
+            "configurable": {
+                "thread_id": config["configurable"]["thread_id"],
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def _index_checkpoint(
+        self,
+        cur,
+        thread_id: str,
+        checkpoint: Checkpoint,
+        message_log: Optional[tuple[int, list]] = None,
+    ) -> None:
+        messages = checkpoint["channel_values"].get(self.delta_channel, [])
+        cur.execute(
+            """
+            INSERT INTO thread_catalog (thread_id, created_at, last_activity, message_count)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (thread_id) DO UPDATE SET
+                last_activity = excluded.last_activity,
+                message_count = excluded.message_count
+            """,
+            (thread_id, checkpoint["ts"], checkpoint["ts"], len(messages)),
+        )
+        cur.execute(
+            "INSERT OR REPLACE INTO thread_titles (thread_id, title, preview) VALUES (?, ?, ?)",
+            (thread_id, *thread_title(messages)),
+        )
+        if message_log is not None:
+            self._write_message_log(cur, thread_id, *message_log)
+
+    def _write_message_log(self, cur, thread_id: str, start: int, rows: list) -> None:
+        for table in ("thread_messages", "message_text"):
+            cur.execute(
+                f"DELETE FROM {table} WHERE thread_id = ? AND position >= ?",
+                (thread_id, start),
+            )
+        cur.executemany(
+            "INSERT INTO thread_messages (thread_id, position, type, message) VALUES (?, ?, ?, ?)",
+            [(thread_id, position, type_, blob) for position, type_, blob, _, _ in rows],
+        )
+        # Triggers keep the FTS index in step with message_text
+        cur.executemany(
+            "INSERT INTO message_text (thread_id, position, role, text) VALUES (?, ?, ?, ?)",
+            [
+                (thread_id, position, role, text)
+                for position, _, _, role, text in rows
+                if role in SEARCH_ROLES and text.strip()
+            ],
+        )
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        query = (
+            "INSERT OR REPLACE INTO writes (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, type, value) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+            if all(w[0] in WRITES_IDX_MAP for w in writes)
+            else "INSERT OR IGNORE INTO writes (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, type, value) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+        )
+        rows = [
+            (
+                str(config["configurable"]["thread_id"]),
+                str(config["configurable"]["checkpoint_ns"]),
+                str(config["configurable"]["checkpoint_id"]),
+                task_id,
+                WRITES_IDX_MAP.get(channel, idx),
+                channel,
+                *self.serde.dumps_typed(value),
+            )
+            for idx, (channel, value) in enumerate(writes)
+        ]
+        self._write(lambda cur: cur.executemany(query, rows))
+
+    def delete_thread(self, thread_id: str) -> None:
+        self._message_cache.pop(str(thread_id), None)
+
+        def delete(cur: sqlite3.Cursor) -> None:
+            for table in (
+                "checkpoints",
+                "writes",
+                "thread_catalog",
+                "thread_titles",
+                "thread_messages",
+                "message_text",
+            ):
+                cur.execute(f"DELETE FROM {table} WHERE thread_id = ?", (str(thread_id),))
+
+        self._write(delete)
+
+    # -------------------
+    # 5. Thread listing
+    # -------------------
+    def list_threads(self, limit: Optional[int] = None, offset: int = 0) -> list[dict]:
+        """
+        Return catalogued threads, most recently active first.
+
+        Each entry has thread_id, created_at, last_activity and message_count.
+        """
+        query = (
+            "SELECT thread_id, created_at, last_activity, message_count FROM thread_catalog "
+            "ORDER BY last_activity DESC LIMIT ? OFFSET ?"
+        )
+        with self.cursor(transaction=False) as cur:
+            cur.execute(query, (-1 if limit is None else limit, offset))
+            return [
+                {
+                    "thread_id": thread_id,
+                    "created_at": created_at,
+                    "last_activity": last_activity,
+                    "message_count": message_count,
+                }
+                for thread_id, created_at, last_activity, message_count in cur
+            ]
+
+    def get_thread_titles(self, thread_ids) -> dict[str, dict]:
+        """
+        Batch lookup of stored titles and previews.
+
+        Returns {thread_id: {"title": ..., "preview": ...}} for the ids that have been
+        checkpointed; unknown ids are omitted.
+        """
+        ids = [str(tid) for tid in thread_ids]
+        titles = {}
+        with self.cursor(transaction=False) as cur:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(ids), 500):
+                chunk = ids[start : start + 500]
+                cur.execute(
+                    "SELECT thread_id, title, preview FROM thread_titles "
+                    f"WHERE thread_id IN ({', '.join('?' * len(chunk))})",
+                    chunk,
+                )
+                for thread_id, title, preview in cur:
+                    titles[thread_id] = {"title": title, "preview": preview}
+        return titles
+
+    def get_messages(
+        self, thread_id: str, limit: int = 30, before: Optional[int] = None
+    ) -> tuple[list, Optional[int]]:
+        """
+        Page through a thread's latest messages, newest page first.
+
+        Returns up to `limit` messages (oldest first) that come before position
+        `before` (default: the end), and the cursor to pass as `before` for the
+        previous page, or None when the start of the thread has been reached.
+        """
+        thread_id = str(thread_id)
+        if not self._message_log_complete(thread_id):
+            self._rebuild_message_log(thread_id)
+
+        where, params = "thread_id = ?", [thread_id]
+        if before is not None:
+            where, params = where + " AND position < ?", params + [before]
+        with self.cursor(transaction=False) as cur:
+            cur.execute(
+                f"SELECT position, type, message FROM thread_messages WHERE {where} "
+                "ORDER BY position DESC LIMIT ?",
+                (*params, limit),
+            )
+            rows = cur.fetchall()
+
+        rows.reverse()
+        messages = [self.serde.loads_typed((type_, blob)) for _, type_, blob in rows]
+        cursor = rows[0][0] if rows and rows[0][0] > 0 else None
+        return messages, cursor
+
+    def _message_log_complete(self, thread_id: str) -> bool:
+        with self.cursor(transaction=False) as cur:
+            cur.execute(
+                "SELECT c.message_count, "
+                "(SELECT MIN(position) FROM thread_messages WHERE thread_id = c.thread_id), "
+                "(SELECT MAX(position) FROM thread_messages WHERE thread_id = c.thread_id) "
+                "FROM thread_catalog c WHERE c.thread_id = ?",
+                (thread_id,),
+            )
+            row = cur.fetchone()
+        if row is None or row[0] == 0:
+            return True
+        message_count, first, last = row
+        return first == 0 and last == message_count - 1
+
+    def _rebuild_message_log(self, thread_id: str) -> None:
+        """One-time load of a thread checkpointed before the message log existed."""
+        checkpoint_tuple = self.get_tuple({"configurable": {"thread_id": thread_id}})
+        if checkpoint_tuple is None:
+            return
+        messages = checkpoint_tuple.checkpoint["channel_values"].get(self.delta_channel, [])
+        rows = self._message_log_rows(messages)
+        self._write(lambda cur: self._write_message_log(cur, thread_id, 0, rows))
+
+    def search_threads(self, query: str, limit: int = 20) -> list[dict]:
+        """
+        Full-text search over human and AI messages, best match per thread.
+
+        Returns dicts with thread_id, title, position (of the best matching
+        message), role and a snippet with the matches wrapped in **, most
+        relevant thread first. Queries matching more than RANKED_MATCHES
+        messages (very common words) return the most recent matches instead,
+        which FTS5 can produce without scoring every match.
+        """
+        match = search_query(query)
+        if match is None:
+            return []
+        with self.cursor(transaction=False) as cur:
+            cur.execute("SELECT COUNT(*) FROM message_search WHERE message_search MATCH ?", (match,))
+            (matches,) = cur.fetchone()
+            if matches == 0:
+                return []
+            if matches <= RANKED_MATCHES:
+                cur.execute(
+                    "SELECT t.thread_id, t.position, t.role, m.rowid, MIN(m.rank) AS score "
+                    "FROM message_search m JOIN message_text t ON t.id = m.rowid "
+                    "WHERE message_search MATCH ? GROUP BY t.thread_id ORDER BY score LIMIT ?",
+                    (match, limit),
+                )
+                hits = cur.fetchall()
+                # snippet() is not allowed in an aggregate; fetch it for the winners only
+                row_ids = [hit[3] for hit in hits]
+                cur.execute(
+                    "SELECT rowid, snippet(message_search, 0, '**', '**', '…', ?) "
+                    "FROM message_search WHERE message_search MATCH ? "
+                    f"AND rowid IN ({', '.join('?' * len(row_ids))})",
+                    (SNIPPET_TOKENS, match, *row_ids),
+                )
+                snippets = dict(cur.fetchall())
+                hits = [(*hit[:4], snippets.get(hit[3], "")) for hit in hits]
+            else:
+                # Rows are produced lazily, so only the rows read get a snippet
+                cur.execute(
+                    "SELECT t.thread_id, t.position, t.role, m.rowid, "
+                    "snippet(message_search, 0, '**', '**', '…', ?) "
+                    "FROM message_search m JOIN message_text t ON t.id = m.rowid "
+                    "WHERE message_search MATCH ? ORDER BY m.rowid DESC",
+                    (SNIPPET_TOKENS, match),
+                )
+                hits, seen = [], set()
+                for hit in cur:
+                    if hit[0] not in seen:
+                        seen.add(hit[0])
+                        hits.append(hit)
+                        if len(hits) == limit:
+                            break
+
+        titles = self.get_thread_titles(hit[0] for hit in hits)
+        return [
+            {
+                "thread_id": thread_id,
+                "title": titles.get(thread_id, {}).get("title", DEFAULT_TITLE),
+                "position": position,
+                "role": role,
+                "snippet": snippet,
+            }
+            for thread_id, position, role, _, snippet in hits
+        ]
+
+    # -------------------
+    # 6. Async API
+    # -------------------
+    # The sync methods run in worker threads, so async graphs share the same schema,
+    # indexes and encodings without blocking the event loop.
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        checkpoint_tuples = await asyncio.to_thread(
+            lambda: [*self.list(config, filter=filter, before=before, limit=limit)]
+        )
+        for checkpoint_tuple in checkpoint_tuples:
+            yield checkpoint_tuple
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+# -------------------
+# 7. Pooled saver
+# -------------------
+class PooledSqliteSaver(IndexedSqliteSaver):
+    """
+    IndexedSqliteSaver for many concurrent sessions on one database file.
+
+    The database runs in WAL mode so readers never wait for writers. Reads
+    borrow a connection from a small pool; all writes go through one writer
+    thread that commits whatever has queued up as a single transaction.
+    Callers still block until their write is committed.
+    """
+
+    def __init__(
+        self,
+        database: str,
+        *,
+        serde: Optional[SerializerProtocol] = None,
+        delta_messages: bool = False,
+        snapshot_every: int = DEFAULT_SNAPSHOT_EVERY,
+        readers: int = 4,
+        max_batch: int = 64,
+        busy_timeout_ms: int = 5000,
+    ) -> None:
+        self.database = database
+        self.busy_timeout_ms = busy_timeout_ms
+        super().__init__(
+            self._connect(),
+            serde=serde,
+            delta_messages=delta_messages,
+            snapshot_every=snapshot_every,
+        )
+        with self.lock:
+            self.setup()
+
+        self.max_batch = max_batch
+        self._readers: queue.Queue[sqlite3.Connection] = queue.Queue()
+        for _ in range(readers):
+            self._readers.put(self._connect())
+
+        self._jobs: queue.Queue = queue.Queue()
+        self._writer = threading.Thread(
+            target=self._write_loop, name="sqlite-checkpoint-writer", daemon=True
+        )
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            database=self.database,
+            check_same_thread=False,
+            timeout=self.busy_timeout_ms / 1000,
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        # Safe with WAL: a power loss can only drop the last commits, never corrupt
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def cursor(self, transaction: bool = True) -> Iterator[sqlite3.Cursor]:
+        if transaction:
+            # Direct writers (e.g. compaction) share the write connection with the writer thread
+            with super().cursor(transaction) as cur:
+                yield cur
+            return
+
+        conn = self._readers.get()
+        cur = conn.cursor()
+        try:
+            yield cur
+        finally:
+            cur.close()
+            self._readers.put(conn)
+
+    def _write(self, fn: Callable[[sqlite3.Cursor], Any]) -> Any:
+        done: Future = Future()
+        self._jobs.put((fn, done))
+        return done.result()
+
+    def _write_loop(self) -> None:
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            batch = [job]
+            while len(batch) < self.max_batch:
+                try:
+                    job = self._jobs.get_nowait()
+                except queue.Empty:
+                    break
+                if job is None:
+                    # Finish this batch, then stop
+                    self._jobs.put(None)
+                    break
+                batch.append(job)
+            self._commit_batch(batch)
+
+    def _commit_batch(self, batch: list) -> None:
+        outcomes = []
+        with self.lock:
+            cur = self.conn.cursor()
+            try:
+                # Open the transaction explicitly, or releasing the first savepoint would commit
+                if not self.conn.in_transaction:
+                    cur.execute("BEGIN IMMEDIATE")
+                for fn, done in batch:
+                    # A savepoint per job keeps one failing write from undoing the others
+                    cur.execute("SAVEPOINT job")
+                    try:
+                        outcomes.append((done, fn(cur), None))
+                        cur.execute("RELEASE job")
+                    except Exception as e:
+                        cur.execute("ROLLBACK TO job")
+                        cur.execute("RELEASE job")
+                        outcomes.append((done, None, e))
+                self.conn.commit()
+            except Exception as e:
+                self.conn.rollback()
+                outcomes = [(done, None, e) for _, done in batch]
+            finally:
+                cur.close()
+
+        for done, result, error in outcomes:
+            if error is None:
+                done.set_result(result)
+            else:
+                done.set_exception(error)
+
+    def close(self) -> None:
+        """Flush queued writes and close every connection."""
+        self._jobs.put(None)
+        self._writer.join()
+        while not self._readers.empty():
+            self._readers.get_nowait().close()
+        self.conn.close()
@@ -0,0 +1,283 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from langchain_core.tools import StructuredTool
+
+from http_clients import TOOL_TIMEOUT, async_http_client, http_client
+
+# -------------------
+# 1. Settings
+# -------------------
+# Point at a stand-in (e.g. fake_openai_server.py's /query) for offline runs
+ALPHA_VANTAGE_URL = os.getenv("ALPHA_VANTAGE_URL", "https://www.alphavantage.co/query")
+ALPHA_VANTAGE_API_KEY = os.getenv("ALPHA_VANTAGE_API_KEY", "C9PE94QUEW9VWGFM")
+# Quotes younger than this are served from memory
+QUOTE_TTL_SECONDS = float(os.getenv("QUOTE_TTL_SECONDS", "60"))
+# When Alpha Vantage fails, quotes up to this old are served, marked stale
+QUOTE_MAX_STALE_SECONDS = float(os.getenv("QUOTE_MAX_STALE_SECONDS", "86400"))
+QUOTE_CACHE_SIZE = 10_000
+# Parallel fetches for one get_stock_prices call; the free tier is rate-limited
+QUOTE_FETCH_CONCURRENCY = 4
+MAX_SYMBOLS_PER_CALL = 20
+
+# Alpha Vantage reports rate limits and bad requests in a 200 response
+ERROR_KEYS = ("Note", "Information", "Error Message")
+
+
+class QuoteError(Exception):
+    pass
+
+
+@dataclass
+class CachedQuote:
+    payload: dict
+    fetched_at: float
+
+
+@dataclass
+class _Flight:
+    done: threading.Event = field(default_factory=threading.Event)
+    result: Optional[dict] = None
+    # (loop, future) of coroutines waiting on this fetch
+    waiters: list = field(default_factory=list)
+
+    def finish(self, result: dict) -> None:
+        self.result = result
+        self.done.set()
+        for loop, future in self.waiters:
+            loop.call_soon_threadsafe(_resolve, future, result)
+
+
+def _resolve(future: asyncio.Future, result: dict) -> None:
+    if not future.done():
+        future.set_result(result)
+
+
+def normalize_symbol(symbol: str) -> str:
+    return symbol.strip().upper()
+
+
+def _quote_params(symbol: str) -> dict:
+    return {"function": "GLOBAL_QUOTE", "symbol": symbol, "apikey": ALPHA_VANTAGE_API_KEY}
+
+
+def _quote_payload(response) -> dict:
+    response.raise_for_status()
+    payload = response.json()
+    for key in ERROR_KEYS:
+        if key in payload:
+            raise QuoteError(payload[key])
+    return payload
+
+
+def fetch_quote(symbol: str) -> dict:
+    """One GLOBAL_QUOTE request; raises QuoteError for rate limits and API errors."""
+    return _quote_payload(http_client().get(ALPHA_VANTAGE_URL, params=_quote_params(symbol), timeout=TOOL_TIMEOUT))
+
+
+async def afetch_quote(symbol: str) -> dict:
+    """fetch_quote() on the shared async pool."""
+    response = await async_http_client().get(ALPHA_VANTAGE_URL, params=_quote_params(symbol), timeout=TOOL_TIMEOUT)
+    return _quote_payload(response)
+
+
+# -------------------
+# 2. Cache
+# -------------------
+class QuoteCache:
+    """
+    Process-wide quote cache shared by every backend and session.
+
+    Fresh quotes (younger than `ttl`) are served from memory. Concurrent
+    misses for one symbol share a single upstream request, whether they come
+    from threads (get) or coroutines (aget). If a fetch fails,
+    the last good quote is served with "stale": True as long as it is younger
+    than `max_stale`; otherwise the error is returned to the model.
+    """
+
+    def __init__(
+        self,
+        *,
+        ttl: float = QUOTE_TTL_SECONDS,
+        max_stale: float = QUOTE_MAX_STALE_SECONDS,
+        max_entries: int = QUOTE_CACHE_SIZE,
+        fetch=fetch_quote,
+        afetch=afetch_quote,
+    ) -> None:
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.max_entries = max_entries
+        self.fetch = fetch
+        self.afetch = afetch
+        self.lock = threading.Lock()
+        self.entries: OrderedDict[str, CachedQuote] = OrderedDict()
+        self._flights: dict[str, _Flight] = {}
+        self.counts = {"hits": 0, "misses": 0, "coalesced": 0, "stale_served": 0, "errors": 0}
+
+    def _lookup(self, symbol: str) -> tuple[Optional[dict], Optional[CachedQuote], _Flight, bool]:
+        """(fresh payload, entry, flight, leader); the caller fetches if it leads."""
+        with self.lock:
+            entry = self.entries.get(symbol)
+            if entry is not None and time.time() - entry.fetched_at < self.ttl:
+                self.counts["hits"] += 1
+                self.entries.move_to_end(symbol)
+                return entry.payload, entry, None, False
+            flight = self._flights.get(symbol)
+            leader = flight is None
+            if leader:
+                flight = self._flights[symbol] = _Flight()
+                self.counts["misses"] += 1
+            else:
+                self.counts["coalesced"] += 1
+            return None, entry, flight, leader
+
+    def _land(self, symbol: str, flight: _Flight, result: dict) -> None:
+        with self.lock:
+            del self._flights[symbol]
+            flight.finish(result)
+
+    def get(self, symbol: str) -> dict:
+        symbol = normalize_symbol(symbol)
+        payload, entry, flight, leader = self._lookup(symbol)
+        if payload is not None:
+            return payload
+        if not leader:
+            flight.done.wait()
+            return flight.result
+
+        result = {"symbol": symbol, "error": "Quote fetch failed"}
+        try:
+            try:
+                payload = self.fetch(symbol)
+            except Exception as e:
+                result = self._fallback(symbol, entry, e)
+            else:
+                result = self._store(symbol, payload)
+        finally:
+            self._land(symbol, flight, result)
+        return result
+
+    async def aget(self, symbol: str) -> dict:
+        """get() for coroutines: waits on the event loop, fetches on the async pool."""
+        symbol = normalize_symbol(symbol)
+        payload, entry, flight, leader = self._lookup(symbol)
+        if payload is not None:
+            return payload
+        if not leader:
+            future = asyncio.get_running_loop().create_future()
+            with self.lock:
+                if flight.done.is_set():
+                    return flight.result
+                flight.waiters.append((asyncio.get_running_loop(), future))
+            return await future
+
+        result = {"symbol": symbol, "error": "Quote fetch failed"}
+        try:
+            try:
+                payload = await self.afetch(symbol)
+            except Exception as e:
+                result = self._fallback(symbol, entry, e)
+            else:
+                result = self._store(symbol, payload)
+        finally:
+            self._land(symbol, flight, result)
+        return result
+
+    def _fallback(self, symbol: str, entry: Optional[CachedQuote], error: Exception) -> dict:
+        with self.lock:
+            self.counts["errors"] += 1
+            if entry is not None and time.time() - entry.fetched_at < self.max_stale:
+                self.counts["stale_served"] += 1
+                as_of = datetime.fromtimestamp(entry.fetched_at, timezone.utc).isoformat(timespec="seconds")
+                return {**entry.payload, "stale": True, "fetched_at": as_of, "error": str(error)}
+        return {"symbol": symbol, "error": str(error)}
+
+    def _store(self, symbol: str, payload: dict) -> dict:
+        with self.lock:
+            self.entries[symbol] = CachedQuote(payload, time.time())
+            self.entries.move_to_end(symbol)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return payload
+
+    def get_many(self, symbols: list[str]) -> dict[str, dict]:
+        """Quotes for several symbols; misses are fetched in parallel."""
+        unique = list(dict.fromkeys(normalize_symbol(s) for s in symbols if s.strip()))
+        if len(unique) <= 1:
+            return {s: self.get(s) for s in unique}
+        with ThreadPoolExecutor(max_workers=min(QUOTE_FETCH_CONCURRENCY, len(unique))) as pool:
+            return dict(zip(unique, pool.map(self.get, unique)))
+
+    async def aget_many(self, symbols: list[str]) -> dict[str, dict]:
+        """get_many() for coroutines: misses are fetched concurrently on the event loop."""
+        unique = list(dict.fromkeys(normalize_symbol(s) for s in symbols if s.strip()))
+        limit = asyncio.Semaphore(QUOTE_FETCH_CONCURRENCY)
+
+        async def one(symbol: str) -> dict:
+            async with limit:
+                return await self.aget(symbol)
+
+        return dict(zip(unique, await asyncio.gather(*(one(s) for s in unique))))
+
+    def stats(self) -> dict[str, Any]:
+        with self.lock:
+            lookups = self.counts["hits"] + self.counts["misses"] + self.counts["coalesced"]
+            return {
+                "entries": len(self.entries),
+                **self.counts,
+                "hit_rate": (self.counts["hits"] + self.counts["coalesced"]) / lookups if lookups else 0.0,
+            }
+
+
+quote_cache = QuoteCache()
+
+
+# -------------------
+# 3. Tools
+# -------------------
+# Each tool has a sync and an async implementation: graphs run with
+# invoke/stream use the first, ainvoke/astream the second, so parallel
+# tool calls in one message overlap on the event loop
+def _get_stock_price(symbol: str) -> dict:
+    """
+    Fetch latest stock price for a given symbol (e.g. 'AAPL', 'TSLA')
+    using Alpha Vantage with API key in the URL.
+    """
+    return quote_cache.get(symbol)
+
+
+async def _aget_stock_price(symbol: str) -> dict:
+    return await quote_cache.aget(symbol)
+
+
+def _get_stock_prices(symbols: list[str]) -> dict:
+    """
+    Fetch latest stock prices for several symbols at once (e.g. ['AAPL', 'MSFT', 'TSLA']).
+    Prefer this over repeated get_stock_price calls when comparing stocks.
+    """
+    if len(symbols) > MAX_SYMBOLS_PER_CALL:
+        return {"error": f"At most {MAX_SYMBOLS_PER_CALL} symbols per call"}
+    return quote_cache.get_many(symbols)
+
+
+async def _aget_stock_prices(symbols: list[str]) -> dict:
+    if len(symbols) > MAX_SYMBOLS_PER_CALL:
+        return {"error": f"At most {MAX_SYMBOLS_PER_CALL} symbols per call"}
+    return await quote_cache.aget_many(symbols)
+
+
+get_stock_price = StructuredTool.from_function(
+    func=_get_stock_price, coroutine=_aget_stock_price, name="get_stock_price"
+)
+get_stock_prices = StructuredTool.from_function(
+    func=_get_stock_prices, coroutine=_aget_stock_prices, name="get_stock_prices"
+)
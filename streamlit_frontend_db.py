@@ -1,5 +1,11 @@
 import streamlit as st
-from langgraph_backend_db import chatbot, retrieve_all_threads
+from langgraph_backend_db import (
+    chatbot,
+    get_thread_titles,
+    load_messages,
+    retrieve_all_threads,
+    search_threads,
+)
 from langchain_core.messages import HumanMessage, AIMessage
 import uuid
 
@@ -7,19 +13,36 @@ import uuid
 # Utility Functions
 # ****************************************
 
+HISTORY_PAGE = 30
+
 def generate_thread_id():
     return str(uuid.uuid4())
 
-def load_conversation(thread_id):
-    state = chatbot.get_state(config={'configurable': {'thread_id': thread_id}})
-    return state.values.get('messages', [])
-
-def get_last_user_question(thread_id):
-    messages = load_conversation(thread_id)
-    for msg in reversed(messages):
-        if isinstance(msg, HumanMessage):
-            return msg.content[:40]
-    return "New Chat"
+def load_conversation(thread_id, before=None):
+    # Only the newest page; older pages are fetched on demand
+    messages, cursor = load_messages(thread_id, limit=HISTORY_PAGE, before=before)
+    history = [
+        {
+            "role": "user" if isinstance(m, HumanMessage) else "assistant",
+            "content": m.content
+        }
+        for m in messages
+    ]
+    return history, cursor
+
+def open_thread(thread_id):
+    history, cursor = load_conversation(thread_id)
+    st.session_state['message_history'] = history
+    st.session_state['history_cursor'] = cursor
+
+def open_search_result(thread_id):
+    # Runs as a button callback, before the thread radio is drawn again
+    if thread_id not in st.session_state['chat_threads']:
+        st.session_state['chat_threads'].append(thread_id)
+        st.session_state['thread_titles'].update(get_thread_titles([thread_id]))
+    st.session_state['thread_id'] = thread_id
+    st.session_state['thread_selector'] = thread_id
+    open_thread(thread_id)
 
 def reset_chat():
     thread_id = generate_thread_id()
@@ -27,6 +50,7 @@ def reset_chat():
     st.session_state['chat_threads'].append(thread_id)
     st.session_state['thread_titles'][thread_id] = "New Chat"
     st.session_state['message_history'] = []
+    st.session_state['history_cursor'] = None
 
 
 # ****************************************
@@ -34,13 +58,13 @@ def reset_chat():
 # ****************************************
 
 if 'chat_threads' not in st.session_state:
-    st.session_state['chat_threads'] = retrieve_all_threads()
+    # Catalog is most recent first; this UI keeps oldest first
+    st.session_state['chat_threads'] = list(reversed(retrieve_all_threads()))
 
 if 'thread_titles' not in st.session_state:
-    st.session_state['thread_titles'] = {
-        tid: get_last_user_question(tid)
-        for tid in st.session_state['chat_threads']
-    }
+    st.session_state['thread_titles'] = get_thread_titles(
+        st.session_state['chat_threads']
+    )
 
 # DO NOT create new thread on refresh
 if 'thread_id' not in st.session_state:
@@ -52,16 +76,10 @@ if 'thread_id' not in st.session_state:
 
 if 'message_history' not in st.session_state:
     if st.session_state['thread_id']:
-        messages = load_conversation(st.session_state['thread_id'])
-        st.session_state['message_history'] = [
-            {
-                "role": "user" if isinstance(m, HumanMessage) else "assistant",
-                "content": m.content
-            }
-            for m in messages
-        ]
+        open_thread(st.session_state['thread_id'])
     else:
         st.session_state['message_history'] = []
+        st.session_state['history_cursor'] = None
 
 
 # ****************************************
@@ -74,6 +92,22 @@ if st.sidebar.button("➕ New Chat"):
     reset_chat()
 
 st.sidebar.divider()
+
+search = st.sidebar.text_input("🔍 Search conversations", key="thread_search")
+if search.strip():
+    results = search_threads(search)
+    if not results:
+        st.sidebar.caption("No matching messages")
+    for result in results:
+        st.sidebar.button(
+            result['title'],
+            key=f"search_{result['thread_id']}",
+            on_click=open_search_result,
+            args=(result['thread_id'],),
+        )
+        st.sidebar.caption(result['snippet'])
+    st.sidebar.divider()
+
 st.sidebar.subheader("My Conversations")
 
 if st.session_state['chat_threads']:
@@ -93,20 +127,22 @@ if st.session_state['chat_threads']:
     # ONE CLICK update
     if selected_thread != st.session_state['thread_id']:
         st.session_state['thread_id'] = selected_thread
-        messages = load_conversation(selected_thread)
-        st.session_state['message_history'] = [
-            {
-                "role": "user" if isinstance(m, HumanMessage) else "assistant",
-                "content": m.content
-            }
-            for m in messages
-        ]
+        open_thread(selected_thread)
 
 
 # ****************************************
 # Main Chat UI
 # ****************************************
 
+if st.session_state['history_cursor'] is not None:
+    if st.button("⬆ Load older messages"):
+        older, cursor = load_conversation(
+            st.session_state['thread_id'], before=st.session_state['history_cursor']
+        )
+        st.session_state['message_history'] = older + st.session_state['message_history']
+        st.session_state['history_cursor'] = cursor
+        st.rerun()
+
 for message in st.session_state['message_history']:
     with st.chat_message(message["role"]):
         st.text(message["content"])
@@ -1,5 +1,10 @@
 import streamlit as st
-from langgraph_tool_backend import chatbot, retrieve_all_threads
+from langgraph_tool_backend import (
+    chatbot,
+    get_thread_titles,
+    load_messages,
+    retrieve_all_threads,
+)
 from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
 import uuid
 
@@ -7,35 +12,56 @@ import uuid
 # Utilities
 # ======================================================
 
+HISTORY_PAGE = 30
+
 def generate_thread_id():
     return str(uuid.uuid4())
 
-def load_conversation(thread_id):
-    state = chatbot.get_state(
-        config={"configurable": {"thread_id": thread_id}}
+def load_conversation(thread_id, before=None):
+    # Newest page only; returns (messages, cursor for older messages)
+    return load_messages(thread_id, limit=HISTORY_PAGE, before=before)
+
+def load_last_turn(thread_id):
+    # Messages from the latest HumanMessage on; a turn with many tool calls
+    # can span several pages, so page back until it is found
+    msgs, cursor = load_conversation(thread_id)
+    while cursor is not None and not any(isinstance(m, HumanMessage) for m in msgs):
+        older, cursor = load_conversation(thread_id, before=cursor)
+        msgs = older + msgs
+    turn_start = max(
+        (i for i, m in enumerate(msgs) if isinstance(m, HumanMessage)),
+        default=0,
     )
-    return state.values.get("messages", [])
+    return msgs[turn_start:]
+
+def to_history(msgs):
+    return [
+        {
+            "role": "user" if isinstance(m, HumanMessage) else "assistant",
+            "content": m.content,
+        }
+        for m in msgs
+    ]
 
-def get_last_user_question(thread_id):
-    for msg in reversed(load_conversation(thread_id)):
-        if isinstance(msg, HumanMessage):
-            return msg.content[:40]
-    return "New Chat"
+def open_thread(thread_id):
+    msgs, cursor = load_conversation(thread_id)
+    st.session_state["message_history"] = to_history(msgs)
+    st.session_state["history_cursor"] = cursor
 
 def reset_chat():
     tid = generate_thread_id()
     st.session_state["thread_id"] = tid
     st.session_state["chat_threads"].insert(0, tid)
     st.session_state["message_history"] = []
+    st.session_state["history_cursor"] = None
 
 # ======================================================
 # Session Init
 # ======================================================
 
 if "chat_threads" not in st.session_state:
-    st.session_state["chat_threads"] = list(
-        reversed(retrieve_all_threads())
-    )
+    # Catalog is already ordered most recent first
+    st.session_state["chat_threads"] = retrieve_all_threads()
 
 if "thread_id" not in st.session_state:
     st.session_state["thread_id"] = (
@@ -45,14 +71,7 @@ if "thread_id" not in st.session_state:
     )
 
 if "message_history" not in st.session_state:
-    msgs = load_conversation(st.session_state["thread_id"])
-    st.session_state["message_history"] = [
-        {
-            "role": "user" if isinstance(m, HumanMessage) else "assistant",
-            "content": m.content,
-        }
-        for m in msgs
-    ]
+    open_thread(st.session_state["thread_id"])
 
 # ======================================================
 # Sidebar
@@ -67,8 +86,10 @@ if st.sidebar.button("➕ New Chat"):
 st.sidebar.divider()
 st.sidebar.subheader("My Conversations")
 
+thread_titles = get_thread_titles(st.session_state["chat_threads"])
+
 for tid in st.session_state["chat_threads"]:
-    label = get_last_user_question(tid)
+    label = thread_titles[tid]
     is_active = tid == st.session_state["thread_id"]
 
     if st.sidebar.button(
@@ -77,20 +98,25 @@ for tid in st.session_state["chat_threads"]:
         type="primary" if is_active else "secondary",
     ):
         st.session_state["thread_id"] = tid
-        msgs = load_conversation(tid)
-        st.session_state["message_history"] = [
-            {
-                "role": "user" if isinstance(m, HumanMessage) else "assistant",
-                "content": m.content,
-            }
-            for m in msgs
-        ]
+        open_thread(tid)
         st.rerun()
 
 # ======================================================
 # Main Chat UI
 # ======================================================
 
+if st.session_state["history_cursor"] is not None:
+    if st.button("⬆ Load older messages"):
+        older, cursor = load_conversation(
+            st.session_state["thread_id"],
+            before=st.session_state["history_cursor"],
+        )
+        st.session_state["message_history"] = (
+            to_history(older) + st.session_state["message_history"]
+        )
+        st.session_state["history_cursor"] = cursor
+        st.rerun()
+
 for msg in st.session_state["message_history"]:
     with st.chat_message(msg["role"]):
         st.text(msg["content"])
@@ -149,7 +175,7 @@ if user_input:
     # SHOW ONLY FINAL AI MESSAGE
     # ==================================================
 
-    messages = load_conversation(tid)
+    messages = load_last_turn(tid)
 
     final_answer = None
     for msg in reversed(messages):
@@ -160,14 +186,9 @@ if user_input:
     with st.chat_message("assistant"):
         st.text(final_answer or "No response generated.")
 
-    # Refresh UI state (NO DUPLICATES)
-    st.session_state["message_history"] = [
-        {
-            "role": "user" if isinstance(m, HumanMessage) else "assistant",
-            "content": m.content,
-        }
-        for m in messages
-    ]
+    # Append only this turn so pages opened with "Load older messages"
+    # stay; the cursor still points before them
+    st.session_state["message_history"] += to_history(messages)
 
     # Move thread to top
     if tid in st.session_state["chat_threads"]:
@@ -6,12 +6,16 @@ from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
 from langgraph_rag_backend import (
     chatbot,
     ingest_pdf,
+    load_messages,
     retrieve_all_threads,
     thread_document_metadata,
 )
 
 
 # =========================== Utilities ===========================
+HISTORY_PAGE = 30
+
+
 def generate_thread_id():
     return uuid.uuid4()
 
@@ -21,6 +25,7 @@ def reset_chat():
     st.session_state["thread_id"] = thread_id
     add_thread(thread_id)
     st.session_state["message_history"] = []
+    st.session_state["history_cursor"] = None
 
 
 def add_thread(thread_id):
@@ -28,20 +33,32 @@ def add_thread(thread_id):
         st.session_state["chat_threads"].append(thread_id)
 
 
-def load_conversation(thread_id):
-    state = chatbot.get_state(config={"configurable": {"thread_id": thread_id}})
-    return state.values.get("messages", [])
+def load_conversation(thread_id, before=None):
+    # Newest page only; returns (messages, cursor for older messages)
+    return load_messages(str(thread_id), limit=HISTORY_PAGE, before=before)
+
+
+def to_history(messages):
+    history = []
+    for msg in messages:
+        role = "user" if isinstance(msg, HumanMessage) else "assistant"
+        history.append({"role": role, "content": msg.content})
+    return history
 
 
 # ======================= Session Initialization ===================
 if "message_history" not in st.session_state:
     st.session_state["message_history"] = []
 
+if "history_cursor" not in st.session_state:
+    st.session_state["history_cursor"] = None
+
 if "thread_id" not in st.session_state:
     st.session_state["thread_id"] = generate_thread_id()
 
 if "chat_threads" not in st.session_state:
-    st.session_state["chat_threads"] = retrieve_all_threads()
+    # Catalog is most recent first; this UI keeps oldest first
+    st.session_state["chat_threads"] = list(reversed(retrieve_all_threads()))
 
 if "ingested_docs" not in st.session_state:
     st.session_state["ingested_docs"] = {}
@@ -96,6 +113,17 @@ else:
 st.title("Multi Utility Chatbot")
 
 # Chat area
+if st.session_state["history_cursor"] is not None:
+    if st.button("⬆ Load older messages"):
+        older, cursor = load_conversation(
+            st.session_state["thread_id"], before=st.session_state["history_cursor"]
+        )
+        st.session_state["message_history"] = (
+            to_history(older) + st.session_state["message_history"]
+        )
+        st.session_state["history_cursor"] = cursor
+        st.rerun()
+
 for message in st.session_state["message_history"]:
     with st.chat_message(message["role"]):
         st.text(message["content"])
@@ -160,12 +188,8 @@ st.divider()
 
 if selected_thread:
     st.session_state["thread_id"] = selected_thread
-    messages = load_conversation(selected_thread)
-
-    temp_messages = []
-    for msg in messages:
-        role = "user" if isinstance(msg, HumanMessage) else "assistant"
-        temp_messages.append({"role": role, "content": msg.content})
-    st.session_state["message_history"] = temp_messages
+    messages, cursor = load_conversation(selected_thread)
+    st.session_state["message_history"] = to_history(messages)
+    st.session_state["history_cursor"] = cursor
     st.session_state["ingested_docs"].setdefault(str(selected_thread), {})
     st.rerun()
\ No newline at end of file
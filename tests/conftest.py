@@ -0,0 +1,68 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+# The modules live at the repository root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fake_openai_server import FakeOpenAIServer  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def fake_server():
+    server = FakeOpenAIServer(port=0).start()
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture(scope="session")
+def rag_backend(fake_server, tmp_path_factory):
+    """langgraph_rag_backend against the fake server, with the semantic cache on."""
+    env = {
+        "FAKE_OPENAI_URL": fake_server.base_url,
+        "ALPHA_VANTAGE_URL": fake_server.base_url.removesuffix("/v1") + "/query",
+        "SEMANTIC_CACHE": "1",
+    }
+    saved = {name: os.environ.get(name) for name in env}
+    os.environ.update(env)
+    cwd = os.getcwd()
+    # chatbot.db, llm_cache.db and search_cache.db go to a temporary directory
+    os.chdir(tmp_path_factory.mktemp("rag_backend"))
+    try:
+        backend = importlib.import_module("langgraph_rag_backend")
+        yield backend
+        backend.checkpointer.close()
+    finally:
+        os.chdir(cwd)
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+@pytest.fixture
+def echo_chatbot():
+    """Factory: a one-node chat graph that echoes each question, on `checkpointer`."""
+    from typing import Annotated, TypedDict
+
+    from langchain_core.messages import AIMessage, BaseMessage
+    from langgraph.graph import START, StateGraph
+    from langgraph.graph.message import add_messages
+
+    class State(TypedDict):
+        messages: Annotated[list[BaseMessage], add_messages]
+
+    def chat_node(state: State) -> dict:
+        return {"messages": [AIMessage(content=f"echo: {state['messages'][-1].content}")]}
+
+    def build(checkpointer):
+        graph = StateGraph(State)
+        graph.add_node("chat_node", chat_node)
+        graph.add_edge(START, "chat_node")
+        return graph.compile(checkpointer=checkpointer)
+
+    return build
@@ -0,0 +1,14 @@
+from calculator import evaluate_all
+
+
+def test_shape_mismatch_fails_only_its_expression():
+    results = evaluate_all(["[1, 2] + [1, 2, 3]", "1 + 1"])
+    assert "broadcast" in results[0]["error"]
+    assert results[1] == {"expression": "1 + 1", "result": 2}
+
+
+def test_bad_round_argument_fails_only_its_expression():
+    results = evaluate_all(["x = round(2.5, [1, 2])", "x + 1", "3 * 4"])
+    assert "error" in results[0]
+    assert results[1]["error"] == "'x' failed earlier"
+    assert results[2]["result"] == 12
@@ -0,0 +1,79 @@
+from langchain_core.messages import HumanMessage
+
+from checkpoint_codec import CompressedSerializer
+from checkpoint_retention import RetentionPolicy, compact_checkpoints, enable_incremental_vacuum
+from sqlite_checkpointer import PooledSqliteSaver
+
+CONFIG = {"configurable": {"thread_id": "t"}}
+
+
+def _saver(path):
+    return PooledSqliteSaver(str(path), serde=CompressedSerializer(), delta_messages=True, snapshot_every=8)
+
+
+def _chat(chatbot, turns, padding=""):
+    for turn in range(turns):
+        chatbot.invoke({"messages": [HumanMessage(content=f"question {turn}{padding}")]}, config=CONFIG)
+
+
+def _checkpoints(saver):
+    """(checkpoint_id, message count) of every checkpoint, newest first."""
+    return [
+        (item.config["configurable"]["checkpoint_id"], len(item.checkpoint["channel_values"].get("messages", [])))
+        for item in saver.list(CONFIG)
+    ]
+
+
+def test_compaction_keeps_the_latest_state(tmp_path, echo_chatbot):
+    saver = _saver(tmp_path / "chatbot.db")
+    chatbot = echo_chatbot(saver)
+    _chat(chatbot, 40)
+    before = chatbot.get_state(CONFIG)
+    assert len(before.values["messages"]) == 80
+    total = len(_checkpoints(saver))
+    assert total == 120  # input, __start__ and chat_node per turn
+
+    stats = compact_checkpoints(saver, RetentionPolicy(keep_last=3))
+    assert stats["threads"] == 1
+    assert stats["checkpoints_deleted"] == total - 3
+    assert stats["snapshots_rewritten"] >= 1
+    assert len(_checkpoints(saver)) == 3
+    assert chatbot.get_state(CONFIG).values == before.values
+    saver.close()
+
+    # Rebuilt from the stored rows alone, without the writer's message cache
+    saver = _saver(tmp_path / "chatbot.db")
+    assert echo_chatbot(saver).get_state(CONFIG).values == before.values
+    # Nothing new since the last run
+    assert compact_checkpoints(saver, RetentionPolicy(keep_last=3))["threads"] == 0
+    saver.close()
+
+
+def test_turn_boundaries_only(tmp_path, echo_chatbot):
+    saver = _saver(tmp_path / "chatbot.db")
+    chatbot = echo_chatbot(saver)
+    _chat(chatbot, 5)
+
+    compact_checkpoints(saver, RetentionPolicy(turn_boundaries_only=True))
+    # One checkpoint per finished turn; the latest is the end of the last one
+    assert [count for _, count in _checkpoints(saver)] == [10, 8, 6, 4, 2]
+
+    _chat(chatbot, 1)
+    compact_checkpoints(saver, RetentionPolicy(keep_last=2, turn_boundaries_only=True))
+    assert [count for _, count in _checkpoints(saver)] == [12, 10, 8]
+    saver.close()
+
+
+def test_compaction_vacuum_releases_free_pages(tmp_path, echo_chatbot):
+    saver = _saver(tmp_path / "chatbot.db")
+    with saver.lock:
+        enable_incremental_vacuum(saver.conn)
+    chatbot = echo_chatbot(saver)
+    _chat(chatbot, 20, padding=" " + "x" * 4000)
+
+    stats = compact_checkpoints(saver, RetentionPolicy(keep_last=1, vacuum_pages=None))
+    assert stats["pages_freed"] > 0
+    with saver.cursor(transaction=False) as cur:
+        assert cur.execute("PRAGMA freelist_count").fetchone() == (0,)
+    assert len(chatbot.get_state(CONFIG).values["messages"]) == 40
+    saver.close()
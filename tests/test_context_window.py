@@ -0,0 +1,31 @@
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+from context_window import build_context, count_tokens
+
+MODEL = "gpt-4o-mini"
+
+
+def _tool_round(call_id, result):
+    return [
+        AIMessage(content="", tool_calls=[{"name": "rag_tool", "args": {"query": "q"}, "id": call_id}]),
+        ToolMessage(content=result, name="rag_tool", tool_call_id=call_id),
+    ]
+
+
+def test_tight_budget_keeps_question_with_its_tool_rounds():
+    question = HumanMessage(content="What does the report say about revenue?")
+    messages = [
+        SystemMessage(content="You are a helpful assistant."),
+        HumanMessage(content="Hello " * 200),
+        AIMessage(content="Hi " * 200),
+        question,
+        *_tool_round("call_1", "Revenue grew. " * 100),
+        *_tool_round("call_2", "Costs fell. " * 100),
+    ]
+    current_turn = messages[3:]
+    budget = count_tokens([messages[0], *current_turn], MODEL)
+
+    window = build_context(messages, model=MODEL, budget=budget)
+
+    assert window.messages[-5:] == current_turn
+    assert window.dropped_messages == 2
@@ -0,0 +1,22 @@
+from fast_path import _quote_answer
+from fake_openai_server import quote
+from stock_quotes import QuoteCache, QuoteError
+
+
+def test_fresh_quote_is_answered():
+    assert _quote_answer({"symbol": "AAPL"}, quote("AAPL")).startswith("AAPL is trading at $")
+
+
+def test_stale_fallback_goes_to_the_model():
+    responses = [quote("AAPL")]
+
+    def fetch(symbol):
+        if responses:
+            return responses.pop()
+        raise QuoteError("rate limited")
+
+    cache = QuoteCache(ttl=0, fetch=fetch)
+    cache.get("AAPL")
+    stale = cache.get("AAPL")
+    assert stale["stale"] is True
+    assert _quote_answer({"symbol": "AAPL"}, stale) is None
@@ -0,0 +1,97 @@
+import asyncio
+import time
+from typing import Any
+
+import pytest
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessageChunk, HumanMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+
+from context_window import count_tokens
+from hedging import HEDGE_MIN_SAMPLES, HedgedChatModel, LatencyTracker
+from rate_limiter import limiter_for
+
+HEDGE_USAGE = 40
+
+
+class SlowFirstCall(BaseChatModel):
+    """The first stream stalls; later ones answer at once, reporting HEDGE_USAGE tokens."""
+
+    model_name: str
+    calls: int = 0
+    # Every attempt raises instead, after the first one's stall
+    fail: bool = False
+
+    @property
+    def _llm_type(self) -> str:
+        return "slow-first-call"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        raise NotImplementedError
+
+    def _chunks(self):
+        if self.fail:
+            raise ConnectionError("upstream unavailable")
+        yield ChatGenerationChunk(message=AIMessageChunk(content="hi"))
+        usage = {"input_tokens": HEDGE_USAGE - 1, "output_tokens": 1, "total_tokens": HEDGE_USAGE}
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=usage))
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs: Any):
+        self.calls += 1
+        if self.calls == 1:
+            time.sleep(0.5)
+        yield from self._chunks()
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs: Any):
+        self.calls += 1
+        if self.calls == 1:
+            await asyncio.sleep(0.5)
+        for chunk in self._chunks():
+            yield chunk
+
+
+def _hedged(model_name: str, fail: bool = False) -> HedgedChatModel:
+    tracker = LatencyTracker()
+    for _ in range(HEDGE_MIN_SAMPLES):
+        tracker.record(model_name, 0.01)
+    return HedgedChatModel(inner=SlowFirstCall(model_name=model_name, fail=fail), tracker=tracker)
+
+
+MESSAGES = [HumanMessage(content="hello")]
+
+
+# The hedge wins; its reservation is settled with the cancelled primary's
+# usage, which never streamed a chunk: the prompt alone. (The caller settles
+# its own reservation with the winner's usage.)
+def test_hedge_reservation_is_settled():
+    llm = _hedged("hedge-test-sync")
+    llm.invoke(MESSAGES)
+    assert llm.tracker.counts["hedge-test-sync"]["hedge_wins"] == 1
+    assert limiter_for("hedge-test-sync").tokens_used == count_tokens(MESSAGES, "hedge-test-sync")
+
+
+def test_async_hedge_reservation_is_settled():
+    llm = _hedged("hedge-test-async")
+    asyncio.run(llm.ainvoke(MESSAGES))
+    assert llm.tracker.counts["hedge-test-async"]["hedge_wins"] == 1
+    assert limiter_for("hedge-test-async").tokens_used == count_tokens(MESSAGES, "hedge-test-async")
+
+
+# Both attempts fail: the hedge's reservation is still settled, with the
+# prompt alone, rather than holding its reservation forever.
+def test_hedge_reservation_is_settled_when_every_attempt_fails():
+    llm = _hedged("hedge-test-failed", fail=True)
+    limiter = limiter_for("hedge-test-failed")
+    with pytest.raises(ConnectionError):
+        llm.invoke(MESSAGES)
+    assert llm.tracker.counts["hedge-test-failed"]["hedged"] == 1
+    assert limiter.tokens_used == count_tokens(MESSAGES, "hedge-test-failed")
+
+
+def test_async_hedge_reservation_is_settled_when_every_attempt_fails():
+    llm = _hedged("hedge-test-async-failed", fail=True)
+    limiter = limiter_for("hedge-test-async-failed")
+    with pytest.raises(ConnectionError):
+        asyncio.run(llm.ainvoke(MESSAGES))
+    assert llm.tracker.counts["hedge-test-async-failed"]["hedged"] == 1
+    assert limiter.tokens_used == count_tokens(MESSAGES, "hedge-test-async-failed")
@@ -0,0 +1,27 @@
+from langchain_core.messages import HumanMessage
+
+from memory_checkpointer import BoundedMemorySaver
+
+
+def _config(thread_id):
+    return {"configurable": {"thread_id": thread_id}}
+
+
+def test_hit_rate_counts_only_lookups(echo_chatbot):
+    saver = BoundedMemorySaver(max_threads=1)
+    chatbot = echo_chatbot(saver)
+    chatbot.invoke({"messages": [HumanMessage(content="hi")]}, config=_config("a"))
+    chatbot.invoke({"messages": [HumanMessage(content="hi")]}, config=_config("b"))
+    assert saver.stats()["spilled_threads"] == 1
+
+    # A turn reads its thread once and then writes several checkpoints
+    before = saver.stats()
+    chatbot.invoke({"messages": [HumanMessage(content="again")]}, config=_config("b"))
+    after = saver.stats()
+    assert (after["hits"] - before["hits"], after["misses"] - before["misses"]) == (1, 0)
+
+    saver.get_tuple(_config("a"))
+    list(saver.list(_config("a")))
+    stats = saver.stats()
+    assert (stats["hits"] - after["hits"], stats["misses"] - after["misses"]) == (1, 1)
+    saver.close()
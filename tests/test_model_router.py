@@ -0,0 +1,39 @@
+import pytest
+from langchain_core.messages import HumanMessage
+
+from llm_cache import ResponseCache
+from model_router import ModelRouter, Route
+from openai_clients import chat_model
+from rate_limiter import EXPECTED_COMPLETION_TOKENS, limiter_for
+
+MESSAGES = [HumanMessage(content="Tell me about rate limits")]
+
+
+def test_cache_hits_skip_the_limiter(fake_server, monkeypatch, tmp_path):
+    monkeypatch.setenv("FAKE_OPENAI_URL", fake_server.base_url)
+    model = "router-test-cached"
+    router = ModelRouter(chat_model(model=model, cache=ResponseCache(str(tmp_path / "cache.db"))))
+    route = Route("general", model)
+
+    first = router.invoke(route, MESSAGES)
+    second = router.invoke(route, MESSAGES)
+
+    assert second.content == first.content
+    stats = limiter_for(model).stats()
+    assert stats["interactive"]["admitted"] == 1
+    assert stats["tokens_used"] == first.usage_metadata["total_tokens"]
+
+
+def test_failed_call_settles_its_reservation():
+    model = "router-test-failing"
+    llm = chat_model(model=model, base_url="http://127.0.0.1:9/v1", api_key="fake", max_retries=0)
+    router = ModelRouter(llm)
+    estimate = router._estimate(model, MESSAGES)
+
+    with pytest.raises(Exception):
+        router.invoke(Route("general", model), MESSAGES)
+
+    limiter = limiter_for(model)
+    assert limiter.tokens_used == estimate - EXPECTED_COMPLETION_TOKENS
+    # Only the prompt stays charged; the completion reservation is back
+    assert limiter.tokens.capacity - limiter.stats()["tokens_available"] <= estimate - EXPECTED_COMPLETION_TOKENS
@@ -0,0 +1,25 @@
+import uuid
+
+from langchain_core.messages import HumanMessage
+
+
+def _ask(backend, question):
+    config = {"configurable": {"thread_id": f"test-{uuid.uuid4().hex}"}}
+    return backend.chatbot.invoke({"messages": [HumanMessage(content=question)]}, config=config)
+
+
+def test_quote_answer_is_not_served_from_cache(rag_backend):
+    question = "What is the stock price of AAPL?"
+    _ask(rag_backend, question)
+    assert rag_backend.semantic_cache.stats()["entries"] == 0
+
+    result = _ask(rag_backend, question)
+    assert "semantic_cache" not in result["messages"][-1].response_metadata
+    assert result["messages"][1].tool_calls[0]["name"] == "get_stock_price"
+
+
+def test_plain_answer_is_served_from_cache(rag_backend):
+    question = "Tell me a fun fact about otters"
+    _ask(rag_backend, question)
+    result = _ask(rag_backend, question)
+    assert "semantic_cache" in result["messages"][-1].response_metadata
@@ -0,0 +1,141 @@
+import threading
+from concurrent.futures import Future
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from checkpoint_codec import CompressedSerializer
+from sqlite_checkpointer import PooledSqliteSaver, is_delta
+
+
+def _saver(path, **kwargs):
+    return PooledSqliteSaver(str(path), serde=CompressedSerializer(), delta_messages=True, **kwargs)
+
+
+def _config(thread_id, checkpoint_id=None):
+    configurable = {"thread_id": thread_id, "checkpoint_ns": ""}
+    if checkpoint_id:
+        configurable["checkpoint_id"] = checkpoint_id
+    return {"configurable": configurable}
+
+
+def test_list_releases_its_reader_when_abandoned(tmp_path, echo_chatbot):
+    saver = _saver(tmp_path / "chatbot.db", readers=4)
+    chatbot = echo_chatbot(saver)
+    chatbot.invoke({"messages": [HumanMessage(content="hi")]}, config=_config("t"))
+
+    # Keep the generators alive, so nothing closes them
+    listings = []
+    for _ in range(5):
+        listings.append(saver.list(_config("t")))
+        started = threading.Thread(target=next, args=(listings[-1],), daemon=True)
+        started.start()
+        started.join(timeout=5)
+        assert not started.is_alive(), "list() is waiting for a reader held by an abandoned listing"
+    saver.close()
+
+
+def test_failed_job_does_not_roll_back_its_batch(tmp_path):
+    saver = _saver(tmp_path / "chatbot.db")
+    with saver.cursor() as cur:
+        cur.execute("CREATE TABLE scratch (value INTEGER)")
+
+    def insert(value, fail=False):
+        def job(cur):
+            cur.execute("INSERT INTO scratch (value) VALUES (?)", (value,))
+            if fail:
+                raise RuntimeError("job failed")
+            return value
+
+        return job, Future()
+
+    batch = [insert(1), insert(2, fail=True), insert(3)]
+    saver._commit_batch(batch)
+
+    assert [done.result() for _, done in (batch[0], batch[2])] == [1, 3]
+    with pytest.raises(RuntimeError):
+        batch[1][1].result()
+    with saver.cursor(transaction=False) as cur:
+        assert [v for (v,) in cur.execute("SELECT value FROM scratch ORDER BY value")] == [1, 3]
+    saver.close()
+
+
+def _chat(saver, echo_chatbot, thread_id, turns):
+    """Run `turns` echo turns; returns (checkpoint_id, messages) after each."""
+    chatbot = echo_chatbot(saver)
+    history = []
+    for turn in range(turns):
+        chatbot.invoke({"messages": [HumanMessage(content=f"question {turn}")]}, config=_config(thread_id))
+        state = chatbot.get_state(_config(thread_id))
+        history.append((state.config["configurable"]["checkpoint_id"], state.values["messages"]))
+    return history
+
+
+def _contents(messages):
+    return [(message.type, message.content) for message in messages]
+
+
+def _expected(turns):
+    return [
+        pair
+        for turn in range(turns)
+        for pair in (("human", f"question {turn}"), ("ai", f"echo: question {turn}"))
+    ]
+
+
+def _stored_messages(saver, thread_id):
+    """Raw messages channel of every checkpoint, newest first, without resolving deltas."""
+    with saver.cursor(transaction=False) as cur:
+        rows = cur.execute(
+            "SELECT checkpoint_id, type, checkpoint FROM checkpoints "
+            "WHERE thread_id = ? AND checkpoint_ns = '' ORDER BY checkpoint_id DESC",
+            (thread_id,),
+        ).fetchall()
+    return [
+        (checkpoint_id, saver.serde.loads_typed((kind, blob))["channel_values"].get("messages"))
+        for checkpoint_id, kind, blob in rows
+    ]
+
+
+def test_delta_checkpoints_round_trip(tmp_path, echo_chatbot):
+    path = tmp_path / "chatbot.db"
+    saver = _saver(path, snapshot_every=4)
+    history = _chat(saver, echo_chatbot, "t", turns=6)
+    saver.close()
+
+    stored = [value for _, value in _stored_messages(_saver(path), "t") if value is not None]
+    assert any(is_delta(value) for value in stored)
+    assert sum(not is_delta(value) for value in stored) > 1  # snapshot_every starts new chains
+
+    # A fresh saver has no message cache: every delta chain is rebuilt from the rows
+    saver = _saver(path, snapshot_every=4)
+    for turn, (checkpoint_id, messages) in enumerate(history, start=1):
+        assert _contents(messages) == _expected(turn)
+        stored_tuple = saver.get_tuple(_config("t", checkpoint_id))
+        assert stored_tuple.checkpoint["channel_values"]["messages"] == messages
+    listed = {
+        item.config["configurable"]["checkpoint_id"]: item.checkpoint["channel_values"].get("messages")
+        for item in saver.list(_config("t"))
+    }
+    assert all(listed[checkpoint_id] == messages for checkpoint_id, messages in history)
+    saver.close()
+
+
+def test_materialized_checkpoint_outlives_its_ancestors(tmp_path, echo_chatbot):
+    path = tmp_path / "chatbot.db"
+    saver = _saver(path, snapshot_every=16)
+    history = _chat(saver, echo_chatbot, "t", turns=4)
+    checkpoint_id, messages = history[2]
+    assert _contents(messages) == _expected(3)
+    assert is_delta(dict(_stored_messages(saver, "t"))[checkpoint_id])
+
+    with saver.cursor() as cur:
+        assert saver.materialize_checkpoint(cur, "t", "", checkpoint_id)
+        assert not saver.materialize_checkpoint(cur, "t", "", checkpoint_id)
+        cur.execute("DELETE FROM checkpoints WHERE thread_id = 't' AND checkpoint_id < ?", (checkpoint_id,))
+    saver.close()
+
+    saver = _saver(path, snapshot_every=16)
+    assert saver.get_tuple(_config("t", checkpoint_id)).checkpoint["channel_values"]["messages"] == messages
+    assert saver.get_tuple(_config("t")).checkpoint["channel_values"]["messages"] == history[-1][1]
+    saver.close()
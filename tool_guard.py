@@ -0,0 +1,325 @@
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Any, Optional, Sequence
+
+from langchain_core.tools import BaseTool, StructuredTool
+from langgraph.errors import GraphBubbleUp
+
+from hedging import percentile
+
+logger = logging.getLogger(__name__)
+
+# -------------------
+# 1. Settings
+# -------------------
+# Deadline for a whole tool call, retries and queueing included; each HTTP
+# request inside is also bounded by http_clients.TOOL_TIMEOUT
+DEFAULT_DEADLINE = float(os.getenv("TOOL_DEADLINE_SECONDS", "30"))
+TOOL_DEADLINES = {
+    "calculator": 2.0,
+    "get_stock_price": 15.0,
+    "get_stock_prices": 30.0,
+    "duckduckgo_search": 20.0,
+    "rag_tool": 20.0,
+}
+# Calls of one tool running at once, across every session; hung calls keep
+# their slot until they actually return
+MAX_CONCURRENT = int(os.getenv("TOOL_MAX_CONCURRENT", "8"))
+# Consecutive failures (errors or timeouts) that open a tool's circuit
+BREAKER_FAILURES = int(os.getenv("TOOL_BREAKER_FAILURES", "5"))
+# How long an open circuit fails fast before letting one trial call through
+BREAKER_RESET_SECONDS = float(os.getenv("TOOL_BREAKER_RESET_SECONDS", "30"))
+LATENCY_WINDOW = 200
+
+# Sync tool calls run here so they can be abandoned at the deadline
+_executor = ThreadPoolExecutor(max_workers=64, thread_name_prefix="tool")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Opens after `failures` consecutive failures. While open, calls are
+    refused until `reset_seconds` have passed; then one trial call goes
+    through (half-open), and its outcome closes or re-opens the circuit.
+    Outcomes of other calls that were already running count the same way.
+    """
+
+    def __init__(self, failures: int = BREAKER_FAILURES, reset_seconds: float = BREAKER_RESET_SECONDS) -> None:
+        self.failures = failures
+        self.reset_seconds = reset_seconds
+        self.lock = threading.Lock()
+        self.state = CLOSED
+        self.consecutive = 0
+        self.opened_at = 0.0
+
+    def allow(self) -> bool:
+        with self.lock:
+            if self.state == CLOSED:
+                return True
+            # A trial that never reported back (e.g. no free slot) gets replaced
+            if time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state, self.opened_at = HALF_OPEN, time.monotonic()
+                return True
+            return False
+
+    def retry_after(self) -> float:
+        with self.lock:
+            return max(0.0, self.opened_at + self.reset_seconds - time.monotonic())
+
+    def record(self, ok: bool) -> bool:
+        """Record an outcome; True if this failure opened the circuit."""
+        with self.lock:
+            if ok:
+                self.state, self.consecutive = CLOSED, 0
+                return False
+            self.consecutive += 1
+            if self.state == HALF_OPEN or self.consecutive >= self.failures:
+                opened = self.state != OPEN
+                self.state, self.opened_at = OPEN, time.monotonic()
+                return opened
+            return False
+
+
+class _Slots:
+    """Counting semaphore that threads and coroutines can both wait on."""
+
+    def __init__(self, size: int) -> None:
+        self.free = size
+        self.cond = threading.Condition()
+        self._async_waiters: set[tuple[asyncio.AbstractEventLoop, asyncio.Event]] = set()
+
+    def acquire(self, timeout: float) -> bool:
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.free > 0, timeout):
+                return False
+            self.free -= 1
+            return True
+
+    async def aacquire(self, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self.cond:
+            self._async_waiters.add(waiter)
+        try:
+            while True:
+                with self.cond:
+                    waiter[1].clear()
+                    if self.free > 0:
+                        self.free -= 1
+                        return True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                try:
+                    await asyncio.wait_for(waiter[1].wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            with self.cond:
+                self._async_waiters.discard(waiter)
+
+    def release(self) -> None:
+        with self.cond:
+            self.free += 1
+            self.cond.notify()
+            for loop, event in self._async_waiters:
+                loop.call_soon_threadsafe(event.set)
+
+
+# -------------------
+# 2. Guard
+# -------------------
+class ToolGuard:
+    """Deadline, concurrency slots, circuit breaker and counters for one tool."""
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        deadline: Optional[float] = None,
+        max_concurrent: int = MAX_CONCURRENT,
+        breaker: Optional[CircuitBreaker] = None,
+    ) -> None:
+        self.name = name
+        self.deadline = deadline or TOOL_DEADLINES.get(name, DEFAULT_DEADLINE)
+        self.slots = _Slots(max_concurrent)
+        self.breaker = breaker or CircuitBreaker()
+        self.lock = threading.Lock()
+        self.latencies: deque = deque(maxlen=LATENCY_WINDOW)
+        self.counts = {"calls": 0, "errors": 0, "timeouts": 0, "rejected": 0, "busy": 0, "in_flight": 0}
+
+    def _count(self, event: str, delta: int = 1) -> None:
+        with self.lock:
+            self.counts[event] += delta
+
+    def _refused(self) -> Optional[dict]:
+        self._count("calls")
+        if self.breaker.allow():
+            return None
+        self._count("rejected")
+        return self.error(
+            f"{self.name} is temporarily unavailable after repeated failures; "
+            f"answer without it or retry in {self.breaker.retry_after():.0f}s",
+            circuit=OPEN,
+        )
+
+    def _finish(self, started: float, failure: Optional[str]) -> None:
+        with self.lock:
+            self.latencies.append(time.monotonic() - started)
+            if failure:
+                self.counts[failure] += 1
+        if self.breaker.record(failure is None):
+            logger.warning("circuit for tool %s opened", self.name)
+
+    def error(self, message: str, **extra: Any) -> dict:
+        return {"error": message, "tool": self.name, **extra}
+
+    def _busy(self) -> dict:
+        self._count("busy")
+        return self.error(f"{self.name} is busy; too many calls in progress")
+
+    def _timed_out(self, started: float) -> dict:
+        self._finish(started, "timeouts")
+        return self.error(f"{self.name} did not finish within {self.deadline:g}s", timeout=True)
+
+    def call(self, fn, *args: Any) -> Any:
+        """Run fn(*args) in a worker thread under the guard; errors come back as dicts."""
+        refused = self._refused()
+        if refused:
+            return refused
+        started = time.monotonic()
+        if not self.slots.acquire(self.deadline):
+            return self._busy()
+        self._count("in_flight")
+        # Run in a copy of this context, so interrupt() and callbacks still work
+        future = _executor.submit(contextvars.copy_context().run, fn, *args)
+        future.add_done_callback(lambda _: self._release())
+        try:
+            result = future.result(timeout=max(0.0, started + self.deadline - time.monotonic()))
+        except FutureTimeout:
+            return self._timed_out(started)
+        except GraphBubbleUp:
+            self._finish(started, None)
+            raise
+        except Exception as e:
+            self._finish(started, "errors")
+            return self.error(str(e) or type(e).__name__)
+        self._finish(started, None)
+        return result
+
+    async def acall(self, fn, *args: Any) -> Any:
+        """call() for coroutine functions; the call is cancelled at the deadline."""
+        refused = self._refused()
+        if refused:
+            return refused
+        started = time.monotonic()
+        if not await self.slots.aacquire(self.deadline):
+            return self._busy()
+        self._count("in_flight")
+        try:
+            result = await asyncio.wait_for(fn(*args), max(0.0, started + self.deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            return self._timed_out(started)
+        except GraphBubbleUp:
+            self._finish(started, None)
+            raise
+        except Exception as e:
+            self._finish(started, "errors")
+            return self.error(str(e) or type(e).__name__)
+        finally:
+            self._release()
+        self._finish(started, None)
+        return result
+
+    def _release(self) -> None:
+        self._count("in_flight", -1)
+        self.slots.release()
+
+    def stats(self) -> dict[str, Any]:
+        with self.lock:
+            latencies = list(self.latencies)
+            counts = dict(self.counts)
+        return {
+            **counts,
+            "circuit": self.breaker.state,
+            "p50_seconds": percentile(latencies, 50) if latencies else 0.0,
+            "p95_seconds": percentile(latencies, 95) if latencies else 0.0,
+        }
+
+
+_guards: dict[str, ToolGuard] = {}
+_guards_lock = threading.Lock()
+
+
+def guard_for(name: str) -> ToolGuard:
+    """The process-wide guard of one tool, shared by every backend."""
+    with _guards_lock:
+        if name not in _guards:
+            _guards[name] = ToolGuard(name)
+        return _guards[name]
+
+
+def tool_stats() -> dict[str, dict[str, Any]]:
+    """Calls, errors, timeouts, refusals, latency and circuit state per tool."""
+    with _guards_lock:
+        guards = dict(_guards)
+    return {name: guard.stats() for name, guard in guards.items()}
+
+
+# -------------------
+# 3. Tools
+# -------------------
+def guarded(tool: BaseTool) -> BaseTool:
+    """
+    `tool` with the same name, description and arguments, run under its
+    ToolGuard. Timeouts, failures and an open circuit reach the model as a
+    structured {"error": ...} result instead of blocking or failing the turn.
+    A tool that reports its own errors in its result (a rate-limited quote,
+    a missing document) counts as a success.
+    """
+    guard = guard_for(tool.name)
+    with_artifact = tool.response_format == "content_and_artifact"
+
+    def as_call(kwargs: dict) -> dict:
+        return {"name": tool.name, "args": kwargs, "id": f"guard_{uuid.uuid4().hex[:24]}", "type": "tool_call"}
+
+    def unpack(result: Any) -> Any:
+        if not with_artifact:
+            return result
+        if isinstance(result, dict) and result.get("tool") == tool.name and "error" in result:
+            return json.dumps(result), None
+        return result.content, result.artifact
+
+    def run(**kwargs: Any) -> Any:
+        return unpack(guard.call(tool.invoke, as_call(kwargs) if with_artifact else kwargs))
+
+    async def arun(**kwargs: Any) -> Any:
+        return unpack(await guard.acall(tool.ainvoke, as_call(kwargs) if with_artifact else kwargs))
+
+    return StructuredTool(
+        name=tool.name,
+        description=tool.description,
+        args_schema=tool.args_schema,
+        func=run,
+        coroutine=arun,
+        response_format=tool.response_format,
+        return_direct=tool.return_direct,
+    )
+
+
+def guarded_tools(tools: Sequence[BaseTool]) -> list[BaseTool]:
+    return [guarded(t) for t in tools]
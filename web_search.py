@@ -0,0 +1,287 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+from urllib.parse import urlsplit
+
+from langchain_community.tools import DuckDuckGoSearchRun
+from langchain_community.utilities import DuckDuckGoSearchAPIWrapper
+
+# -------------------
+# 1. Settings
+# -------------------
+SEARCH_CACHE_PATH = os.getenv("SEARCH_CACHE_PATH", "search_cache.db")
+# Search results go stale faster than model answers
+SEARCH_TTL_SECONDS = float(os.getenv("SEARCH_TTL_SECONDS", "3600"))
+# When DuckDuckGo fails (usually rate blocking), results up to this old are served
+SEARCH_MAX_STALE_SECONDS = float(os.getenv("SEARCH_MAX_STALE_SECONDS", "86400"))
+SEARCH_CACHE_MAX_ENTRIES = 5_000
+# Results fetched per query, before deduplication
+SEARCH_MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", "8"))
+# Size of the tool output; it stays in the conversation for every later turn
+SEARCH_MAX_CHARS = int(os.getenv("SEARCH_MAX_CHARS", "2000"))
+SNIPPET_MAX_CHARS = 300
+
+NO_RESULTS = "No good DuckDuckGo Search Result was found"
+
+SEARCH_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS search_cache (
+    key TEXT PRIMARY KEY,
+    query TEXT NOT NULL,
+    results TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_search_cache_last_used ON search_cache (last_used);
+CREATE INDEX IF NOT EXISTS idx_search_cache_fetched_at ON search_cache (fetched_at);
+"""
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation."""
+    return re.sub(r"\s+", " ", query).strip().strip("?!.").strip().lower()
+
+
+def search_key(query: str, region: Optional[str], source: str) -> str:
+    payload = json.dumps([normalize_query(query), region, source])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+# -------------------
+# 2. Results
+# -------------------
+def _link_key(link: str) -> str:
+    parts = urlsplit(link.strip())
+    host = parts.netloc.lower().removeprefix("www.")
+    return f"{host}{parts.path.rstrip('/')}?{parts.query}"
+
+
+def _text_key(text: str) -> str:
+    return re.sub(r"\W+", " ", text).strip().lower()
+
+
+def dedupe_results(results: list[dict]) -> list[dict]:
+    """
+    Drop results that repeat an earlier one: the same page (ignoring scheme,
+    "www." and a trailing slash) or the same snippet (mirrors, syndicated
+    news). Order is kept.
+    """
+    seen_links: set[str] = set()
+    seen_texts: set[str] = set()
+    unique = []
+    for result in results:
+        link = _link_key(result.get("link", ""))
+        text = _text_key(result.get("snippet", ""))
+        if (link and link in seen_links) or (text and text in seen_texts):
+            continue
+        seen_links.add(link)
+        seen_texts.add(text)
+        unique.append(result)
+    return unique
+
+
+def _clip(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    if len(text) <= limit:
+        return text
+    return text[: limit - 1].rsplit(" ", 1)[0] + "…"
+
+
+def format_results(results: list[dict], max_chars: int = SEARCH_MAX_CHARS) -> str:
+    """One line per result, whole lines only, within `max_chars`."""
+    lines: list[str] = []
+    size = 0
+    for result in results:
+        line = f"- {_clip(result.get('title', ''), 120)}: {_clip(result.get('snippet', ''), SNIPPET_MAX_CHARS)}"
+        if result.get("link"):
+            line += f" ({result['link']})"
+        if lines and size + len(line) + 1 > max_chars:
+            break
+        lines.append(line[:max_chars])
+        size += len(line) + 1
+    return "\n".join(lines) if lines else NO_RESULTS
+
+
+# -------------------
+# 3. Cache
+# -------------------
+class SearchCache:
+    """
+    Persistent cache of search results, keyed by normalized query.
+
+    Raw (deduplicated) results are stored rather than the formatted text, so
+    SEARCH_MAX_CHARS can change without invalidating the cache. Entries are
+    fresh for `ttl` seconds and kept, for stale fallback, until `max_stale`;
+    past `max_entries` the least recently used are evicted.
+    """
+
+    def __init__(
+        self,
+        path: str = SEARCH_CACHE_PATH,
+        *,
+        ttl: float = SEARCH_TTL_SECONDS,
+        max_stale: float = SEARCH_MAX_STALE_SECONDS,
+        max_entries: int = SEARCH_CACHE_MAX_ENTRIES,
+    ) -> None:
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.max_entries = max_entries
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SEARCH_CACHE_SCHEMA)
+        self.lock = threading.Lock()
+        self.counts = {"hits": 0, "misses": 0, "stale_served": 0, "errors": 0}
+        # Running row count, so a write doesn't scan the table to check the cap
+        (self.entries,) = self.conn.execute("SELECT COUNT(*) FROM search_cache").fetchone()
+
+    def lookup(self, key: str) -> Optional[tuple[list[dict], float]]:
+        """(results, fetched_at) for any entry young enough to serve stale."""
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT results, fetched_at FROM search_cache WHERE key = ? AND fetched_at > ?",
+                (key, now - self.max_stale),
+            ).fetchone()
+            if row is not None:
+                self.conn.execute("UPDATE search_cache SET last_used = ? WHERE key = ?", (now, key))
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def update(self, key: str, query: str, results: list[dict]) -> None:
+        now = time.time()
+        with self.lock:
+            replaced = self.conn.execute("SELECT 1 FROM search_cache WHERE key = ?", (key,)).fetchone()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO search_cache (key, query, results, fetched_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, normalize_query(query), json.dumps(results), now, now),
+            )
+            if replaced is None:
+                self.entries += 1
+            # Both deletes use an index and touch only the rows they remove
+            expired = self.conn.execute("DELETE FROM search_cache WHERE fetched_at <= ?", (now - self.max_stale,))
+            self.entries -= expired.rowcount
+            if self.entries > self.max_entries:
+                evicted = self.conn.execute(
+                    "DELETE FROM search_cache WHERE key IN "
+                    "(SELECT key FROM search_cache ORDER BY last_used LIMIT ?)",
+                    (self.entries - self.max_entries,),
+                )
+                self.entries -= evicted.rowcount
+
+    def count(self, event: str) -> None:
+        with self.lock:
+            self.counts[event] += 1
+
+    def clear(self) -> None:
+        with self.lock:
+            self.conn.execute("DELETE FROM search_cache")
+            self.entries = 0
+
+    def stats(self) -> dict[str, Any]:
+        with self.lock:
+            (entries,) = self.conn.execute("SELECT COUNT(*) FROM search_cache").fetchone()
+            counts = dict(self.counts)
+        lookups = counts["hits"] + counts["misses"]
+        return {"entries": entries, **counts, "hit_rate": counts["hits"] / lookups if lookups else 0.0}
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+# -------------------
+# 4. Tool
+# -------------------
+class CachedDuckDuckGoSearch(DuckDuckGoSearchRun):
+    """
+    DuckDuckGoSearchRun (same name, description and arguments) answered from
+    a SearchCache, with duplicate results dropped and the output capped at
+    `max_chars`. If a search fails, an expired entry is served instead,
+    marked with its age; failures themselves are never cached.
+    """
+
+    search_cache: Any = None
+    max_results: int = SEARCH_MAX_RESULTS
+    max_chars: int = SEARCH_MAX_CHARS
+
+    def _search(self, query: str) -> list[dict]:
+        return dedupe_results(self.api_wrapper.results(query, self.max_results))
+
+    def _from_cache(self, cache: SearchCache, query: str) -> tuple[str, Optional[tuple], Optional[str]]:
+        """(key, cached entry, answer); the answer is None unless the entry is fresh."""
+        key = search_key(query, self.api_wrapper.region, self.api_wrapper.source)
+        cached = cache.lookup(key)
+        if cached is not None and time.time() - cached[1] < cache.ttl:
+            cache.count("hits")
+            return key, cached, format_results(cached[0], self.max_chars)
+        cache.count("misses")
+        return key, cached, None
+
+    def _stale(self, cache: SearchCache, cached: Optional[tuple], error: Exception) -> str:
+        cache.count("errors")
+        if cached is None:
+            raise error
+        cache.count("stale_served")
+        minutes = int((time.time() - cached[1]) / 60)
+        note = f"(Search unavailable; cached results from {minutes} minutes ago.)\n"
+        return note + format_results(cached[0], self.max_chars - len(note))
+
+    def _run(self, query: str, run_manager: Any = None) -> str:
+        cache: Optional[SearchCache] = self.search_cache
+        if cache is None:
+            return format_results(self._search(query), self.max_chars)
+        key, cached, answer = self._from_cache(cache, query)
+        if answer is not None:
+            return answer
+        try:
+            results = self._search(query)
+        except Exception as e:
+            return self._stale(cache, cached, e)
+        cache.update(key, query, results)
+        return format_results(results, self.max_chars)
+
+    async def _arun(self, query: str, run_manager: Any = None) -> str:
+        # duckduckgo_search has no async client: hits are answered on the
+        # event loop, and only a miss waits on a worker thread
+        cache: Optional[SearchCache] = self.search_cache
+        if cache is None:
+            return format_results(await asyncio.to_thread(self._search, query), self.max_chars)
+        key, cached, answer = self._from_cache(cache, query)
+        if answer is not None:
+            return answer
+        try:
+            results = await asyncio.to_thread(self._search, query)
+        except Exception as e:
+            return self._stale(cache, cached, e)
+        cache.update(key, query, results)
+        return format_results(results, self.max_chars)
+
+
+_search_cache: Optional[SearchCache] = None
+_search_cache_lock = threading.Lock()
+
+
+def search_cache() -> SearchCache:
+    """The process-wide search cache, opened on first use."""
+    global _search_cache
+    with _search_cache_lock:
+        if _search_cache is None:
+            _search_cache = SearchCache()
+        return _search_cache
+
+
+def cached_search_tool(region: str = "us-en") -> CachedDuckDuckGoSearch:
+    return CachedDuckDuckGoSearch(
+        api_wrapper=DuckDuckGoSearchAPIWrapper(region=region), search_cache=search_cache()
+    )
+
+
+def search_cache_stats() -> dict[str, Any]:
+    """Entries, hit rate and stale fallbacks of the search cache (empty before first use)."""
+    return _search_cache.stats() if _search_cache else {}